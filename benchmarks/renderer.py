@@ -0,0 +1,99 @@
+# Compara el renderizador con sprites (trackers.renderer.AnnotationRenderer) con las
+# funciones de dibujo originales de Tracker: velocidad y salida idéntica píxel a píxel.
+# También mide el dibujo en paralelo por rangos de frames (render_video_parallel).
+#
+# Uso: python -m benchmarks.renderer [--frames 120] [--players 22] [--workers 4]
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from trackers import Tracker
+from trackers.renderer import AnnotationRenderer, render_video_parallel
+from utils import read_video, read_video_frames, save_video
+
+
+def make_tracks(rng, num_frames, num_players, size=(1080, 1920)):
+    # Tracks sintéticos: jugadores de dos equipos que se mueven por el campo, árbitro, balón y porteros
+    team_colors = [np.array([30.4, 30.1, 200.7]), np.array([220.2, 219.8, 221.3])]
+    position = rng.uniform((0, 0), (size[1], size[0]), (num_players + 4, 2))
+    velocity = rng.normal(0, 4, (num_players + 4, 2))
+    dims = rng.uniform((25, 60), (60, 120), (num_players + 4, 2))
+    tracks = {object_type: [] for object_type in ("players", "referees", "ball", "managers", "goalkeepers")}
+    for _ in range(num_frames):
+        position = np.clip(position + velocity, (-20, -20), (size[1] + 20, size[0] + 20))
+        bboxes = np.concatenate([position, position + dims], axis=1).tolist()
+        tracks["players"].append({track_id: {"bbox": bboxes[track_id], "team_color": team_colors[track_id % 2]}
+                                  for track_id in range(num_players)})
+        tracks["referees"].append({num_players: {"bbox": bboxes[num_players]}})
+        tracks["goalkeepers"].append({num_players + 1: {"bbox": bboxes[num_players + 1]},
+                                      num_players + 2: {"bbox": bboxes[num_players + 2]}})
+        tracks["ball"].append({1: {"bbox": bboxes[num_players + 3]}})
+        tracks["managers"].append({})
+    return tracks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--players", type=int, default=22)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    tracks = make_tracks(rng, args.frames, args.players)
+    frames = [np.clip(rng.normal((40, 140, 40), 8, (1080, 1920, 3)), 0, 255).astype(np.uint8) for _ in range(8)]
+    frames = [frames[i % len(frames)] for i in range(args.frames)]
+
+    # Las funciones de dibujo de Tracker no usan el modelo: no hace falta cargar 'best.pt'
+    tracker = Tracker.__new__(Tracker)
+    renderer = AnnotationRenderer()
+
+    start = time.perf_counter()
+    reference = tracker.draw_annotations(frames, tracks)
+    original_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rendered = list(renderer.iter_draw_annotations(frames, tracks))
+    renderer_time = time.perf_counter() - start
+
+    copies = [frame.copy() for frame in frames]
+    start = time.perf_counter()
+    for _ in renderer.iter_draw_annotations(copies, tracks, copy=False):
+        pass
+    in_place_time = time.perf_counter() - start
+
+    identical = all(np.array_equal(a, b) for a, b in zip(reference, rendered)) and \
+        all(np.array_equal(a, b) for a, b in zip(reference, copies))
+    print(f"Frames: {args.frames}, objetos por frame: {args.players + 4}")
+    print(f"Dibujo original (con copia):  {original_time:.3f} s ({args.frames / original_time:.0f} frames/s)")
+    print(f"Sprites (con copia):          {renderer_time:.3f} s ({args.frames / renderer_time:.0f} frames/s, x{original_time / renderer_time:.1f})")
+    print(f"Sprites (en el sitio):        {in_place_time:.3f} s ({args.frames / in_place_time:.0f} frames/s, x{original_time / in_place_time:.1f})")
+    print(f"Salida idéntica píxel a píxel: {identical}")
+
+    # Video completo: lectura + dibujo + escritura, en un proceso y por rangos en paralelo
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, "input.mp4")
+        save_video(frames, video_path)
+
+        start = time.perf_counter()
+        save_video(AnnotationRenderer().iter_draw_annotations(read_video_frames(video_path), tracks, copy=False),
+                   os.path.join(tmp_dir, "sequential.mp4"))
+        sequential_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        render_video_parallel(video_path, tracks, os.path.join(tmp_dir, "parallel.mp4"), num_workers=args.workers)
+        parallel_time = time.perf_counter() - start
+
+        same_video = all(np.array_equal(a, b) for a, b in zip(read_video(os.path.join(tmp_dir, "sequential.mp4")),
+                                                              read_video(os.path.join(tmp_dir, "parallel.mp4"))))
+    print(f"Video en un proceso:          {sequential_time:.3f} s ({args.frames / sequential_time:.0f} frames/s)")
+    print(f"Video con {args.workers} procesos:          {parallel_time:.3f} s ({args.frames / parallel_time:.0f} frames/s, x{sequential_time / parallel_time:.1f})")
+    print(f"Mismo video en ambos casos: {same_video}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Compara el tracking en un proceso (Tracker.get_track_store) con el tracking por tramos en
+# varios procesos (trackers.sharding.track_video_sharded) sobre un video sintético: tiempo,
+# IDs unidos entre tramos y coherencia de los IDs frente a la ejecución en un proceso.
+#
+# Uso: python -m benchmarks.sharding [--frames 600] [--workers 4] [--overlap 30]
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import supervision as sv
+
+from benchmarks.synthetic import StandInBackend, write_synthetic_video
+from trackers import Tracker
+from trackers.backends import match_detections
+from trackers.sharding import ShardStitcher, track_video_sharded
+from utils import read_video_frames
+
+
+def id_fragmentation(reference_store, track_store, iou_threshold=0.9):
+    # Número de IDs de más: por cada ID de referencia, cuántos IDs distintos le corresponden
+    # (por IoU, frame a frame) en 'track_store' además del primero
+    matched_ids = defaultdict(Counter)
+    for frame_num in range(min(reference_store.num_frames, track_store.num_frames)):
+        reference_rows, rows = reference_store.frame_rows(frame_num), track_store.frame_rows(frame_num)
+        reference = sv.Detections(xyxy=reference_rows["bbox"], class_id=reference_rows["object_type"].astype(int))
+        candidate = sv.Detections(xyxy=rows["bbox"], class_id=rows["object_type"].astype(int))
+        reference_idx, candidate_idx, _ = match_detections(reference, candidate, iou_threshold)
+        for reference_id, track_id in zip(reference_rows["track_id"][reference_idx].tolist(),
+                                          rows["track_id"][candidate_idx].tolist()):
+            matched_ids[reference_id][track_id] += 1
+    return sum(len(track_ids) - 1 for track_ids in matched_ids.values())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--height", type=int, default=540)
+    parser.add_argument("--players", type=int, default=22)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--overlap", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, "input.mp4")
+        write_synthetic_video(video_path, args.frames, (args.height, args.width), args.players)
+
+        start = time.perf_counter()
+        reference = Tracker("stand-in", backend=StandInBackend()).get_track_store(read_video_frames(video_path))
+        single_time = time.perf_counter() - start
+
+        stitcher = ShardStitcher()
+        start = time.perf_counter()
+        sharded = track_video_sharded(video_path, "stand-in", num_workers=args.workers, overlap=args.overlap,
+                                      stitcher=stitcher, backend=StandInBackend())
+        sharded_time = time.perf_counter() - start
+
+    print(f"Frames: {args.frames}, procesos: {args.workers}, solape: {args.overlap} frames (CPUs: {os.cpu_count()})")
+    print(f"Un proceso:        {single_time:.3f} s ({args.frames / single_time:.0f} frames/s)")
+    print(f"Por tramos:        {sharded_time:.3f} s ({args.frames / sharded_time:.0f} frames/s, x{single_time / sharded_time:.1f})")
+    print(f"Unión de tramos: {stitcher.summary()}")
+    print(f"IDs de jugadores: {len(reference.track_ids())} en un proceso, {len(sharded.track_ids())} por tramos")
+    print(f"Filas: {len(reference)} en un proceso, {len(sharded)} por tramos")
+    print(f"IDs de referencia partidos en varios IDs: {id_fragmentation(reference, sharded)}")
+
+
+if __name__ == "__main__":
+    main()
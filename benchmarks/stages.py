@@ -0,0 +1,163 @@
+# Benchmark de cada etapa del pipeline sobre un video sintético (o sobre el stub de tracks
+# con --replay), sin video real ni 'best.pt'. Para cada etapa mide frames/s y pico de
+# memoria (RSS) y guarda los resultados en un JSON para comparar entre commits.
+#
+# Uso: python -m benchmarks.stages [--frames 120] [--replay] [--output benchmark_results.json]
+import argparse
+import gc
+import json
+import os
+import pickle
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+
+import psutil
+import supervision as sv
+
+from benchmarks.synthetic import StandInBackend, ReplayBackend, write_synthetic_video, write_stub_video
+from team_assigner import TeamAssigner
+from trackers import Tracker, TrackStore
+from trackers.renderer import AnnotationRenderer
+from utils import read_video, save_video
+
+STUB_PATH = "stubs/track_stubs_futbol.pkl"
+
+
+class PeakRSS:
+    # Muestrea el RSS del proceso en un hilo mientras dura el bloque 'with'
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.process.memory_info().rss)
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024)
+
+
+def run_stage(results, name, fn, num_frames):
+    gc.collect()
+    with PeakRSS() as memory:
+        start = time.perf_counter()
+        output = fn()
+        elapsed = time.perf_counter() - start
+    results[name] = {
+        "seconds": round(elapsed, 4),
+        "frames": num_frames,
+        "fps": round(num_frames / elapsed, 2) if elapsed > 0 else None,
+        "peak_rss_mb": round(memory.peak_mb, 1),
+    }
+    print(f"{name:<26} {elapsed:>8.3f} s {results[name]['fps'] or 0:>10.1f} frames/s {memory.peak_mb:>9.1f} MB")
+    return output
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def assign_teams(team_assigner, frames, tracks):
+    # get_player_team por jugador y frame (con la caché de equipos por ID, como en main.py);
+    # guarda el color del equipo en los tracks para la etapa de dibujo
+    for frame_num, frame in enumerate(frames):
+        for player_id, player in tracks["players"][frame_num].items():
+            team = team_assigner.get_player_team(frame, player["bbox"], player_id)
+            player["team"] = team
+            player["team_color"] = team_assigner.team_colors[team]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--players", type=int, default=22)
+    parser.add_argument("--replay", action="store_true",
+                        help=f"Usa los tracks de '{STUB_PATH}' (detecciones y video generados a partir del stub)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    size = (args.height, args.width)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, "input.mp4")
+        if args.replay:
+            with open(STUB_PATH, "rb") as f:
+                stub_tracks = pickle.load(f)
+            num_frames = min(args.frames, len(stub_tracks["players"]))
+            stub_tracks = {object_type: frames[:num_frames] for object_type, frames in stub_tracks.items()}
+            write_stub_video(video_path, stub_tracks, num_frames, size)
+            backend = ReplayBackend(stub_tracks)
+        else:
+            num_frames = args.frames
+            write_synthetic_video(video_path, num_frames, size, args.players)
+            backend = StandInBackend()
+        print(f"Video {'replay del stub' if args.replay else 'sintético'}: {num_frames} frames de {args.width}x{args.height}")
+        print(f"{'etapa':<26} {'tiempo':>10} {'':>19} {'pico RSS':>12}")
+
+        frames = run_stage(results, "read_video", lambda: read_video(video_path), num_frames)
+
+        tracker = Tracker(backend.model_path, backend=backend)
+        detections = run_stage(results, "detect_frames", lambda: tracker.detect_frames(frames), num_frames)
+
+        tracker.tracker = sv.ByteTrack()
+        tracks = run_stage(results, "bytetrack", lambda: tracker.collect_tracks(
+            tracker.update_tracks(detection, backend.names) for detection in detections), num_frames)
+        if args.replay:
+            # Las etapas siguientes usan los tracks del stub (IDs y trayectorias reales)
+            tracks = TrackStore.from_dict(stub_tracks).to_dict()
+
+        run_stage(results, "interpolate_ball_positions", lambda: tracker.interpolate_ball_positions(tracks["ball"]), num_frames)
+
+        team_assigner = TeamAssigner()
+        run_stage(results, "get_player_color", lambda: [team_assigner.get_player_color(frame, player["bbox"])
+                                                         for frame, players in zip(frames, tracks["players"])
+                                                         for player in players.values()], num_frames)
+        first_players = next((players for players in tracks["players"] if len(players) >= 2), None)
+        if first_players is not None:
+            team_assigner.assign_team_color(frames[tracks["players"].index(first_players)], first_players)
+            run_stage(results, "get_player_team", lambda: assign_teams(team_assigner, frames, tracks), num_frames)
+
+        annotated = run_stage(results, "draw_annotations", lambda: tracker.draw_annotations(frames, tracks), num_frames)
+        renderer = AnnotationRenderer()
+        run_stage(results, "renderer (en el sitio)",
+                  lambda: list(renderer.iter_draw_annotations(frames, tracks, copy=False)), num_frames)
+        run_stage(results, "save_video", lambda: save_video(annotated, os.path.join(tmp_dir, "output.mp4")), num_frames)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": get_commit(),
+        "machine": {"platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count(),
+                    "python": platform.python_version()},
+        "config": vars(args),
+        "stages": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
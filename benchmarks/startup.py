@@ -0,0 +1,189 @@
+# Benchmark del arranque: cada medida se hace en un intérprete nuevo (subproceso) para que
+# cuenten las importaciones y la inicialización única del runtime de inferencia.
+#   - import: tiempo de 'import main' y qué librerías pesadas quedan cargadas;
+#   - first_frame: tiempo hasta el primer frame anotado en la ruta de solo anotación
+#     (--tracks-stub de main.py: tracks de un .pkl, sin modelo);
+#   - first_batch: latencia del primer lote de inferencia sin calentar y tras Tracker.warmup
+#     (con el modelo sustituto del video sintético, o con un modelo real con --model).
+# Cada medida se repite en modo "antes": las importaciones pesadas se hacen al cargar los
+# módulos, como en el código original (BASELINE_IMPORTS), el modelo se carga al crear el
+# Tracker (solo con --model) y el primer lote se infiere sin warmup.
+#
+# Uso: python -m benchmarks.startup [--runs 3] [--model best.pt --backend torch] [--output startup_results.json]
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+STUB_PATH = "stubs/track_stubs_futbol.pkl"
+HEAVY_MODULES = ("torch", "ultralytics", "supervision", "pandas", "sklearn", "scipy", "onnxruntime", "openvino")
+# Módulos que el código original importaba al cargar trackers/tracker.py y team_assigner.py
+BASELINE_IMPORTS = ("ultralytics", "supervision", "pandas", "sklearn.cluster")
+
+
+def loaded_heavy_modules():
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def import_baseline_modules():
+    # Reproduce las importaciones del código original (las librerías no instaladas se omiten)
+    for name in BASELINE_IMPORTS:
+        if importlib.util.find_spec(name.split(".")[0]) is not None:
+            importlib.import_module(name)
+
+
+def child_import(eager):
+    start = time.perf_counter()
+    if eager:
+        import_baseline_modules()
+    import main  # noqa: F401
+    return {"seconds": time.perf_counter() - start, "heavy_modules": loaded_heavy_modules()}
+
+
+def child_first_frame(video_path, stub_path, eager, model_path=None):
+    # Igual que main.py con --tracks-stub hasta el primer frame anotado
+    start = time.perf_counter()
+    if eager:
+        import_baseline_modules()
+    from team_assigner import TeamAssigner
+    from trackers import Tracker
+    from trackers.renderer import AnnotationRenderer
+    from utils import read_video_frames
+    imported = time.perf_counter()
+    tracker = Tracker(model_path or "best.pt")
+    if eager and model_path is not None:
+        tracker.backend.load()  # El código original cargaba el modelo en Tracker.__init__
+    tracks = tracker.get_object_tracks(None, read_from_stub=True, stub_path=stub_path)
+    tracks["ball"] = tracker.interpolate_ball_positions(tracks["ball"])
+    frames = TeamAssigner().iter_assign_teams(read_video_frames(video_path), tracks, reference_frame_idx=0)
+    next(iter(AnnotationRenderer().iter_draw_annotations(frames, tracks, copy=False)))
+    return {"seconds": time.perf_counter() - start, "import_seconds": imported - start,
+            "heavy_modules": loaded_heavy_modules()}
+
+
+def child_first_batch(backend_name, model_path, size, batch_size, warmup):
+    from benchmarks.synthetic import StandInBackend, iter_synthetic_frames
+    from trackers import Tracker
+    frames = list(iter_synthetic_frames(2 * batch_size, size))
+    if model_path is None:
+        tracker = Tracker("stand-in", backend=StandInBackend(), batch_size=batch_size)
+    else:
+        tracker = Tracker(model_path, backend=backend_name, batch_size=batch_size)
+    warmup_seconds = tracker.warmup(frames[0].shape) if warmup else None
+    start = time.perf_counter()
+    tracker.predict(frames[:batch_size])
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    tracker.predict(frames[batch_size:])
+    second = time.perf_counter() - start
+    return {"warmup_seconds": warmup_seconds, "first_batch_seconds": first, "second_batch_seconds": second}
+
+
+def run_child(*args):
+    # Ejecuta una medida en un intérprete nuevo y devuelve su resultado (JSON en la última línea)
+    output = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", *map(str, args)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def median_runs(runs, *args):
+    results = [run_child(*args) for _ in range(runs)]
+    summary = dict(results[0])
+    for key, value in results[0].items():
+        if isinstance(value, float):
+            summary[key] = round(float(np.median([result[key] for result in results])), 4)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3, help="Repeticiones de cada medida (se da la mediana)")
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--model", default=None, help="Pesos reales (por defecto, el modelo sustituto del video sintético)")
+    parser.add_argument("--backend", default="torch")
+    parser.add_argument("--output", default="startup_results.json")
+    parser.add_argument("--child", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, *child_args = args.child
+        if mode == "import":
+            result = child_import(child_args[0] == "1")
+        elif mode == "first_frame":
+            video_path, stub_path, eager, model_path = child_args
+            result = child_first_frame(video_path, stub_path, eager == "1", None if model_path == "-" else model_path)
+        else:
+            backend_name, model_path, height, width, batch_size, warmup = child_args
+            result = child_first_batch(backend_name, None if model_path == "-" else model_path,
+                                       (int(height), int(width)), int(batch_size), warmup == "1")
+        print(json.dumps(result))
+        return
+
+    from benchmarks.synthetic import write_stub_video
+    model = args.model or "-"
+    results = {}
+    for eager in (1, 0):
+        name = "import_main_before" if eager else "import_main"
+        results[name] = median_runs(args.runs, "import", eager)
+        print(f"import main ({'antes' if eager else 'ahora'}): {results[name]['seconds']:.3f} s "
+              f"(cargadas: {', '.join(results[name]['heavy_modules']) or 'ninguna'})")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with open(STUB_PATH, "rb") as f:
+            tracks = pickle.load(f)
+        num_frames = min(args.frames, len(tracks["players"]))
+        tracks = {object_type: frames[:num_frames] for object_type, frames in tracks.items()}
+        video_path = os.path.join(tmp_dir, "input.mp4")
+        stub_path = os.path.join(tmp_dir, "tracks.pkl")
+        write_stub_video(video_path, tracks, num_frames, (args.height, args.width))
+        with open(stub_path, "wb") as f:
+            pickle.dump(tracks, f)
+        for eager in (1, 0):
+            name = "first_frame_before" if eager else "first_frame"
+            results[name] = median_runs(args.runs, "first_frame", video_path, stub_path, eager, model)
+            print(f"Primer frame anotado, solo anotación ({'antes' if eager else 'ahora'}): "
+                  f"{results[name]['seconds']:.3f} s (importaciones {results[name]['import_seconds']:.3f} s; "
+                  f"cargadas: {', '.join(results[name]['heavy_modules']) or 'ninguna'})")
+
+    for warmup in (0, 1):
+        name = "first_batch_warm" if warmup else "first_batch_cold"
+        results[name] = median_runs(args.runs, "first_batch", args.backend, model, args.height, args.width,
+                                    args.batch_size, warmup)
+        print(f"Primer lote {'tras warmup' if warmup else 'sin calentar'}: "
+              f"{results[name]['first_batch_seconds']:.3f} s (segundo lote {results[name]['second_batch_seconds']:.3f} s"
+              + (f", warmup {results[name]['warmup_seconds']:.3f} s)" if warmup else ")"))
+
+    # Antes / ahora: 'antes' es el arranque con las importaciones y el modelo del código original
+    # y el primer lote sin warmup; 'ahora', el del código actual con Tracker.warmup
+    results["comparison"] = {
+        "import_main": (results["import_main_before"]["seconds"], results["import_main"]["seconds"]),
+        "first_frame": (results["first_frame_before"]["seconds"], results["first_frame"]["seconds"]),
+        "first_batch": (results["first_batch_cold"]["first_batch_seconds"],
+                        results["first_batch_warm"]["first_batch_seconds"]),
+    }
+    for name, (before, after) in results["comparison"].items():
+        print(f"{name:<12} antes {before:.3f} s -> ahora {after:.3f} s (x{before / max(after, 1e-9):.1f})")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key != "child"},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Resultados guardados en '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# Video sintético y modelos sustitutos para los benchmarks: permiten medir el pipeline
+# sin video real y sin 'best.pt'.
+import cv2
+import numpy as np
+import supervision as sv
+
+from trackers.backends import InferenceBackend
+
+PITCH_COLOR = (40, 140, 40)
+SHORTS_COLOR = (20, 20, 20)
+# Clases en el mismo formato que 'names' de un modelo YOLO
+CLASS_NAMES = {0: "ball", 1: "goalkeeper", 2: "player", 3: "referee", 4: "manager"}
+# Color de la camiseta de cada tipo de blob (BGR)
+BLOB_COLORS = {
+    "team_1": (30, 30, 200),
+    "team_2": (200, 80, 20),
+    "referee": (0, 220, 220),
+    "goalkeeper": (200, 0, 200),
+    "ball": (255, 255, 255),
+}
+BLOB_CLASSES = {"team_1": 2, "team_2": 2, "referee": 3, "goalkeeper": 1, "ball": 0}
+BBOX_PADDING = 3  # Margen de césped alrededor de cada jugador en la caja detectada
+
+
+def draw_person(frame, bbox, jersey_color):
+    # Jugador como rectángulo: camiseta en la mitad superior y pantalón oscuro en la inferior
+    x1, y1, x2, y2 = (int(v) for v in bbox)
+    x1, y1, x2, y2 = x1 + BBOX_PADDING, y1 + BBOX_PADDING, x2 - BBOX_PADDING, y2 - BBOX_PADDING
+    y_mid = (y1 + y2) // 2
+    cv2.rectangle(frame, (x1, y1), (x2, y_mid), jersey_color, cv2.FILLED)
+    cv2.rectangle(frame, (x1, y_mid + 1), (x2, y2), SHORTS_COLOR, cv2.FILLED)
+
+
+def draw_ball(frame, bbox):
+    x1, y1, x2, y2 = bbox
+    radius = max(2, int((x2 - x1) / 2))
+    cv2.circle(frame, (int((x1 + x2) / 2), int((y1 + y2) / 2)), radius, BLOB_COLORS["ball"], cv2.FILLED)
+
+
+def iter_synthetic_frames(num_frames, size=(1080, 1920), num_players=22, seed=0):
+    # Blobs de colores que se mueven sobre un fondo verde: dos equipos, árbitro, dos porteros y balón
+    rng = np.random.default_rng(seed)
+    height, width = size
+    kinds = ["team_1", "team_2"] * (num_players // 2) + ["referee", "goalkeeper", "goalkeeper"]
+    position = rng.uniform((50, 50), (width - 100, height - 150), (len(kinds), 2))
+    velocity = rng.normal(0, 3, (len(kinds), 2))
+    dims = rng.uniform((30, 70), (45, 110), (len(kinds), 2))
+    ball, ball_velocity = np.array([width / 2, height / 2]), rng.normal(0, 8, 2)
+    for _ in range(num_frames):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = PITCH_COLOR
+        velocity += rng.normal(0, 0.3, velocity.shape)
+        position = np.clip(position + velocity, 0, (width, height) - dims)
+        for kind, (x, y), (w, h) in zip(kinds, position, dims):
+            draw_person(frame, (x, y, x + w, y + h), BLOB_COLORS[kind])
+        ball = np.clip(ball + ball_velocity, 10, (width - 10, height - 10))
+        draw_ball(frame, (ball[0] - 6, ball[1] - 6, ball[0] + 6, ball[1] + 6))
+        yield frame
+
+
+def write_synthetic_video(video_path, num_frames, size=(1080, 1920), num_players=22, fps=30, seed=0):
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (size[1], size[0]))
+    for frame in iter_synthetic_frames(num_frames, size, num_players, seed):
+        writer.write(frame)
+    writer.release()
+
+
+def write_stub_video(video_path, tracks, num_frames=None, size=(1080, 1920), fps=30):
+    # Video sintético con los blobs en las posiciones de un stub de tracks (modo replay)
+    num_frames = num_frames or len(tracks["players"])
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (size[1], size[0]))
+    for frame_num in range(num_frames):
+        frame = np.empty(size + (3,), dtype=np.uint8)
+        frame[:] = PITCH_COLOR
+        for track_id, player in tracks["players"][frame_num].items():
+            draw_person(frame, player["bbox"], BLOB_COLORS["team_1" if track_id % 2 else "team_2"])
+        for referee in tracks["referees"][frame_num].values():
+            draw_person(frame, referee["bbox"], BLOB_COLORS["referee"])
+        for goalkeeper in tracks["goalkeepers"][frame_num].values():
+            draw_person(frame, goalkeeper["bbox"], BLOB_COLORS["goalkeeper"])
+        for ball in tracks["ball"][frame_num].values():
+            draw_ball(frame, ball["bbox"])
+        writer.write(frame)
+    writer.release()
+
+
+class StandInBackend(InferenceBackend):
+    # Modelo sustituto para el video sintético: segmenta los blobs por color con OpenCV.
+    # Mantiene la interfaz de InferenceBackend, así que Tracker lo usa como a YOLO.
+    name = "stand-in"
+
+    def __init__(self, model_path="stand-in", num_threads=None, imgsz=640):
+        super().__init__(model_path, num_threads, imgsz)
+        self.names = CLASS_NAMES
+
+    def detect(self, frame):
+        xyxy, class_ids = [], []
+        for kind, color in BLOB_COLORS.items():
+            mask = cv2.inRange(frame, np.array(color) - 10, np.array(color) + 10)
+            num_labels, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            for x, y, w, h, area in stats[1:num_labels]:
+                if area < 10:
+                    continue
+                if kind == "ball":
+                    xyxy.append([x, y, x + w, y + h])
+                else:
+                    # El blob es la camiseta: la caja incluye el pantalón y el margen de césped
+                    xyxy.append([x - BBOX_PADDING, y - BBOX_PADDING, x + w + BBOX_PADDING, y + 2 * h + BBOX_PADDING])
+                class_ids.append(BLOB_CLASSES[kind])
+        return sv.Detections(xyxy=np.array(xyxy, dtype=np.float32).reshape(-1, 4),
+                             confidence=np.full(len(class_ids), 0.9, dtype=np.float32),
+                             class_id=np.array(class_ids, dtype=int))
+
+    def predict(self, frames, conf, imgsz=None, classes=None):
+        detections = [self.detect(frame) for frame in frames]
+        if classes is not None:
+            detections = [detection[np.isin(detection.class_id, classes)] for detection in detections]
+        return detections
+
+
+class ReplayBackend(InferenceBackend):
+    # Modelo sustituto del modo replay: devuelve como detecciones las cajas del stub
+    # (en orden de frame), para que ByteTrack procese un flujo de detecciones real.
+    name = "replay"
+
+    def __init__(self, tracks, model_path="replay", num_threads=None, imgsz=640):
+        super().__init__(model_path, num_threads, imgsz)
+        self.names = CLASS_NAMES
+        self.frame_num = 0
+        type_classes = {"players": 2, "referees": 3, "ball": 0, "managers": 4, "goalkeepers": 1}
+        self.detections = []
+        for frame_num in range(len(tracks["players"])):
+            xyxy, class_ids = [], []
+            for object_type, class_id in type_classes.items():
+                for track in tracks[object_type][frame_num].values():
+                    xyxy.append(track["bbox"])
+                    class_ids.append(class_id)
+            self.detections.append(sv.Detections(xyxy=np.array(xyxy, dtype=np.float32).reshape(-1, 4),
+                                                 confidence=np.full(len(class_ids), 0.9, dtype=np.float32),
+                                                 class_id=np.array(class_ids, dtype=int)))
+
+    def predict(self, frames, conf, imgsz=None, classes=None):
+        detections = self.detections[self.frame_num:self.frame_num + len(frames)]
+        self.frame_num += len(frames)
+        return detections
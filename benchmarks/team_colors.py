@@ -0,0 +1,71 @@
+# Compara el kernel vectorizado de colores de camiseta (TeamAssigner.get_player_colors)
+# con el KMeans por recorte original (TeamAssigner.get_player_color_kmeans):
+# velocidad y diferencia de color frente a COLOR_TOLERANCE.
+#
+# Uso: python -m benchmarks.team_colors [--frames 20] [--players 22]
+import argparse
+import time
+
+import numpy as np
+
+from team_assigner import TeamAssigner
+from team_assigner.team_assigner import COLOR_TOLERANCE
+
+
+def make_frame(rng, num_players, size=(1080, 1920)):
+    # Frame sintético: césped con ruido y jugadores con camiseta de uno de dos equipos
+    frame = np.clip(rng.normal((40, 140, 40), 8, size + (3,)), 0, 255).astype(np.uint8)
+    team_colors = np.array([(30, 30, 200), (220, 220, 220)])
+    bboxes = []
+    for i in range(num_players):
+        w, h = rng.integers(25, 60), rng.integers(60, 120)
+        x1, y1 = rng.integers(0, size[1] - w), rng.integers(0, size[0] - h)
+        jersey = np.clip(rng.normal(team_colors[i % 2], 10, (h // 2 - 4, w - 8, 3)), 0, 255)
+        frame[y1 + 4:y1 + h // 2, x1 + 4:x1 + w - 4] = jersey.astype(np.uint8)
+        frame[y1 + h // 2:y1 + h, x1 + 6:x1 + w - 6] = (20, 20, 20)  # Pantalón
+        bboxes.append([float(x1), float(y1), float(x1 + w), float(y1 + h)])
+    return frame, bboxes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--players", type=int, default=22)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    samples = [make_frame(rng, args.players) for _ in range(args.frames)]
+    team_assigner = TeamAssigner()
+
+    start = time.perf_counter()
+    reference = [[team_assigner.get_player_color_kmeans(frame, bbox) for bbox in bboxes] for frame, bboxes in samples]
+    kmeans_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = [team_assigner.get_player_colors(frame, bboxes) for frame, bboxes in samples]
+    batched_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    team_assigner.get_player_colors_frames([frame for frame, _ in samples], [bboxes for _, bboxes in samples])
+    multi_frame_time = time.perf_counter() - start
+
+    # El KMeans original usa una inicialización aleatoria: una segunda pasada da la
+    # variabilidad de la propia referencia (recortes ambiguos, p. ej. jugadores solapados)
+    reference_rerun = [[team_assigner.get_player_color_kmeans(frame, bbox) for bbox in bboxes] for frame, bboxes in samples]
+
+    diff = np.abs(np.concatenate(reference) - np.concatenate(batched)).max(axis=1)
+    rerun_diff = np.abs(np.concatenate(reference) - np.concatenate(reference_rerun)).max(axis=1)
+    num_crops = len(diff)
+    print(f"Recortes: {num_crops}")
+    print(f"KMeans por recorte:        {kmeans_time:.3f} s ({num_crops / kmeans_time:.0f} recortes/s)")
+    print(f"2-means vectorizado/frame: {batched_time:.3f} s ({num_crops / batched_time:.0f} recortes/s, x{kmeans_time / batched_time:.1f})")
+    print(f"2-means vectorizado/lote:  {multi_frame_time:.3f} s ({num_crops / multi_frame_time:.0f} recortes/s, x{kmeans_time / multi_frame_time:.1f})")
+    print(f"Diferencia de color máx.: {diff.max():.2f}, media: {diff.mean():.2f}, "
+          f"dentro de la tolerancia ({COLOR_TOLERANCE}): {(diff <= COLOR_TOLERANCE).mean() * 100:.1f}%")
+    print(f"Referencia: KMeans contra sí mismo (otra inicialización) dentro de la tolerancia: "
+          f"{(rerun_diff <= COLOR_TOLERANCE).mean() * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,344 @@
 # -*- coding: utf-8 -*-
 
 # Importar las clases y funciones necesarias de nuestros módulos y librerías externas
-from utils import read_video, save_video
+import argparse
+from utils import read_video_frames, save_video, get_video_info, get_frame_range
+from utils import METRICS                  # Métricas por etapa (desactivadas por defecto)
+from utils.pipeline import Pipeline
+from utils import LiveSource, LatencyBudget, create_sink, format_live_report  # Modo en vivo
+from itertools import starmap, islice
+from functools import partial
 from trackers import Tracker               # Nuestra clase para detección y tracking
+from trackers import TrackStore            # Tabla columnar de tracks
+from trackers import DetectionCache        # Caché de detecciones por contenido (video + pesos + parámetros)
+from trackers import FrameDeduplicator     # Prefiltro de frames repetidos o casi estáticos
+from trackers import BallRefiner           # Segunda pasada del balón en una ventana a resolución nativa
+from trackers import autotune_backend, check_backend_accuracy  # Ajuste y validación de backends de inferencia
+from trackers import KeyframeScheduler, drift_report, format_drift_report  # Detección solo en keyframes
+from trackers import AnnotationRenderer, render_video_parallel  # Dibujo con sprites cacheados
+from trackers import ShardStitcher, track_video_sharded  # Tracking por tramos en varios procesos
+from trackers.detection_cache import file_digest
 from team_assigner import TeamAssigner     # Nuestra clase para asignar equipos
+from team_assigner import AppearanceStore, get_appearance_key  # Apariencia de cada track guardada en disco
 import cv2                                 # Librería OpenCV para manipulación de imágenes y videos
+import os
+import pickle
+import time
 
-def main():
-    # ------------------- 1. Lectura del Video de Entrada -------------------
-    # Lee los frames del archivo de video especificado.
-    # 'read_video' debería devolver una lista de frames (arrays NumPy).
-    print("Leyendo video de entrada...")
-    video_frames = read_video('input_videos/corto_futbol.mp4')
-    print(f"Video leído, {len(video_frames)} frames obtenidos.")
+def get_tracks_pipelined(tracker, frames, cache, queue_size, first_frame=0):
+    # Decodificación, inferencia YOLO por lotes y actualización de ByteTrack
+    # se ejecutan en hilos concurrentes conectados por colas acotadas (devuelve un TrackStore)
+    pipeline = Pipeline(queue_size=queue_size)
+    pipeline.add_source("decode", frames)
+    pipeline.add_stage("detect", lambda frames: tracker.iter_supervision_detections(frames, cache, first_frame))
+    pipeline.add_stage("track", lambda detections: starmap(tracker.update_tracks, detections))
+    track_store = pipeline.run("collect", TrackStore().extend)
+    print(pipeline.format_report())
+    return track_store
+
+
+def create_detection_cache(tracker, video_path, frame_range=None, cache_dir='cache'):
+    # DetectionCache con clave los parámetros de inferencia de 'tracker' (prefiltro y ventana
+    # del balón incluidos). Con 'frame_range' los índices de frame son relativos al tramo leído.
+    params = tracker.get_inference_params()
+    if frame_range is not None:
+        params["frames"] = frame_range
+    return DetectionCache(cache_dir, video_path, tracker.model_path, params)
+
+
+def format_frame_range(frame_range):
+    if frame_range is None:
+        return "el video entero"
+    end = f"el frame {frame_range['end']}" if frame_range["end"] is not None else "el final"
+    return f"el tramo desde el frame {frame_range['start']} hasta {end} con paso {frame_range['stride']}"
+
+
+def save_tracks_stub(path, tracks, frame_range=None):
+    # Guarda los tracks en un .pkl seguidos, en el mismo archivo, del tramo del video del que
+    # salen ({"start", "end", "stride"}; None = video entero). Un solo pickle.load lee solo
+    # los tracks, así que el archivo sigue sirviendo a quien lo carga sin comprobar el tramo.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, 'wb') as f:
+        pickle.dump(tracks, f)
+        pickle.dump({"frames": frame_range}, f)
+
+
+def load_tracks_stub(path, frame_range=None):
+    # Carga los tracks de un .pkl comprobando que salen del mismo tramo que se va a dibujar:
+    # con otro tramo las cajas caerían en frames que no son los suyos. Un .pkl sin tramo
+    # guardado (como stubs/track_stubs_futbol.pkl) es del video entero.
+    with open(path, 'rb') as f:
+        tracks = pickle.load(f)
+        try:
+            stub_range = pickle.load(f)["frames"]
+        except EOFError:
+            stub_range = None
+    if stub_range != frame_range:
+        raise ValueError(f"Los tracks de '{path}' son de {format_frame_range(stub_range)}, pero se pide "
+                         f"{format_frame_range(frame_range)}: usa el mismo --start/--end/--stride o calcula "
+                         f"los tracks de nuevo con otro --tracks-stub")
+    METRICS.cache("stub", hits=1)
+    return tracks
+
+
+def get_drift_reference_store(tracker, video_path, tracking_frames, frame_range=None, start_frame=0, stride=1,
+                              cache_dir='cache'):
+    # Referencia del informe de deriva: detección en todos los frames (sin prefiltro ni ventana
+    # del balón) con un ByteTrack nuevo. Usa su propia DetectionCache, con la clave de sus
+    # parámetros: con la de 'tracker', una ejecución normal con --skip-duplicates o
+    # --ball-window reutilizaría después estas detecciones sin prefiltro ni ventana.
+    reference_tracker = Tracker(tracker.model_path, backend=tracker.backend, batch_size=tracker.batch_size,
+                                inference_size=tracker.inference_size)
+    reference_tracker.source_size = tracker.source_size
+    cache = create_detection_cache(reference_tracker, video_path, frame_range, cache_dir)
+    print(f"Calculando la deriva frente a la detección en todos los frames "
+          f"({cache.cached_frames} frames ya en caché '{cache.path}')...")
+    # Al reanudar, el lector salta al primer frame que falta en la caché
+    resume_frame = reference_tracker.get_resume_frame(cache)
+    frames = tracking_frames(start_frame=start_frame + resume_frame * stride)
+    return reference_tracker.get_track_store(frames, cache=cache, first_frame=resume_frame)
+
+
+def render_video_pipelined(renderer, team_assigner, tracks, frames, output_video_path, queue_size, fps=30,
+                           appearance=None):
+    # Decodificación, asignación de equipos, dibujo y codificación como etapas concurrentes.
+    # Con 'appearance' se calcula además la apariencia de cada track; con team_assigner=None
+    # los equipos ya vienen asignados en 'tracks'.
+    pipeline = Pipeline(queue_size=queue_size)
+    pipeline.add_source("decode", frames)
+    if appearance is not None:
+        pipeline.add_stage("appearance", lambda frames: appearance.iter_collect(frames, tracks))
+    if team_assigner is not None:
+        pipeline.add_stage("teams", lambda frames: team_assigner.iter_assign_teams(frames, tracks, reference_frame_idx=0))
+    pipeline.add_stage("draw", lambda frames: renderer.iter_draw_annotations(frames, tracks, copy=False))
+    pipeline.run("encode", lambda frames: save_video(frames, output_video_path, fps=fps))
+    print(pipeline.format_report())
+
+
+def run_live(tracker, team_assigner, renderer, source, sink, budget):
+    # Modo en vivo: cada frame de la fuente se detecta, se trackea, se le asignan equipos y
+    # se dibuja en cuanto llega, y se emite al 'sink'. 'budget' (LatencyBudget) decide qué
+    # frames se descartan o se emiten sin detección cuando el proceso va por detrás.
+    # Cada frame se procesa como un video de un solo frame: tracks = {clase: [objetos]}.
+    # (Sin interpolación del balón: en vivo no hay frames futuros entre los que interpolar.)
+    last_tracks = None
+    source.start()
+    try:
+        for frame_num, captured_at, frame in source:
+            process = budget.should_process(captured_at)
+            if not process and budget.policy == "drop":
+                continue
+            start = time.perf_counter()
+            if process or last_tracks is None:
+                frame_tracks = tracker.get_frame_tracks(tracker.detect_frame(frame))
+                tracks = {object_type: [objects] for object_type, objects in frame_tracks.items()}
+                if not hasattr(team_assigner, "kmeans"):
+                    # Colores de equipo con el primer frame que tenga al menos n_clusters jugadores/porteros
+                    initial_detections = {**tracks["players"][0], **tracks["goalkeepers"][0]}
+                    team_assigner.assign_team_color(frame, initial_detections)
+                if hasattr(team_assigner, "kmeans"):
+                    team_assigner.assign_frame_teams(frame, 0, tracks)
+                last_tracks = tracks
+            renderer.draw_frame_annotations(frame, last_tracks, 0)
+            # Con el número de frame, el sink de video repite el último frame emitido en los
+            # descartados y la grabación conserva el ritmo real de la fuente
+            keep_going = sink.write(frame, frame_num)
+            budget.record_emitted(captured_at)
+            if process:
+                budget.record_processing(time.perf_counter() - start)
+            if not keep_going:
+                break
+    finally:
+        source.stop()
+        sink.close()
+    return budget.report(source.dropped)
+
+
+def main(pipelined=False, queue_size=8, skip_duplicates=False, backend="torch", batch_size=8,
+         num_threads=None, autotune=False, check_accuracy=False, keyframe_stride=0,
+         adaptive_stride=True, report_drift=False, render_workers=1, ball_window=0, ball_max_lost=15,
+         metrics=False, metrics_json=None, metrics_prometheus=None, metrics_interval=0,
+         shard_workers=1, shard_overlap=30, live_source=None, live_sink="output_videos/live_output.mp4",
+         latency_budget=0.2, drop_policy="drop", live_buffer=1, start_time=None, end_time=None,
+         stride=1, inference_size=None, tracks_stub=None, team_clusters=2, team_feature="color"):
+    # ------------------- 1. Video de Entrada -------------------
+    # Los frames se leen de forma perezosa con 'read_video_frames' (un generador):
+    # nunca se guarda el video completo en memoria, así que el consumo de memoria
+    # depende del tamaño de lote y no de la duración del partido.
+    # El video se recorre dos veces: una para obtener los tracks y otra para dibujar.
+    video_path = 'input_videos/corto_futbol.mp4'
+    print(f"Video de entrada: '{video_path}' (lectura en streaming)")
+    # Con 'start_time' / 'end_time' (segundos) solo se procesa ese tramo (el lector salta a su
+    # inicio sin decodificar lo anterior) y con 'stride' solo uno de cada 'stride' frames.
+    # Las dos pasadas sobre el video leen exactamente los mismos frames con 'read_frames'.
+    # El video de salida usa el fps del de entrada (dividido por 'stride').
+    video_info = get_video_info(video_path)
+    start_frame, end_frame = get_frame_range(video_path, start_time, end_time)
+    read_frames = partial(read_video_frames, video_path, start_frame=start_frame, end_frame=end_frame, stride=stride)
+    output_fps = video_info["fps"] / stride
+    segment = start_frame != 0 or end_frame is not None or stride != 1
+
+    # Métricas: tiempo de pared y CPU por etapa, latencia por frame, detecciones por clase,
+    # aciertos de cachés y pico de memoria. Se exportan al final (JSON / texto de Prometheus)
+    # y, con 'metrics_interval', también periódicamente durante la ejecución.
+    if metrics or metrics_json or metrics_prometheus:
+        METRICS.enable()
+        if metrics_interval > 0:
+            METRICS.start_periodic_export(metrics_interval, metrics_json, metrics_prometheus)
 
     # ------------------- 2. Inicialización del Tracker -------------------
     # Crea una instancia de la clase Tracker.
     # Se le pasa la ruta al archivo del modelo YOLOv8 entrenado ('best.pt').
     # Este modelo es el resultado del Punto 4 de la entrega (entrenamiento).
-    print("Inicializando el Tracker con el modelo 'best.pt'...")
-    tracker = Tracker('best.pt')
+    # Con 'skip_duplicates', los frames repetidos o casi estáticos reutilizan las
+    # detecciones del último frame inferido en lugar de pasar por el modelo.
+    # 'backend' elige el motor de inferencia en CPU (PyTorch, ONNX Runtime, ONNX int8 u
+    # OpenVINO); los modelos convertidos se exportan una sola vez a 'exports/'.
+    # Con 'autotune' se miden lote e hilos sobre los primeros frames del video y se usa
+    # la combinación con más frames/s (el resultado queda guardado por máquina).
+    # Con 'tracks_stub' (un .pkl de tracks ya existente) solo se anota: no se carga el modelo
+    # ni se importan torch / ultralytics / supervision. Si el .pkl aún no existe, los tracks
+    # se calculan normalmente y se guardan en él para las siguientes ejecuciones.
+    annotate_only = tracks_stub is not None and os.path.exists(tracks_stub)
+    if autotune and not annotate_only:
+        sample_frames = list(islice(read_frames(), 64))
+        tuning = autotune_backend(backend, 'best.pt', sample_frames, cache_path='exports/autotune.json',
+                                  inference_size=inference_size)
+        for measurement in tuning["measurements"]:
+            print(f"[autotune] {backend}: hilos={measurement['num_threads']} lote={measurement['batch_size']} "
+                  f"-> {measurement['fps']:.1f} frames/s")
+        batch_size, num_threads = tuning["batch_size"], tuning["num_threads"]
+        print(f"Autotune ({backend}): lote={batch_size}, hilos={num_threads} -> {tuning['fps']} frames/s")
+    print(f"Inicializando el Tracker con el modelo 'best.pt' (backend '{backend}')...")
+    # Con 'ball_window', los frames en los que no se detecta el balón pasan una segunda vez
+    # por el modelo recortados a una ventana de ese tamaño alrededor de su posición prevista.
+    frame_filter = FrameDeduplicator() if skip_duplicates else None
+    ball_refiner = BallRefiner(window=ball_window, max_lost=ball_max_lost) if ball_window > 0 else None
+    # Con 'inference_size' el modelo recibe los frames reducidos (lado mayor = inference_size)
+    # y las cajas vuelven a la resolución completa para los equipos y el dibujo.
+    # El modelo no se carga aquí sino la primera vez que se necesita (ver Tracker.warmup).
+    tracker = Tracker('best.pt', frame_filter=frame_filter, backend=backend,
+                      batch_size=batch_size, num_threads=num_threads, ball_refiner=ball_refiner,
+                      inference_size=inference_size)
+    if check_accuracy and backend != "torch" and not annotate_only:
+        # Compara las detecciones del backend con las de PyTorch en el inicio del video
+        reference_frames = list(islice(read_frames(), 32))
+        accuracy = check_backend_accuracy(tracker.backend, reference_frames, conf=tracker.conf)
+        print(f"Precisión de '{backend}' frente a PyTorch: recall={accuracy['recall']:.3f}, "
+              f"precisión={accuracy['precision']:.3f}, IoU medio={accuracy['mean_iou']:.3f}")
+
+    # ------------------- Modo en vivo (opcional) -------------------
+    # Con 'live_source' (índice de cámara, URL de un stream, tubería o un archivo, que se
+    # reproduce a su fps como si fuera una cámara) se procesa frame a frame con un
+    # presupuesto de latencia de extremo a extremo de 'latency_budget' segundos y se emite
+    # cada frame anotado a 'live_sink' (archivo de video, "window" o "null").
+    if live_source is not None:
+        source = LiveSource(live_source, buffer_size=live_buffer)
+        frame_shape = source.get_frame_shape()
+        if frame_shape is not None:
+            print(f"Modelo cargado y calentado en {tracker.warmup(frame_shape):.2f} s")
+        else:
+            print(f"La fuente '{live_source}' no ha entregado ningún frame: no se calienta el modelo")
+        # Los colores de equipo se ajustan con el primer frame que tenga jugadores: sklearn se
+        # importa y se calienta antes de empezar a leer la fuente, fuera del presupuesto
+        team_assigner = TeamAssigner(n_clusters=team_clusters)
+        print(f"Asignación de equipos calentada en {team_assigner.warmup():.2f} s")
+        print(f"Modo en vivo: '{live_source}' -> '{live_sink}' (presupuesto {latency_budget * 1000:.0f} ms, "
+              f"política '{drop_policy}')")
+        budget = LatencyBudget(latency_budget, policy=drop_policy)
+        report = run_live(tracker, team_assigner, AnnotationRenderer(), source,
+                          create_sink(live_sink, source.fps), budget)
+        print(format_live_report(report, latency_budget))
+        if METRICS.enabled:
+            METRICS.stop_periodic_export()
+            METRICS.export(metrics_json, metrics_prometheus)
+            print(METRICS.format_report())
+        return report
 
     # ------------------- 3. Obtención de Tracks (Detección y Tracking) -------------------
     # Ejecuta la detección de objetos (con 'best.pt') y el tracking (con ByteTrack) en los frames.
-    # IMPORTANTE: 'read_from_stub=False' fuerza la ejecución del modelo y el tracker.
-    #             Esto es necesario para cumplir el Punto 5 de la entrega ("probarlo en un vídeo").
-    #             Si pones 'read_from_stub=True', cargará resultados guardados previamente en 'stub_path'
-    #             (útil para depurar o ejecutar más rápido después de la primera vez).
-    # 'stub_path' es el archivo donde se guardarán (si read_from_stub=False) o cargarán (si True) los tracks.
-    stub_file = 'stubs/track_stubs_futbol.pkl'
-    print(f"Obteniendo tracks de objetos... (read_from_stub=False, se ejecutará el modelo)")
-    tracks = tracker.get_object_tracks(video_frames,
-                                       read_from_stub=False, # ¡Poner en False para la entrega!
-                                       stub_path=stub_file)
-    print(f"Tracks obtenidos. Resultados guardados/cargados desde '{stub_file}'.")
+    # Las detecciones se guardan en 'cache/' en una DetectionCache cuya clave es el hash del
+    # contenido del video, de los pesos del modelo y de los parámetros de inferencia, así que
+    # nunca se reutilizan resultados de otro video u otro modelo. La caché se escribe por
+    # chunks durante la inferencia: si la ejecución se corta, la siguiente continúa desde el
+    # último chunk completo, y si el video ya está entero en caché no se ejecuta el modelo.
+    # Con 'tracks_stub' ya existente (p. ej. 'stubs/track_stubs_futbol.pkl') no se crea la
+    # caché (que calcula el hash del video) y los tracks se cargan directamente del .pkl.
+    # Con 'inference_size' (y sin la ventana del balón, que recorta de la resolución completa)
+    # la pasada de tracking ya decodifica los frames reducidos: el reescalado se hace una sola
+    # vez en el hilo de lectura y por las colas y lotes circulan frames pequeños.
+    if inference_size is not None and ball_refiner is None:
+        tracking_frames = partial(read_frames, max_size=inference_size)
+        tracker.source_size = (video_info["width"], video_info["height"])
+    else:
+        tracking_frames = read_frames
+    # Los índices de frame de la caché son relativos al tramo leído
+    frame_range = {"start": start_frame, "end": end_frame, "stride": stride} if segment else None
+    # La caché (que calcula el hash del video) solo se crea en las rutas que la leen o escriben:
+    # no en solo anotación, ni por tramos, ni con keyframes (el informe de deriva usa la suya).
+    # El modo keyframes tiene prioridad sobre 'shard_workers' (ver el orden de las ramas abajo).
+    keyframes = not annotate_only and keyframe_stride > 1
+    sharded = not annotate_only and not keyframes and shard_workers > 1
+    uses_cache = not annotate_only and not keyframes and not sharded
+    cache = create_detection_cache(tracker, video_path, frame_range) if uses_cache else None
+    # Al reanudar, el lector salta directamente al primer frame que falta en la caché en lugar
+    # de decodificar y descartar todos los frames ya guardados. Con --skip-duplicates o
+    # --ball-window no se reanuda: una caché a medias se descarta (ver Tracker.get_resume_frame)
+    resume_frame = tracker.get_resume_frame(cache)
+    resume_frames = partial(tracking_frames, start_frame=start_frame + resume_frame * stride)
+    # Calentamiento: si esta ejecución va a inferir en este proceso, el modelo se carga y se
+    # pasa un lote de frames vacíos antes de empezar (no con el video entero en caché).
+    if not annotate_only and not sharded and (keyframes or not cache.is_complete):
+        warmup_time = tracker.warmup((video_info["height"], video_info["width"], 3))
+        print(f"Modelo cargado y calentado en {warmup_time:.2f} s")
+    if annotate_only:
+        print(f"Cargando los tracks de '{tracks_stub}' (solo anotación, sin modelo)...")
+        tracks = load_tracks_stub(tracks_stub, frame_range)
+        track_store = None
+    elif keyframes:
+        # Modo keyframes: el detector solo se ejecuta cada N frames (N adaptativo salvo con
+        # 'adaptive_stride=False') y las cajas del resto de frames se interpolan por track.
+        # No usa la caché de detecciones, que guarda una detección por frame.
+        print(f"Obteniendo tracks de objetos con keyframes (paso inicial {keyframe_stride})...")
+        scheduler = KeyframeScheduler(stride=keyframe_stride, adaptive=adaptive_stride)
+        track_store = tracker.get_keyframe_track_store(tracking_frames(), scheduler)
+        print(f"Keyframes: {scheduler.summary()}")
+        if report_drift:
+            reference_store = get_drift_reference_store(tracker, video_path, tracking_frames, frame_range,
+                                                        start_frame, stride)
+            print(format_drift_report(drift_report(track_store, reference_store, scheduler.keyframes)))
+    # Con 'shard_workers' el video se divide en tramos que se detectan y trackean en procesos
+    # separados (cada uno con su modelo y su ByteTrack); los IDs se unen entre tramos
+    # emparejando las cajas de los 'shard_overlap' frames en que se solapan.
+    # No usa la caché de detecciones, que se escribe en orden de frame.
+    elif sharded:
+        print(f"Obteniendo tracks de objetos en {shard_workers} procesos (solape de {shard_overlap} frames)...")
+        stitcher = ShardStitcher()
+        track_store = track_video_sharded(video_path, 'best.pt', num_workers=shard_workers, overlap=shard_overlap,
+                                          stitcher=stitcher, backend=backend, batch_size=batch_size,
+                                          num_threads=num_threads, frame_filter=frame_filter,
+                                          ball_refiner=ball_refiner, inference_size=inference_size)
+        print(f"Unión de tramos: {stitcher.summary()}")
+    # Con 'pipelined' la decodificación, la detección y el tracking se solapan en hilos
+    # (mismo orden de frames y mismo estado del tracker que la ejecución secuencial).
+    elif pipelined:
+        print(f"Obteniendo tracks de objetos... ({cache.cached_frames} frames ya en caché '{cache.path}')")
+        track_store = get_tracks_pipelined(tracker, resume_frames(), cache, queue_size, first_frame=resume_frame)
+    else:
+        print(f"Obteniendo tracks de objetos... ({cache.cached_frames} frames ya en caché '{cache.path}')")
+        track_store = tracker.get_track_store(resume_frames(), cache=cache, first_frame=resume_frame)
+    if track_store is not None:
+        tracks = track_store.to_dict()
+    print("Tracks obtenidos.")
+    if tracks_stub is not None and not annotate_only:
+        # Con el tramo leído: al anotar con este .pkl se comprueba que se pide el mismo tramo
+        save_tracks_stub(tracks_stub, tracks, frame_range)
+        print(f"Tracks guardados en '{tracks_stub}'.")
+    # (con 'shard_workers' los contadores del prefiltro y de la ventana quedan en cada proceso)
+    if frame_filter is not None and not sharded:
+        print(f"Prefiltro de frames duplicados: {frame_filter.summary()}")
+    if ball_refiner is not None and not sharded:
+        print(f"Ventana del balón: {ball_refiner.summary()}")
     # 'tracks' debería ser un diccionario como:
     # {
     #    "players": [ {track_id: {"bbox": [...]}}, {track_id: ...}, ... ], -> Lista por frame
@@ -56,8 +361,8 @@ def main():
     #         # Obtiene las coordenadas del cuadro delimitador (bounding box)
     #         bbox = player['bbox']
     #         # Obtiene el primer frame del video (asegúrate de que exista)
-    #         if len(video_frames) > 0:
-    #             frame = video_frames[0]
+    #         frame = next(read_video_frames(video_path), None)
+    #         if frame is not None:
     #             # Recorta la imagen del jugador usando las coordenadas del bounding box
     #             # Asegurarse de que las coordenadas son enteros y están dentro de los límites del frame
     #             y1, y2 = int(max(0, bbox[1])), int(min(frame.shape[0], bbox[3]))
@@ -87,87 +392,156 @@ def main():
          print("Advertencia: No se detectó el balón en ningún frame.")
 
 
-    # ------------------- 5. Asignación de Equipos -------------------
-    print("Iniciando asignación de equipos...")
-    # Inicializar el asignador de equipos
-    team_assigner = TeamAssigner()
-
-    # -- 5.a. Determinar colores de equipo (basado en el primer frame) --
-    # Combinar jugadores y porteros del primer frame para el clustering inicial.
-    primer_frame_idx = 0 # Usaremos el primer frame (índice 0)
-    if len(video_frames) > primer_frame_idx:
-        # Obtener tracks del primer frame, verificando que existan y no estén vacíos
-        tracks_players_frame0 = tracks.get("players", [])
-        tracks_goalkeepers_frame0 = tracks.get("goalkeepers", [])
-
-        initial_player_detections = tracks_players_frame0[primer_frame_idx] if len(tracks_players_frame0) > primer_frame_idx else {}
-        initial_goalkeeper_detections = tracks_goalkeepers_frame0[primer_frame_idx] if len(tracks_goalkeepers_frame0) > primer_frame_idx else {}
-
-        # Combinar los diccionarios de jugadores y porteros del primer frame
-        initial_combined_detections = {**initial_player_detections, **initial_goalkeeper_detections}
-
-        if initial_combined_detections:
-            print(f"Asignando colores de equipo basados en el frame {primer_frame_idx}...")
-            # Llama a la función que probablemente usa KMeans para agrupar colores
-            team_assigner.assign_team_color(video_frames[primer_frame_idx],
-                                            initial_combined_detections)
-            print("Colores de equipo determinados.")
-        else:
-            # Advertencia si no hay jugadores/porteros en el primer frame para asignar colores
-            print(f"Advertencia: No se detectaron jugadores ni porteros en el frame {primer_frame_idx}. No se pueden asignar colores iniciales.")
-    else:
-         print(f"Advertencia: El video no tiene suficientes frames ({len(video_frames)}) para usar el frame índice {primer_frame_idx}.")
-
-
-    # -- 5.b. Asignar equipo a cada jugador/portero en cada frame --
-    print("Asignando equipo a cada jugador/portero detectado en cada frame...")
-    # Iterar sobre todos los frames procesados
-    for frame_num in range(len(video_frames)):
-        # Asegurarse de que el frame existe en los tracks (puede haber menos frames en tracks si hubo error)
-        frame_exists_in_players = len(tracks.get("players", [])) > frame_num
-        frame_exists_in_goalkeepers = len(tracks.get("goalkeepers", [])) > frame_num
-
-        # Procesar jugadores si existen tracks para este frame
-        if frame_exists_in_players:
-            for item_id, track_data in tracks["players"][frame_num].items():
-                # Obtener el equipo del jugador basado en su bbox en este frame
-                team = team_assigner.get_player_team(video_frames[frame_num],
-                                                     track_data['bbox'],
-                                                     item_id)
-                # Guardar la asignación de equipo y el color correspondiente en la estructura 'tracks'
-                tracks["players"][frame_num][item_id]['team'] = team
-                # Usar .get() para el color por si acaso (aunque 'team' debería estar en team_colors)
-                tracks["players"][frame_num][item_id]['team_color'] = team_assigner.team_colors.get(team, (255, 255, 255)) # Blanco por defecto
-
-        # Procesar porteros si existen tracks para este frame
-        if frame_exists_in_goalkeepers:
-             for item_id, track_data in tracks["goalkeepers"][frame_num].items():
-                # Obtener el equipo del portero basado en su bbox en este frame
-                team = team_assigner.get_player_team(video_frames[frame_num],
-                                                     track_data['bbox'],
-                                                     item_id)
-                # Guardar la asignación de equipo y el color
-                tracks["goalkeepers"][frame_num][item_id]['team'] = team
-                tracks["goalkeepers"][frame_num][item_id]['team_color'] = team_assigner.team_colors.get(team, (255, 255, 255)) # Blanco por defecto
-    print("Asignación de equipos completada para todos los frames.")
-
-
-    # ------------------- 6. Dibujar Anotaciones -------------------
-    # Llama al método del Tracker que dibuja las elipses, triángulos, IDs, etc.,
-    # sobre los frames originales usando la información de 'tracks' (incluyendo colores de equipo).
-    print("Dibujando anotaciones en los frames...")
-    output_video_frames = tracker.draw_annotations(video_frames, tracks)
-    print("Anotaciones dibujadas.")
-
-    # ------------------- 7. Guardar Video de Salida -------------------
-    # Guarda los frames anotados como un nuevo archivo de video.
+    # ------------------- 5-7. Asignación de Equipos, Anotaciones y Video de Salida -------------------
+    # Segunda pasada en streaming sobre el video: cada frame se lee, se le asignan
+    # los equipos, se anota (en el sitio, sin copia) y se codifica antes de leer el siguiente.
+    # Los colores de equipo se determinan con los jugadores y porteros del primer frame.
+    # AnnotationRenderer dibuja lo mismo que Tracker.draw_annotations (idéntico píxel a píxel)
+    # reutilizando sprites de etiquetas y máscaras de elipses en lugar de rasterizarlas cada vez.
+    # En esa pasada se guarda además la apariencia de cada observación de jugadores y porteros
+    # (color de camiseta e histograma de color) en 'cache/appearance/', con clave el origen de
+    # los tracks y sus IDs y bboxes. Las siguientes ejecuciones con los mismos tracks
+    # asignan los equipos solo con esas características (sin leer el video), con
+    # 'team_clusters' grupos de color y la característica 'team_feature' ("color" o "histogram");
+    # al repetir la misma asignación, el resultado guardado se carga en milisegundos.
+    print("Asignando equipos, dibujando anotaciones y guardando el video de salida...")
+    team_assigner = TeamAssigner(n_clusters=team_clusters)
+    renderer = AnnotationRenderer()
     output_video_path = 'output_videos/corto_futbol_output_equipos.mp4'
-    print(f"Guardando video de salida en '{output_video_path}'...")
-    save_video(output_video_frames, output_video_path)
-    print("Video de salida guardado.")
+    # Origen de los tracks para la clave: la clave de la DetectionCache si se ha usado, el hash
+    # del .pkl en solo anotación (el video nunca se hashea en esa ruta) o, si no, el del video
+    if annotate_only:
+        source_key = file_digest(tracks_stub)
+    elif cache is not None:
+        source_key = cache.key
+    else:
+        source_key = file_digest(video_path, 'cache')
+    appearance_key = get_appearance_key(source_key, track_store, {"frames": frame_range})
+    appearance_path = os.path.join('cache', 'appearance', appearance_key + '.npy')
+    # Resultado de la asignación con características (equipo de cada track), por característica
+    # y número de grupos: al repetir la ejecución no se importa sklearn ni se ajusta KMeans
+    teams_path = os.path.join('cache', 'appearance', f'{appearance_key}_teams_{team_feature}_{team_clusters}.npz')
+    teams_assigned = os.path.exists(appearance_path) or render_workers > 1 or team_feature != "color"
+    if os.path.exists(appearance_path):
+        print(f"Apariencia de los tracks cargada de '{appearance_path}'.")
+        appearance = AppearanceStore.load(appearance_path)
+        team_assigner.assign_teams_from_features(appearance, tracks, feature=team_feature, cache_path=teams_path)
+    else:
+        appearance = AppearanceStore()
+        if teams_assigned:
+            # Los equipos se asignan antes de dibujar (para dibujar por rangos en procesos, o
+            # porque la característica elegida no es la que usa la asignación con frames):
+            # pasada previa sobre el video solo para calcular la apariencia
+            print("Calculando la apariencia de los tracks...")
+            appearance.collect(read_frames(), tracks)
+            appearance.save(appearance_path)
+            team_assigner.assign_teams_from_features(appearance, tracks, feature=team_feature, cache_path=teams_path)
+    if render_workers > 1:
+        # Se dibuja por rangos de frames en 'render_workers' procesos (equipos ya asignados)
+        render_video_parallel(video_path, tracks, output_video_path, num_workers=render_workers, fps=output_fps)
+    elif pipelined:
+        render_video_pipelined(renderer, None if teams_assigned else team_assigner, tracks, read_frames(),
+                               output_video_path, queue_size, fps=output_fps,
+                               appearance=None if teams_assigned else appearance)
+    else:
+        frames = read_frames()
+        if not teams_assigned:
+            frames = appearance.iter_collect(frames, tracks)
+            frames = team_assigner.iter_assign_teams(frames, tracks, reference_frame_idx=0)
+        output_video_frames = renderer.iter_draw_annotations(frames, tracks, copy=False)
+        save_video(output_video_frames, output_video_path, fps=output_fps)
+    if not teams_assigned:
+        appearance.save(appearance_path)
+        print(f"Apariencia de los tracks guardada en '{appearance_path}'.")
+    print(f"Video de salida guardado en '{output_video_path}'.")
+    if METRICS.enabled:
+        METRICS.stop_periodic_export()
+        METRICS.export(metrics_json, metrics_prometheus)
+        print(METRICS.format_report())
     print("¡Proceso completado!")
 
 
 # Punto de entrada del script: si se ejecuta directamente, llama a la función main()
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Detección, tracking y asignación de equipos en videos de fútbol")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="Ejecuta decodificación, inferencia, tracking, dibujo y codificación como etapas concurrentes")
+    parser.add_argument("--queue-size", type=int, default=8,
+                        help="Tamaño máximo de las colas entre etapas en modo --pipelined")
+    parser.add_argument("--skip-duplicates", action="store_true",
+                        help="Reutiliza las detecciones en frames repetidos o casi estáticos en lugar de inferirlos")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx", "onnx-int8", "openvino"],
+                        help="Motor de inferencia en CPU")
+    parser.add_argument("--batch-size", type=int, default=8,
+                        help="Frames por lote de inferencia")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Hilos de inferencia (por defecto, los del backend)")
+    parser.add_argument("--autotune", action="store_true",
+                        help="Elige lote e hilos midiendo frames/s en esta máquina (ignora --batch-size y --threads)")
+    parser.add_argument("--check-accuracy", action="store_true",
+                        help="Compara las detecciones del backend con las de PyTorch antes de procesar el video")
+    parser.add_argument("--keyframe-stride", type=int, default=0,
+                        help="Ejecuta el detector solo cada N frames e interpola el resto (0 = todos los frames)")
+    parser.add_argument("--fixed-stride", action="store_true",
+                        help="Mantiene fijo el paso de --keyframe-stride en lugar de adaptarlo al movimiento")
+    parser.add_argument("--drift-report", action="store_true",
+                        help="Con --keyframe-stride, compara los tracks con los de la detección en todos los frames")
+    parser.add_argument("--render-workers", type=int, default=1,
+                        help="Procesos para dibujar el video de salida por rangos de frames")
+    parser.add_argument("--ball-window", type=int, default=0,
+                        help="Busca el balón perdido en una ventana de este tamaño (px) a resolución nativa (0 = desactivado)")
+    parser.add_argument("--ball-max-lost", type=int, default=15,
+                        help="Frames sin balón tras los que se deja de buscar en la ventana prevista")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Mide cada etapa y muestra un resumen al terminar")
+    parser.add_argument("--metrics-json", default=None,
+                        help="Exporta las métricas en JSON a esta ruta (activa --metrics)")
+    parser.add_argument("--metrics-prom", default=None,
+                        help="Exporta las métricas en formato de texto de Prometheus a esta ruta (activa --metrics)")
+    parser.add_argument("--metrics-interval", type=float, default=0,
+                        help="Exporta las métricas cada N segundos durante la ejecución")
+    parser.add_argument("--shard-workers", type=int, default=1,
+                        help="Detecta y trackea el video por tramos en N procesos y une los IDs entre tramos")
+    parser.add_argument("--shard-overlap", type=int, default=30,
+                        help="Frames de solape entre tramos (calentamiento del tracker y unión de IDs)")
+    parser.add_argument("--live", default=None, metavar="SOURCE",
+                        help="Modo en vivo desde una cámara (índice), stream, tubería o archivo reproducido a su fps")
+    parser.add_argument("--live-sink", default="output_videos/live_output.mp4",
+                        help="Salida del modo en vivo: archivo de video, 'window' o 'null'")
+    parser.add_argument("--latency-budget", type=float, default=200,
+                        help="Presupuesto de latencia de extremo a extremo en modo en vivo (ms)")
+    parser.add_argument("--drop-policy", default="drop", choices=LatencyBudget.POLICIES,
+                        help="Con retraso: 'drop' descarta frames, 'skip' los emite sin detección")
+    parser.add_argument("--live-buffer", type=int, default=1,
+                        help="Frames que la fuente en vivo guarda como máximo (los más antiguos se descartan)")
+    parser.add_argument("--start", type=float, default=None,
+                        help="Procesa el video desde este segundo (salta sin decodificar lo anterior)")
+    parser.add_argument("--end", type=float, default=None,
+                        help="Procesa el video hasta este segundo")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="Procesa solo uno de cada N frames (el video de salida tiene fps / N)")
+    parser.add_argument("--inference-size", type=int, default=None,
+                        help="Reduce los frames a este lado mayor (px) para el modelo y devuelve las cajas a resolución completa")
+    parser.add_argument("--tracks-stub", default=None,
+                        help="Si el .pkl existe, solo anota con esos tracks (sin modelo); si no, guarda en él los tracks calculados")
+    parser.add_argument("--team-clusters", type=int, default=2,
+                        help="Número de grupos de color para los equipos (p. ej. 3 o 4 para separar porteros)")
+    parser.add_argument("--team-feature", choices=["color", "histogram"], default="color",
+                        help="Característica de apariencia con la que se agrupan los equipos")
+    args = parser.parse_args()
+    if (args.start is not None or args.end is not None or args.stride != 1) and \
+            (args.shard_workers > 1 or args.render_workers > 1):
+        parser.error("--start, --end y --stride no se pueden combinar con --shard-workers ni --render-workers")
+    if args.keyframe_stride > 1 and args.shard_workers > 1:
+        parser.error("--keyframe-stride no se puede combinar con --shard-workers")
+    main(pipelined=args.pipelined, queue_size=args.queue_size, skip_duplicates=args.skip_duplicates,
+         backend=args.backend, batch_size=args.batch_size, num_threads=args.threads,
+         autotune=args.autotune, check_accuracy=args.check_accuracy, keyframe_stride=args.keyframe_stride,
+         adaptive_stride=not args.fixed_stride, report_drift=args.drift_report,
+         render_workers=args.render_workers, ball_window=args.ball_window, ball_max_lost=args.ball_max_lost,
+         metrics=args.metrics, metrics_json=args.metrics_json, metrics_prometheus=args.metrics_prom,
+         metrics_interval=args.metrics_interval, shard_workers=args.shard_workers,
+         shard_overlap=args.shard_overlap, live_source=args.live, live_sink=args.live_sink,
+         latency_budget=args.latency_budget / 1000, drop_policy=args.drop_policy, live_buffer=args.live_buffer,
+         start_time=args.start, end_time=args.end, stride=args.stride, inference_size=args.inference_size,
+         tracks_stub=args.tracks_stub, team_clusters=args.team_clusters, team_feature=args.team_feature)
\ No newline at end of file
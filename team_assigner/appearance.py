@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+from .team_assigner import crop_top_half, two_means_colors
+sys.path.append("/..")
+from trackers.track_store import OBJECT_TYPE_CODES
+
+# Objetos a los que se asigna equipo (y de los que se guarda la apariencia)
+APPEARANCE_TYPES = ("players", "goalkeepers")
+
+
+def appearance_dtype(bins=4):
+    # Una fila por observación de un track: color de camiseta (el mismo de get_player_colors)
+    # e histograma BGR de la mitad superior del bbox con 'bins' niveles por canal
+    return np.dtype([
+        ("frame", "<i4"),
+        ("object_type", "<i1"),  # Índice en APPEARANCE_TYPES
+        ("track_id", "<i4"),
+        ("color", "<f4", (3,)),
+        ("histogram", "<f4", (bins ** 3,)),
+    ])
+
+
+def color_histograms(crops, bins=4):
+    # Histograma de color normalizado (suma 1) de cada recorte; vacío -> ceros
+    histograms = np.zeros((len(crops), bins ** 3), dtype=np.float32)
+    for i, crop in enumerate(crops):
+        if crop.size == 0:
+            continue
+        levels = crop.reshape(-1, 3).astype(np.int32) * bins // 256
+        counts = np.bincount((levels[:, 0] * bins + levels[:, 1]) * bins + levels[:, 2], minlength=bins ** 3)
+        histograms[i] = counts / counts.sum()
+    return histograms
+
+
+def get_appearance_key(source_key, track_store, params):
+    # Clave de la caché de apariencia: identificador del origen de los tracks (clave de la
+    # DetectionCache, hash del stub o del video) + IDs y bboxes de los tracks + parámetros.
+    # Los tracks se hashean con las columnas del TrackStore apiladas (un solo sha.update, sin
+    # bucles por observación). Sin TrackStore (solo anotación) los tracks son los del .pkl,
+    # cuyo hash ya es 'source_key'.
+    sha = hashlib.sha256()
+    sha.update(source_key.encode("ascii"))
+    if track_store is not None:
+        len(track_store)  # Consolida las filas pendientes
+        rows = np.isin(track_store.object_type, [OBJECT_TYPE_CODES[object_type] for object_type in APPEARANCE_TYPES])
+        columns = np.column_stack([track_store.frame[rows], track_store.object_type[rows],
+                                   track_store.track_id[rows], track_store.bbox[rows]]).astype(np.float64)
+        sha.update(columns.tobytes())
+    sha.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return sha.hexdigest()[:32]
+
+
+class AppearanceStore:
+    # Características de apariencia de cada observación (frame, track) de jugadores y porteros.
+    # Se calculan una vez leyendo el video y se guardan en disco junto a los tracks: con ellas
+    # TeamAssigner asigna equipos (con otros clusters o características) sin volver a leer el video.
+    def __init__(self, bins=4):
+        self.bins = bins
+        self.dtype = appearance_dtype(bins)
+        self._frames = []
+        self._rows = None
+        self._first_rows = None
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = np.concatenate(self._frames) if self._frames else np.empty(0, dtype=self.dtype)
+        return self._rows
+
+    def add_frame(self, frame_num, frame, tracks):
+        crops, keys = [], []
+        for type_idx, object_type in enumerate(APPEARANCE_TYPES):
+            if len(tracks.get(object_type, [])) <= frame_num:
+                continue
+            for track_id, track in tracks[object_type][frame_num].items():
+                crops.append(crop_top_half(frame, track["bbox"]))
+                keys.append((type_idx, track_id))
+        rows = np.empty(len(crops), dtype=self.dtype)
+        rows["frame"] = frame_num
+        if crops:
+            rows["object_type"], rows["track_id"] = np.array(keys).T
+            rows["color"] = two_means_colors(crops)
+            rows["histogram"] = color_histograms(crops, self.bins)
+        self._frames.append(rows)
+        self._rows = None
+        self._first_rows = None
+
+    def iter_collect(self, frames, tracks):
+        # Calcula la apariencia de cada frame y lo devuelve, para encadenarlo con otras etapas
+        for frame_num, frame in enumerate(frames):
+            self.add_frame(frame_num, frame, tracks)
+            yield frame
+
+    def collect(self, frames, tracks):
+        for _ in self.iter_collect(frames, tracks):
+            pass
+        return self
+
+    def frame_rows(self, frame_num):
+        rows = self.rows
+        return rows[rows["frame"] == frame_num]
+
+    def first_rows(self):
+        # Primera observación de cada track (la que usa get_player_team para decidir su equipo)
+        if self._first_rows is None:
+            rows = self.rows
+            order = np.lexsort((rows["frame"], rows["track_id"]))
+            _, first = np.unique(rows["track_id"][order], return_index=True)
+            self._first_rows = rows[order[first]]
+        return self._first_rows
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, self.rows)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        rows = np.load(path)
+        store = cls(bins=round(rows.dtype["histogram"].shape[0] ** (1 / 3)))
+        store._frames = [rows]
+        return store
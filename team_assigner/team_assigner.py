@@ -1,21 +1,124 @@
-from sklearn.cluster import KMeans
+import json
+import os
+import numpy as np
+import sys
+import time
+sys.path.append("/..")
+from utils import METRICS
+
+# Diferencia máxima admitida (por canal BGR) entre el color del kernel vectorizado
+# y el del KMeans por recorte original (ver benchmarks/team_colors.py)
+COLOR_TOLERANCE = 10.0
+
+
+def crop_top_half(frame, bbox):
+    image = frame[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])] #Corte la imagen del jugador usando las coordenadas del bounding box
+    return image[0:int(image.shape[0]/2),:] #Corte la mitad superior de la imagen
+
+
+def two_means_colors(crops, n_iter=10, sample_step=4):
+    # 2-means con número fijo de iteraciones para todos los recortes a la vez.
+    # Los píxeles de cada recorte se copian en un tensor (recortes, píxeles, 3) relleno
+    # con ceros y una máscara de píxeles válidos: asignación y medias de cada iteración
+    # son dos productos matriciales por lotes, sin bucles de Python por recorte.
+    # Devuelve el color del jugador de cada recorte con la misma heurística que
+    # get_player_color_kmeans: el cluster mayoritario en las 4 esquinas es el fondo.
+    colors = np.zeros((len(crops), 3))
+    valid = [i for i, crop in enumerate(crops) if crop.shape[0] * crop.shape[1] > 0]
+    if not valid:
+        return colors  # Los recortes vacíos se quedan con color (0, 0, 0)
+    heights = np.array([crops[i].shape[0] for i in valid])
+    widths = np.array([crops[i].shape[1] for i in valid])
+    sizes = heights * widths
+    pixels = np.zeros((len(valid), sizes.max(), 3), dtype=np.float32)
+    for row, i in enumerate(valid):
+        pixels[row, :sizes[row]] = crops[i].reshape(-1, 3)
+    mask = np.arange(sizes.max())[None, :] < sizes[:, None]
+
+    def assign(pixels, mask, center_0, center_1):
+        # |p - c1|² < |p - c0|²  <=>  p·2(c1 - c0) > |c1|² - |c0|²  (una proyección por píxel)
+        weights = (2 * (center_1 - center_0)).astype(np.float32)
+        bias = (center_1 ** 2).sum(axis=1) - (center_0 ** 2).sum(axis=1)
+        projection = np.matmul(pixels, weights[:, :, None])[:, :, 0]
+        return (projection > bias[:, None]) & mask
+
+    def update(pixels, mask, totals, labels, center_0, center_1):
+        # Nuevas medias por recorte; un cluster vacío conserva su centro anterior
+        labels = labels.astype(np.float32)
+        counts_1 = labels.sum(axis=1, dtype=np.float64)
+        counts_0 = mask.sum(axis=1) - counts_1
+        sums_1 = np.matmul(labels[:, None, :], pixels)[:, 0].astype(np.float64)
+        sums_0 = totals - sums_1
+        center_0 = np.where(counts_0[:, None] > 0, sums_0 / np.maximum(counts_0, 1)[:, None], center_0)
+        center_1 = np.where(counts_1[:, None] > 0, sums_1 / np.maximum(counts_1, 1)[:, None], center_1)
+        return center_0, center_1
+
+    def channel_sums(pixels, mask):
+        # Suma por recorte de cada canal (como producto matricial, mucho más rápido que sum)
+        return np.matmul(mask.astype(np.float32)[:, None, :], pixels)[:, 0].astype(np.float64)
+
+    # Inicialización determinista: centro 0 = píxel de la esquina superior izquierda
+    # (fondo), centro 1 = píxel del recorte más alejado de él:
+    # |p - p0|² = |p|² - 2·p·p0 + |p0|²
+    rows = np.arange(len(valid))
+    center_0 = pixels[:, 0].astype(np.float64)
+    squared_norms = np.matmul(pixels * pixels, np.ones((3, 1), dtype=np.float32))[:, :, 0]
+    dist = squared_norms - 2 * np.matmul(pixels, pixels[:, 0, :, None])[:, :, 0] + squared_norms[:, :1]
+    center_1 = pixels[rows, np.where(mask, dist, -1).argmax(axis=1)].astype(np.float64)
+
+    # Las iteraciones se hacen sobre 1 de cada 'sample_step' píxeles y la última
+    # asignación y actualización de centros, sobre todos los píxeles
+    sampled_pixels = np.ascontiguousarray(pixels[:, ::sample_step])
+    sampled_mask = mask[:, ::sample_step]
+    sampled_totals = channel_sums(sampled_pixels, sampled_mask)
+    for _ in range(n_iter):
+        labels = assign(sampled_pixels, sampled_mask, center_0, center_1)
+        center_0, center_1 = update(sampled_pixels, sampled_mask, sampled_totals, labels, center_0, center_1)
+    labels = assign(pixels, mask, center_0, center_1)
+    center_0, center_1 = update(pixels, mask, channel_sums(pixels, mask), labels, center_0, center_1)
+    labels = assign(pixels, mask, center_0, center_1)
+
+    # Heurística de las esquinas: el cluster mayoritario en las esquinas es el fondo
+    corners = np.stack([np.zeros_like(sizes), widths - 1, (heights - 1) * widths, sizes - 1], axis=1)
+    corner_ones = labels[rows[:, None], corners].sum(axis=1)
+    player_cluster = (corner_ones <= 2).astype(int)  # Empate -> fondo = cluster 0
+    colors[valid] = np.where(player_cluster[:, None] == 1, center_1, center_0)
+    return colors
+
 
 class TeamAssigner:
-    def __init__(self):
+    # 'n_clusters': número de grupos de color (2 equipos; más para separar porteros o árbitros)
+    def __init__(self, n_clusters=2):
+        self.n_clusters = n_clusters
         self.team_colors = {}
         self.player_team_dict = {}
+        self.empty_team = None  # Equipo de los tracks sin características guardadas
+
+
+    def warmup(self):
+        # Importa sklearn y hace un ajuste de KMeans y una pasada del kernel de colores de prueba
+        # (el primero paga la importación y la inicialización): en vivo ese coste no cae en el
+        # primer frame con jugadores. No guarda ningún modelo.
+        start = time.perf_counter()
+        from sklearn.cluster import KMeans
+        samples = np.random.default_rng(0).uniform(0, 255, (4 * self.n_clusters, 3))
+        KMeans(n_clusters=self.n_clusters, init="k-means++", n_init=1).fit(samples).predict(samples[:1])
+        two_means_colors([np.zeros((16, 8, 3), dtype=np.uint8)])
+        return time.perf_counter() - start
 
 
     def get_clustering_model(self, image, n_clusters=2):
+        from sklearn.cluster import KMeans  # Importación diferida: sklearn tarda en cargarse
         image_2d = image.reshape((-1, 3)) #Aplano la imagen a 2D    
         kmeans = KMeans(n_clusters=n_clusters, init="k-means++", n_init=1) #Aplico el modelo de clustering KMeans
         kmeans.fit(image_2d) #Entreno el modelo de clustering KMeans
         return kmeans
 
 
-    def get_player_color(self, frame, bbox):
-        image = frame[int(bbox[1]):int(bbox[3]), int(bbox[0]):int(bbox[2])] #Corte la imagen del jugador usando las coordenadas del bounding box
-        top_half_image = image[0:int(image.shape[0]/2),:] #Corte la mitad superior de la imagen
+    def get_player_color_kmeans(self, frame, bbox):
+        # Versión original (un KMeans de sklearn por recorte). Se mantiene como referencia
+        # para comprobar y medir el kernel vectorizado de get_player_colors.
+        top_half_image = crop_top_half(frame, bbox)
         kmeans = self.get_clustering_model(top_half_image, n_clusters=2) #Aplico el modelo de clustering KMeans a la mitad superior de la imagen
         labels = kmeans.labels_ #Obtengo las etiquetas de los clusters
         clustered_image = labels.reshape(top_half_image.shape[0], top_half_image.shape[1]) #Reformo la imagen a su forma original
@@ -25,28 +128,189 @@ class TeamAssigner:
         player_color = kmeans.cluster_centers_[player_cluster]
         return player_color
 
+    def get_player_colors(self, frame, bboxes):
+        # Colores de camiseta de todos los bboxes de un frame en una sola pasada vectorizada
+        return two_means_colors([crop_top_half(frame, bbox) for bbox in bboxes])
+
+    def get_player_colors_frames(self, frames, bboxes_per_frame):
+        # Igual que get_player_colors pero para los bboxes de varios frames a la vez
+        crops = [crop_top_half(frame, bbox) for frame, bboxes in zip(frames, bboxes_per_frame) for bbox in bboxes]
+        return two_means_colors(crops)
+
+    def get_player_color(self, frame, bbox):
+        return self.get_player_colors(frame, [bbox])[0]
+
     def assign_team_color(self, frame, player_detections):
-        player_colors = []
-        for _, player_detection in player_detections.items():
-            bbox = player_detection["bbox"]
-            player_color = self.get_player_color(frame, bbox)
-            player_colors.append(player_color)
+        # Ajusta los colores de equipo con los jugadores de un frame; False si son menos que n_clusters
+        if len(player_detections) < self.n_clusters:
+            return False
+        bboxes = [player_detection["bbox"] for player_detection in player_detections.values()]
+        player_colors = self.get_player_colors(frame, bboxes)
+
+        return self.fit_teams(player_colors)
 
-        kmeans = KMeans(n_clusters=2, init="k-means++", n_init=1) #Aplico el modelo de clustering KMeans
-        kmeans.fit(player_colors)
+    def fit_teams(self, features, colors=None):
+        # KMeans sobre las características ('features', una fila por jugador); el color de cada
+        # equipo es el centro de su cluster si las características son los propios colores, o
+        # la media de los colores ('colors') de sus jugadores si no (p. ej. histogramas).
+        # Con menos muestras que clusters no se ajusta nada y devuelve False.
+        if len(features) < self.n_clusters:
+            return False
+        from sklearn.cluster import KMeans  # Importación diferida: sklearn tarda en cargarse
+        features = np.asarray(features, dtype=np.float64)  # Colores en float64, como los de get_player_colors
+        with METRICS.stage("team_kmeans"):
+            kmeans = KMeans(n_clusters=self.n_clusters, init="k-means++", n_init=1) #Aplico el modelo de clustering KMeans
+            kmeans.fit(features)
 
         self.kmeans = kmeans #Guardo el modelo de clustering KMeans
 
-        self.team_colors[1] = kmeans.cluster_centers_[0] #Asigno el color del equipo 1
-        self.team_colors[2] = kmeans.cluster_centers_[1] #Asigno el color del equipo 2
+        for cluster in range(self.n_clusters):
+            if colors is None:
+                self.team_colors[cluster + 1] = kmeans.cluster_centers_[cluster]
+            else:
+                self.team_colors[cluster + 1] = np.asarray(colors, dtype=np.float64)[kmeans.labels_ == cluster].mean(axis=0)
+        return True
         
         
     def get_player_team(self, frame, player_bbox, player_id):
         # Asigna el equipo según el color del jugador
         if player_id in self.player_team_dict:
+            METRICS.cache("player_team_dict", hits=1)
             return self.player_team_dict[player_id]
+        METRICS.cache("player_team_dict", misses=1)
         player_color = self.get_player_color(frame, player_bbox) #Obtengo el color del jugador
         team_id = self.kmeans.predict(player_color.reshape(1,-1))[0] #Asigno el equipo según el color del jugador
         team_id += 1
         self.player_team_dict[player_id] = team_id
-        return team_id
\ No newline at end of file
+        return team_id
+
+    def get_players_teams(self, frame, player_detections):
+        # Equipos de todos los jugadores de un frame: los colores de los que aún no
+        # tienen equipo se calculan en un único lote y se predicen juntos
+        new_ids = [player_id for player_id in player_detections if player_id not in self.player_team_dict]
+        METRICS.cache("player_team_dict", hits=len(player_detections) - len(new_ids), misses=len(new_ids))
+        if new_ids:
+            player_colors = self.get_player_colors(frame, [player_detections[player_id]["bbox"] for player_id in new_ids])
+            team_ids = self.kmeans.predict(player_colors) + 1
+            for player_id, team_id in zip(new_ids, team_ids):
+                self.player_team_dict[player_id] = team_id
+        return {player_id: self.player_team_dict[player_id] for player_id in player_detections}
+
+
+    def assign_frame_teams(self, frame, frame_num, tracks):
+        # Asigna equipo (y color) a cada jugador/portero de un frame dentro de 'tracks'
+        with METRICS.stage("teams"):
+            self._assign_frame_teams(frame, frame_num, tracks)
+
+    def _assign_frame_teams(self, frame, frame_num, tracks):
+        for object_type in ("players", "goalkeepers"):
+            # Puede haber menos frames en tracks si hubo error
+            if len(tracks.get(object_type, [])) <= frame_num:
+                continue
+            frame_detections = tracks[object_type][frame_num]
+            teams = self.get_players_teams(frame, frame_detections)
+            for item_id, track_data in frame_detections.items():
+                team = teams[item_id]
+                track_data['team'] = team
+                track_data['team_color'] = self.team_colors.get(team, (255, 255, 255)) # Blanco por defecto
+
+    def iter_assign_teams(self, frames, tracks, reference_frame_idx=0):
+        # Recorre cualquier iterable de frames asignando equipos frame a frame y
+        # devuelve cada frame al terminar, para encadenarlo con el dibujo y la escritura.
+        # Los colores de equipo se determinan con el frame 'reference_frame_idx' o, si no tiene
+        # al menos n_clusters jugadores/porteros, con el primero de los siguientes que los tenga.
+        for frame_num, frame in enumerate(frames):
+            if frame_num >= reference_frame_idx and not hasattr(self, "kmeans"):
+                players = tracks.get("players", [])
+                goalkeepers = tracks.get("goalkeepers", [])
+                initial_detections = {
+                    **(players[frame_num] if len(players) > frame_num else {}),
+                    **(goalkeepers[frame_num] if len(goalkeepers) > frame_num else {})
+                }
+                if not self.assign_team_color(frame, initial_detections) and frame_num == reference_frame_idx:
+                    print(f"Advertencia: Menos de {self.n_clusters} jugadores o porteros en el frame {frame_num}. "
+                          f"Los colores de equipo se asignarán con el primer frame que los tenga.")
+            if frame_num >= reference_frame_idx and hasattr(self, "kmeans"):
+                self.assign_frame_teams(frame, frame_num, tracks)
+            yield frame
+
+    # ---- Asignación a partir de las características guardadas (AppearanceStore), sin el video ----
+    # 'feature': "color" (color de camiseta, como la asignación con frames) o "histogram"
+
+    def assign_team_color_from_features(self, appearance, frame_num=0, feature="color"):
+        rows = appearance.frame_rows(frame_num)
+        if not self.fit_teams(rows[feature], None if feature == "color" else rows["color"]):
+            return False
+        self.first_rows = appearance.first_rows()
+        return True
+
+    def assign_teams_from_features(self, appearance, tracks, reference_frame_idx=0, feature="color", cache_path=None):
+        # Asigna equipo y color a todos los jugadores y porteros de 'tracks' (en todos los frames)
+        # con un único predict sobre la primera observación de cada track. Los colores de equipo
+        # se ajustan con el primer frame desde 'reference_frame_idx' con al menos n_clusters jugadores.
+        # Un track sin características guardadas (p. ej. en frames que el video no llegó a tener)
+        # recibe el equipo más cercano a una apariencia vacía, el mismo que la asignación con
+        # frames da a un recorte sin píxeles (color (0, 0, 0)): todos los jugadores tienen equipo.
+        # Con 'cache_path' el resultado (equipo de cada track y colores de equipo) se guarda en
+        # disco y las siguientes ejecuciones lo cargan sin importar sklearn ni ajustar KMeans.
+        with METRICS.stage("teams"):
+            if cache_path is not None and self.load_teams(cache_path, reference_frame_idx, feature):
+                METRICS.cache("teams", hits=1)
+            else:
+                if cache_path is not None:
+                    METRICS.cache("teams", misses=1)
+                if not self.fit_teams_from_features(appearance, reference_frame_idx, feature):
+                    print(f"Advertencia: Ningún frame tiene {self.n_clusters} jugadores o porteros. No se pueden asignar colores de equipo.")
+                    return False
+                if cache_path is not None:
+                    self.save_teams(cache_path, reference_frame_idx, feature)
+            for object_type in ("players", "goalkeepers"):
+                for frame_detections in tracks.get(object_type, []):
+                    for item_id, track_data in frame_detections.items():
+                        team = self.player_team_dict.get(item_id, self.empty_team)
+                        track_data['team'] = team
+                        track_data['team_color'] = self.team_colors.get(team, (255, 255, 255)) # Blanco por defecto
+        return True
+
+    def fit_teams_from_features(self, appearance, reference_frame_idx=0, feature="color"):
+        # Ajusta los colores de equipo y predice el equipo de la primera observación de cada track
+        frame_nums, counts = np.unique(appearance.rows["frame"], return_counts=True)
+        candidates = frame_nums[(frame_nums >= reference_frame_idx) & (counts >= self.n_clusters)]
+        if len(candidates) == 0 or not self.assign_team_color_from_features(appearance, int(candidates[0]), feature):
+            return False
+        rows = self.first_rows
+        new = ~np.isin(rows["track_id"], list(self.player_team_dict))
+        if new.any():
+            team_ids = self.kmeans.predict(rows[feature][new].astype(np.float64)) + 1
+            self.player_team_dict.update(zip(rows["track_id"][new].tolist(), team_ids.tolist()))
+        self.empty_team = int(self.kmeans.predict(np.zeros((1, rows.dtype[feature].shape[0])))[0]) + 1
+        return True
+
+    def save_teams(self, path, reference_frame_idx=0, feature="color"):
+        # Guarda el equipo de cada track y los colores de equipo junto con los parámetros del ajuste
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        teams = sorted(self.team_colors)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, track_ids=np.array(list(self.player_team_dict), dtype=np.int64),
+                     track_teams=np.array(list(self.player_team_dict.values()), dtype=np.int64),
+                     teams=np.array(teams, dtype=np.int64),
+                     team_colors=np.array([self.team_colors[team] for team in teams], dtype=np.float64).reshape(-1, 3),
+                     empty_team=self.empty_team,
+                     params=json.dumps({"n_clusters": self.n_clusters, "feature": feature,
+                                        "reference_frame_idx": reference_frame_idx}))
+        os.replace(tmp_path, path)
+
+    def load_teams(self, path, reference_frame_idx=0, feature="color"):
+        # Carga un resultado de save_teams; False si no existe, es de otro ajuste o no guarda el
+        # equipo de la apariencia vacía (ficheros anteriores a 'empty_team': se vuelven a ajustar)
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as data:
+            params = {"n_clusters": self.n_clusters, "feature": feature, "reference_frame_idx": reference_frame_idx}
+            if "empty_team" not in data.files or json.loads(str(data["params"])) != params:
+                return False
+            self.player_team_dict.update(zip(data["track_ids"].tolist(), data["track_teams"].tolist()))
+            self.team_colors = dict(zip(data["teams"].tolist(), data["team_colors"]))
+            self.empty_team = int(data["empty_team"])
+        return True
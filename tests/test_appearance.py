@@ -0,0 +1,162 @@
+import copy
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from team_assigner import TeamAssigner, AppearanceStore, get_appearance_key
+from team_assigner.team_assigner import COLOR_TOLERANCE
+from trackers.track_store import TrackStore
+
+GRASS = (40, 140, 40)
+TEAM_COLORS = [(30, 30, 200), (220, 220, 220)]
+
+
+def make_video(num_frames=4, num_players=8, size=(240, 640), seed=0):
+    # Jugadores en fila que avanzan 3 px por frame; los de ID par visten el color del equipo 0.
+    # El portero (ID 20) viste como el equipo 1. Los IDs 1-2 solo aparecen desde el frame 2.
+    rng = np.random.default_rng(seed)
+    frames, tracks = [], {"players": [], "goalkeepers": [], "referees": [], "ball": [], "managers": []}
+    for frame_num in range(num_frames):
+        frame = np.clip(rng.normal(GRASS, 6, size + (3,)), 0, 255).astype(np.uint8)
+        players, goalkeepers = {}, {}
+        for i, track_id in enumerate(list(range(3, 3 + num_players)) + [1, 2, 20]):
+            if track_id in (1, 2) and frame_num < 2:
+                continue
+            x1, y1 = 10 + 55 * (i % 11) + 3 * frame_num, 20 + 110 * (i // 11)
+            bbox = [float(x1), float(y1), float(x1 + 40), float(y1 + 90)]
+            jersey = np.clip(rng.normal(TEAM_COLORS[track_id % 2 if track_id != 20 else 1], 6, (33, 28, 3)), 0, 255)
+            frame[y1 + 6:y1 + 39, x1 + 6:x1 + 34] = jersey.astype(np.uint8)
+            frame[y1 + 45:y1 + 90, x1 + 8:x1 + 32] = (20, 20, 20)
+            (goalkeepers if track_id == 20 else players)[track_id] = {"bbox": bbox}
+        tracks["players"].append(players)
+        tracks["goalkeepers"].append(goalkeepers)
+        for object_type in ("referees", "ball", "managers"):
+            tracks[object_type].append({})
+        frames.append(frame)
+    return frames, tracks
+
+
+def track_teams(tracks):
+    teams = {}
+    for object_type in ("players", "goalkeepers"):
+        for frame_tracks in tracks[object_type]:
+            for track_id, track in frame_tracks.items():
+                assert teams.setdefault(track_id, track["team"]) == track["team"]  # Un equipo por track
+    return teams
+
+
+def same_partition(teams, other):
+    assert teams.keys() == other.keys()
+    mapping = {}
+    return all(mapping.setdefault(team, other[track_id]) == other[track_id] for track_id, team in teams.items()) \
+        and len(set(mapping.values())) == len(mapping)
+
+
+def test_store_rows_and_first_rows():
+    frames, tracks = make_video()
+    store = AppearanceStore().collect(frames, tracks)
+    assert len(store.rows) == sum(len(frame_tracks) for object_type in ("players", "goalkeepers")
+                                  for frame_tracks in tracks[object_type])
+    assert sorted(store.frame_rows(0)["track_id"].tolist()) == list(range(3, 11)) + [20]
+    first_rows = store.first_rows()
+    assert sorted(first_rows["track_id"].tolist()) == [1, 2] + list(range(3, 11)) + [20]
+    assert dict(zip(first_rows["track_id"].tolist(), first_rows["frame"].tolist()))[1] == 2
+    np.testing.assert_allclose(store.rows["histogram"].sum(axis=1), 1, rtol=1e-5)
+    goalkeeper = store.rows[store.rows["track_id"] == 20]
+    assert (goalkeeper["object_type"] == 1).all()
+
+
+def test_save_and_load(tmp_path):
+    frames, tracks = make_video()
+    store = AppearanceStore(bins=3).collect(frames, tracks)
+    path = str(tmp_path / "appearance" / "key.npy")
+    store.save(path)
+    loaded = AppearanceStore.load(path)
+    assert loaded.bins == 3
+    assert loaded.rows.tobytes() == store.rows.tobytes()
+    assert loaded.first_rows().tobytes() == store.first_rows().tobytes()
+
+
+def test_appearance_key():
+    _, tracks = make_video()
+    store = TrackStore.from_dict(tracks)
+    key = get_appearance_key("source", store, {"frames": None})
+    assert get_appearance_key("source", TrackStore.from_dict(tracks), {"frames": None}) == key
+    assert get_appearance_key("other", store, {"frames": None}) != key
+    assert get_appearance_key("source", store, {"frames": {"start": 0, "end": 10, "stride": 2}}) != key
+    moved = copy.deepcopy(tracks)
+    moved["players"][1][3]["bbox"][0] += 1
+    assert get_appearance_key("source", TrackStore.from_dict(moved), {"frames": None}) != key
+    # El balón y los árbitros no cuentan: no tienen apariencia
+    tracks["ball"][0][1] = {"bbox": [0.0, 0.0, 2.0, 2.0]}
+    assert get_appearance_key("source", TrackStore.from_dict(tracks), {"frames": None}) == key
+    # Solo anotación: sin TrackStore la clave es la del origen (el hash del .pkl)
+    assert get_appearance_key("source", None, {}) == get_appearance_key("source", None, {})
+
+
+@pytest.mark.parametrize("feature", ["color", "histogram"])
+def test_features_match_the_pixel_path(feature):
+    frames, tracks = make_video()
+    pixel_tracks = copy.deepcopy(tracks)
+    for _ in TeamAssigner().iter_assign_teams(frames, pixel_tracks):
+        pass
+
+    team_assigner = TeamAssigner()
+    assert team_assigner.assign_teams_from_features(AppearanceStore().collect(frames, tracks), tracks, feature=feature)
+    teams = track_teams(tracks)
+    assert same_partition(teams, track_teams(pixel_tracks))
+    assert teams[20] == teams[3]  # El portero viste como el equipo 1
+    colors = sorted(tuple(np.round(color)) for color in team_assigner.team_colors.values())
+    assert np.abs(np.array(colors) - np.array(sorted(TEAM_COLORS))).max() <= COLOR_TOLERANCE
+
+
+def test_track_without_features_gets_the_empty_crop_team():
+    frames, tracks = make_video()
+    appearance = AppearanceStore().collect(frames[:3], tracks)  # El video acaba un frame antes
+    tracks["players"][3][99] = {"bbox": [600.0, 200.0, 640.0, 240.0]}
+    team_assigner = TeamAssigner()
+    team_assigner.assign_teams_from_features(appearance, tracks)
+    team = tracks["players"][3][99]["team"]
+    assert team is not None
+    assert team == team_assigner.kmeans.predict(np.zeros((1, 3)))[0] + 1
+    assert tracks["players"][3][99]["team_color"] is team_assigner.team_colors[team]
+
+
+def test_cached_result_skips_the_fit(tmp_path, monkeypatch):
+    frames, tracks = make_video()
+    appearance = AppearanceStore().collect(frames, tracks)
+    cache_path = str(tmp_path / "teams.npz")
+    TeamAssigner().assign_teams_from_features(appearance, tracks, cache_path=cache_path)
+    expected = track_teams(tracks)
+
+    def no_fit(*args, **kwargs):
+        raise AssertionError("KMeans no debe ajustarse con el resultado en caché")
+
+    monkeypatch.setattr(TeamAssigner, "fit_teams", no_fit)
+    team_assigner = TeamAssigner()
+    assert team_assigner.assign_teams_from_features(appearance, copy.deepcopy(tracks), cache_path=cache_path)
+    fresh = copy.deepcopy(tracks)
+    team_assigner.assign_teams_from_features(appearance, fresh, cache_path=cache_path)
+    assert track_teams(fresh) == expected
+    # Con otros parámetros del ajuste el resultado guardado no sirve
+    with pytest.raises(AssertionError, match="KMeans"):
+        TeamAssigner(n_clusters=3).assign_teams_from_features(appearance, tracks, cache_path=cache_path)
+
+
+def test_cached_result_without_empty_team_is_refitted(tmp_path):
+    frames, tracks = make_video()
+    appearance = AppearanceStore().collect(frames, tracks)
+    cache_path = str(tmp_path / "teams.npz")
+    TeamAssigner().assign_teams_from_features(appearance, copy.deepcopy(tracks), cache_path=cache_path)
+    with np.load(cache_path) as data:
+        old = {name: data[name] for name in data.files if name != "empty_team"}
+    with open(cache_path, "wb") as f:
+        np.savez(f, **old)
+
+    team_assigner = TeamAssigner()
+    assert not team_assigner.load_teams(cache_path)
+    assert team_assigner.assign_teams_from_features(appearance, tracks, cache_path=cache_path)
+    assert team_assigner.empty_team is not None
+    assert TeamAssigner().load_teams(cache_path)  # Reescrito con el formato actual
@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+sv = pytest.importorskip("supervision")
+
+from trackers.ball_refiner import BallRefiner
+
+HEIGHT, WIDTH = 360, 640
+
+
+class WhiteBallBackend:
+    # Detector de prueba para las ventanas: el balón es el bloque de píxeles blancos del recorte
+    names = {0: "ball", 1: "player"}
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, frames, conf, imgsz=None, classes=None):
+        self.calls.append(([frame.shape[:2] for frame in frames], imgsz, classes))
+        detections = []
+        for frame in frames:
+            ys, xs = np.nonzero(np.all(frame == 255, axis=2))
+            if len(ys) == 0:
+                detections.append(sv.Detections.empty())
+                continue
+            xyxy = np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], dtype=np.float32)
+            detections.append(sv.Detections(xyxy=xyxy, confidence=np.array([0.3], dtype=np.float32),
+                                            class_id=np.array([0])))
+        return detections
+
+
+def make_frame(ball_center=None):
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    if ball_center is not None:
+        x, y = int(ball_center[0]), int(ball_center[1])
+        frame[y - 3:y + 3, x - 3:x + 3] = 255
+    return frame
+
+
+def ball_detection(center):
+    x, y = center
+    return sv.Detections(xyxy=np.array([[x - 3, y - 3, x + 3, y + 3]], dtype=np.float32),
+                         confidence=np.array([0.9], dtype=np.float32), class_id=np.array([0]))
+
+
+def player_only():
+    return sv.Detections(xyxy=np.array([[10, 10, 50, 90]], dtype=np.float32),
+                         confidence=np.array([0.9], dtype=np.float32), class_id=np.array([1]))
+
+
+def ball_xyxy(detection):
+    return detection.xyxy[detection.class_id == 0]
+
+
+def test_window_is_centred_and_clamped():
+    refiner = BallRefiner(window=100)
+    shape = (HEIGHT, WIDTH, 3)
+    assert refiner.get_window(shape, (320, 180)) == (270, 130, 370, 230)
+    assert refiner.get_window(shape, (10, 20)) == (0, 0, 100, 100)
+    assert refiner.get_window(shape, (WIDTH + 50, HEIGHT - 5)) == (WIDTH - 100, HEIGHT - 100, WIDTH, HEIGHT)
+    assert refiner.get_window(shape, (-40, 300)) == (0, 250, 100, 350)
+    # Ventana mayor que el frame: se reduce al frame
+    assert BallRefiner(window=500).get_window(shape, (600, 10)) == (140, 0, 640, HEIGHT)
+
+
+def test_predicted_center_is_linear():
+    refiner = BallRefiner()
+    refiner.observe(0, (100, 100))
+    assert refiner.predict_center(5).tolist() == [100, 100]
+    refiner.observe(2, (110, 104))
+    assert refiner.predict_center(4).tolist() == [120, 108]
+
+
+def test_lost_ball_is_found_in_the_window_and_mapped_to_frame_coordinates():
+    backend = WhiteBallBackend()
+    refiner = BallRefiner(window=100)
+    # Frames 0 y 1: balón en la detección completa moviéndose 10 px/frame; frame 2: perdido
+    centers = [(300, 200), (310, 205), (320, 210)]
+    frames = [make_frame(center) for center in centers]
+    detections = [ball_detection(centers[0]), ball_detection(centers[1]), player_only()]
+    refined = refiner.refine(frames, detections, backend)
+
+    ((shapes, imgsz, classes),) = backend.calls  # Una sola llamada con la ventana del frame 2
+    assert shapes == [(100, 100)] and imgsz == 128 and classes == [0]
+    np.testing.assert_allclose(ball_xyxy(refined[2]), [[317, 207, 323, 213]])
+    assert len(refined[2]) == 2  # Jugador + balón
+    assert refiner.summary().startswith("balón recuperado en 1/1")
+    assert refiner.last_positions[-1][0] == 2 and refiner.lost_frames == 0
+
+
+def test_window_at_the_border():
+    backend = WhiteBallBackend()
+    refiner = BallRefiner(window=160)
+    centers = [(20, 340), (10, 350), (4, 356)]  # El balón sale por la esquina inferior izquierda
+    frames = [make_frame(center) for center in centers]
+    refined = refiner.refine(frames, [ball_detection(centers[0]), ball_detection(centers[1]), player_only()], backend)
+    assert backend.calls[0][0] == [(160, 160)] and backend.calls[0][1] == 160
+    np.testing.assert_allclose(ball_xyxy(refined[2]), [[1, 353, 7, 359]])
+
+
+@pytest.mark.parametrize("window, frame_size, imgsz", [(100, (360, 640), 128), (320, (360, 640), 320),
+                                                      (400, (360, 640), 416), (700, (360, 640), 640)])
+def test_imgsz_is_a_multiple_of_32(window, frame_size, imgsz):
+    backend = WhiteBallBackend()
+    refiner = BallRefiner(window=window)
+    refiner.observe(0, (100, 100))
+    frame = np.zeros(frame_size + (3,), dtype=np.uint8)
+    refiner.refine([frame], [player_only()], backend, frame_nums=[1])
+    assert backend.calls[0][1] == imgsz
+
+
+def test_search_stops_after_max_lost_frames():
+    backend = WhiteBallBackend()
+    refiner = BallRefiner(window=100, max_lost=3)
+    refiner.refine([make_frame((300, 200))], [ball_detection((300, 200))], backend)
+    refined = refiner.refine([make_frame() for _ in range(6)], [player_only() for _ in range(6)], backend)
+    assert backend.calls[0][0] == [(100, 100)] * 3  # Frames 1, 2 y 3; del 4 en adelante ya no
+    assert all(len(ball_xyxy(detection)) == 0 for detection in refined)
+    assert refiner.lost_frames == 6 and refiner.roi_frames == 3 and refiner.roi_hits == 0
+    # La detección del frame completo vuelve a encontrarlo y la ventana se reactiva
+    refiner.refine([make_frame((500, 100))], [ball_detection((500, 100))], backend)
+    assert refiner.lost_frames == 0
+    refiner.refine([make_frame((505, 100))], [player_only()], backend)
+    assert len(backend.calls) == 2
+
+
+def test_keyframe_gaps_count_as_lost_frames():
+    backend = WhiteBallBackend()
+    refiner = BallRefiner(window=100, max_lost=5)
+    refiner.refine([make_frame((300, 200))], [ball_detection((300, 200))], backend, frame_nums=[0])
+    refiner.refine([make_frame()], [player_only()], backend, frame_nums=[8])  # 8 frames sin balón > max_lost
+    assert backend.calls == []
+
+
+def test_duplicates_are_not_searched_and_reuse_the_refined_detection():
+    backend = WhiteBallBackend()
+    refiner = BallRefiner(window=100)
+    frames = [make_frame((300, 200)), make_frame((310, 200)), make_frame((320, 200)), make_frame((320, 200))]
+    detections = [ball_detection((300, 200)), ball_detection((310, 200)), player_only(), player_only()]
+    refined = refiner.refine(frames, detections, backend, duplicates=[False, False, False, True])
+    assert backend.calls[0][0] == [(100, 100)]
+    assert refined[3] is refined[2]
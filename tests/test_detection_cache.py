@@ -0,0 +1,177 @@
+import os
+
+import numpy as np
+import pytest
+
+sv = pytest.importorskip("supervision")
+
+from trackers.detection_cache import DetectionCache, file_digest
+
+CLASS_NAMES = {0: "ball", 1: "goalkeeper", 2: "player", 3: "referee"}
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    video_path = tmp_path / "video.mp4"
+    model_path = tmp_path / "best.pt"
+    video_path.write_bytes(b"video")
+    model_path.write_bytes(b"weights")
+    return str(tmp_path / "cache"), str(video_path), str(model_path)
+
+
+def make_detection(frame_num):
+    # Número de cajas variable (incluido 0) para comprobar los límites entre frames
+    n = frame_num % 3
+    xyxy = np.array([[frame_num, i, frame_num + 10, i + 10] for i in range(n)], dtype=np.float32).reshape(-1, 4)
+    return sv.Detections(xyxy=xyxy, confidence=np.full(n, 0.5, dtype=np.float32),
+                         class_id=np.arange(n, dtype=int) % len(CLASS_NAMES))
+
+
+def assert_same(detection, expected):
+    np.testing.assert_allclose(detection.xyxy, expected.xyxy)
+    np.testing.assert_allclose(detection.confidence, expected.confidence)
+    assert detection.class_id.tolist() == expected.class_id.tolist()
+
+
+def test_append_and_read_range(inputs):
+    cache = DetectionCache(*inputs, {"conf": 0.1}, chunk_size=4)
+    for frame_num in range(10):
+        cache.append(frame_num, make_detection(frame_num), CLASS_NAMES)
+    assert cache.cached_frames == 8  # Dos chunks completos
+    assert not cache.is_complete
+    cache.finish(10)
+    assert cache.is_complete and cache.cached_frames == 10
+    assert cache.class_names == CLASS_NAMES
+
+    detections = cache.read_range(3, 9)  # Cruza los tres chunks
+    assert len(detections) == 6
+    for frame_num, detection in zip(range(3, 9), detections):
+        assert_same(detection, make_detection(frame_num))
+    assert len(cache.read_range(8, 100)) == 2
+    assert cache.read_range(5, 5) == []
+    assert len(list(cache.iter_cached())) == 10
+
+
+def test_resume_after_interruption(inputs):
+    cache = DetectionCache(*inputs, {"conf": 0.1}, chunk_size=4)
+    for frame_num in range(6):
+        cache.append(frame_num, make_detection(frame_num), CLASS_NAMES)
+    # Corte: los frames 4 y 5 no llegaron a escribirse (chunk incompleto)
+    resumed = DetectionCache(*inputs, {"conf": 0.1}, chunk_size=4)
+    assert resumed.cached_frames == 4
+    assert not resumed.is_complete
+    for frame_num in range(resumed.cached_frames, 7):
+        resumed.append(frame_num, make_detection(frame_num), CLASS_NAMES)
+    resumed.finish(7)
+
+    reopened = DetectionCache(*inputs, {"conf": 0.1})
+    assert reopened.is_complete and reopened.chunk_size == 4
+    for frame_num, detection in enumerate(reopened.iter_cached()):
+        assert_same(detection, make_detection(frame_num))
+
+
+def test_key_depends_on_content_and_params(inputs):
+    cache_dir, video_path, model_path = inputs
+    key = DetectionCache(cache_dir, video_path, model_path, {"conf": 0.1}).key
+    assert DetectionCache(cache_dir, video_path, model_path, {"conf": 0.1}).key == key
+    assert DetectionCache(cache_dir, video_path, model_path, {"conf": 0.2}).key != key
+    with open(video_path, "wb") as f:
+        f.write(b"otro video")
+    assert DetectionCache(cache_dir, video_path, model_path, {"conf": 0.1}).key != key
+
+
+def test_file_digest_memo(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"abc")
+    digest = file_digest(str(path), str(tmp_path / "memo"))
+    assert (tmp_path / "memo" / "digests.json").exists()
+    assert file_digest(str(path), str(tmp_path / "memo")) == digest == file_digest(str(path))
+
+
+class CountingBackend:
+    # Backend mínimo: detecciones deterministas por frame y registro de los frames inferidos
+    names = CLASS_NAMES
+
+    def __init__(self):
+        self.inferred = []
+
+    def predict(self, frames, conf):
+        self.inferred += [int(frame[0, 0, 0]) for frame in frames]
+        return [make_detection(int(frame[0, 0, 0])) for frame in frames]
+
+
+def test_tracker_resume_skips_cached_frames(inputs):
+    from trackers import Tracker
+    frames = [np.full((8, 8, 3), frame_num, dtype=np.uint8) for frame_num in range(10)]
+    cache = DetectionCache(*inputs, {"conf": 0.1}, chunk_size=4)
+    for frame_num in range(4):
+        cache.append(frame_num, make_detection(frame_num), CLASS_NAMES)
+
+    tracker = Tracker("best.pt", backend=CountingBackend(), batch_size=3)
+    resume = cache.cached_frames
+    # El lector ya empieza en el primer frame que falta (como read_video_frames(start_frame=...))
+    detections = list(tracker.iter_supervision_detections(iter(frames[resume:]), cache, first_frame=resume))
+    assert tracker.backend.inferred == list(range(4, 10))
+    assert len(detections) == 10
+    for frame_num, (detection, class_names) in enumerate(detections):
+        assert_same(detection, make_detection(frame_num))
+    assert cache.is_complete and cache.cached_frames == 10
+
+    # Sin 'first_frame' el iterador empieza en 0 y los frames ya en caché se descartan
+    cache = DetectionCache(*inputs, {"conf": 0.2}, chunk_size=4)
+    for frame_num in range(4):
+        cache.append(frame_num, make_detection(frame_num), CLASS_NAMES)
+    tracker = Tracker("best.pt", backend=CountingBackend(), batch_size=3)
+    assert len(list(tracker.iter_supervision_detections(iter(frames), cache))) == 10
+    assert tracker.backend.inferred == list(range(4, 10))
+
+    # Con el video entero en caché no se infiere nada
+    tracker = Tracker("best.pt", backend=CountingBackend(), batch_size=3)
+    assert len(list(tracker.iter_supervision_detections(iter(frames), cache))) == 10
+    assert tracker.backend.inferred == []
+
+
+def test_no_resume_with_frame_filter(inputs):
+    from trackers import Tracker
+    from trackers.frame_filter import FrameDeduplicator
+    frames = [np.full((8, 8, 3), frame_num // 2 * 40, dtype=np.uint8) for frame_num in range(10)]
+
+    def make_tracker():
+        return Tracker("best.pt", backend=CountingBackend(), batch_size=3, frame_filter=FrameDeduplicator())
+
+    # Ejecución sin cortes
+    expected = [detection for detection, _ in make_tracker().iter_supervision_detections(iter(frames))]
+
+    # Corte tras el primer chunk: el frame 4 sería duplicado del 3 en una ejecución sin cortes
+    cache = DetectionCache(*inputs, {"conf": 0.1}, chunk_size=4)
+    for frame_num in range(4):
+        cache.append(frame_num, expected[frame_num], CLASS_NAMES)
+    tracker = make_tracker()
+    assert tracker.get_resume_frame(cache) == 0
+    assert cache.cached_frames == 0 and not cache.is_complete
+    with pytest.raises(ValueError):
+        list(tracker.iter_supervision_detections(iter(frames[4:]), cache, first_frame=4))
+
+    # Desde el principio se detecta todo otra vez y el resultado coincide con el de la ejecución sin cortes
+    detections = [detection for detection, _ in tracker.iter_supervision_detections(iter(frames), cache)]
+    assert tracker.backend.inferred == [0, 40, 80, 120, 160]
+    for detection, reference in zip(detections, expected):
+        assert_same(detection, reference)
+    assert cache.is_complete and cache.cached_frames == 10
+
+    # Una caché completa se reutiliza también con el prefiltro
+    tracker = make_tracker()
+    assert tracker.get_resume_frame(cache) == 10
+    assert len(list(tracker.iter_supervision_detections(iter(frames), cache))) == 10
+    assert tracker.backend.inferred == []
+
+
+def test_reset_removes_chunks(inputs):
+    cache = DetectionCache(*inputs, {"conf": 0.1}, chunk_size=4)
+    for frame_num in range(9):
+        cache.append(frame_num, make_detection(frame_num), CLASS_NAMES)
+    cache.reset()
+    reopened = DetectionCache(*inputs, {"conf": 0.1}, chunk_size=4)
+    assert reopened.cached_frames == 0 and reopened.class_names is None
+    assert list(reopened.iter_cached()) == []
+    assert not any(name.startswith("chunk_") for name in os.listdir(reopened.path))
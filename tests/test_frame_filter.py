@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from trackers.frame_filter import FrameDeduplicator
+
+
+@pytest.fixture
+def pitch():
+    # Césped 720p con ruido
+    rng = np.random.default_rng(0)
+    return np.clip(rng.normal((40, 140, 40), 6, (720, 1280, 3)), 0, 255).astype(np.uint8)
+
+
+def test_repeated_frame_is_duplicate(pitch):
+    frame_filter = FrameDeduplicator()
+    assert not frame_filter.is_duplicate(pitch)  # El primer frame siempre se infiere
+    assert frame_filter.is_duplicate(pitch.copy())
+    # Ruido de compresión de ±1 nivel: sigue siendo el mismo frame
+    noise = np.random.default_rng(1).integers(-1, 2, pitch.shape)
+    assert frame_filter.is_duplicate(np.clip(pitch.astype(int) + noise, 0, 255).astype(np.uint8))
+    assert frame_filter.summary() == "2/3 frames sin inferencia (66.7%)"
+
+
+@pytest.mark.parametrize("shape", [(30, 31), (24, 38), (10, 92)])
+@pytest.mark.parametrize("position", [(100, 100), (203, 517), (0, 1180), (690, 0)])
+def test_small_change_is_a_new_frame(pitch, shape, position):
+    # Una región de ~0,1 % de los píxeles (p. ej. un jugador lejano que entra en el plano)
+    frame_filter = FrameDeduplicator()
+    frame_filter.is_duplicate(pitch)
+    (h, w), (y, x) = shape, position
+    changed = pitch.copy()
+    changed[y:y + h, x:x + w] = (220, 220, 220)
+    assert np.any(changed != pitch, axis=2).mean() == pytest.approx(0.001, rel=0.05)
+    assert not frame_filter.is_duplicate(changed)
+
+
+def test_compares_with_the_last_inferred_frame(pitch):
+    # Un jugador que avanza 2 px por frame: ningún paso supera el umbral, pero la diferencia
+    # acumulada frente al último frame inferido acaba superándolo (la deriva no se acumula)
+    frame_filter = FrameDeduplicator()
+    duplicates = []
+    for step in range(12):
+        frame = pitch.copy()
+        frame[300:340, 600 + 2 * step:624 + 2 * step] = (30, 30, 200)
+        duplicates.append(frame_filter.is_duplicate(frame))
+    assert duplicates[0] is False and duplicates[1] is True
+    assert False in duplicates[2:]
+    new_frame = duplicates.index(False, 1)
+    assert all(duplicates[1:new_frame])
+
+
+def test_reset(pitch):
+    frame_filter = FrameDeduplicator()
+    frame_filter.is_duplicate(pitch)
+    frame_filter.reset()
+    assert not frame_filter.is_duplicate(pitch)
+    assert frame_filter.get_params()["diff_threshold"] == 0.001
+
+
+class FrameIdBackend:
+    # Devuelve una detección nueva por frame inferido, con el número de frame como confianza
+    names = {0: "ball", 1: "player"}
+
+    def __init__(self):
+        self.inferred = []
+
+    def predict(self, frames, conf):
+        import supervision as sv
+        detections = []
+        for frame in frames:
+            self.inferred.append(int(frame[0, 0, 0]))
+            detections.append(sv.Detections(xyxy=np.array([[10, 10, 50, 90]], dtype=np.float32),
+                                            confidence=np.array([frame[0, 0, 0] / 100], dtype=np.float32),
+                                            class_id=np.array([1])))
+        return detections
+
+
+def test_duplicates_reuse_the_last_inferred_detections():
+    pytest.importorskip("supervision")
+    from trackers import Tracker
+    frames = []
+    for frame_num, content in enumerate([0, 0, 0, 1, 1, 2]):
+        frame = np.zeros((90, 160, 3), dtype=np.uint8)
+        frame[:, 40 * content:40 * content + 30] = 255
+        frame[0, 0] = frame_num  # Un solo píxel distinto: por debajo de los umbrales
+        frames.append(frame)
+    tracker = Tracker("best.pt", backend=FrameIdBackend(), batch_size=4, frame_filter=FrameDeduplicator())
+    detections = tracker.detect_frames(frames)
+    assert tracker.backend.inferred == [0, 3, 5]
+    assert [detection is detections[inferred] for detection, inferred in zip(detections, [0, 0, 0, 3, 3, 5])] == [True] * 6
+    # Cada ejecución empieza de cero: el primer frame se infiere aunque repita el último de la anterior
+    tracker.detect_frames(frames[:1])
+    assert tracker.backend.inferred == [0, 3, 5, 0]
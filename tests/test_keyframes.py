@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from trackers.keyframes import KeyframeScheduler, track_motion
+from trackers.track_store import OBJECT_TYPE_CODES
+
+
+def make_rows(track_ids, bboxes, object_type="players"):
+    return {
+        "object_type": np.full(len(track_ids), OBJECT_TYPE_CODES[object_type], dtype=np.int8),
+        "track_id": np.array(track_ids, dtype=np.int32),
+        "bbox": np.array(bboxes, dtype=np.float32).reshape(-1, 4),
+        "conf": np.ones(len(track_ids), dtype=np.float32),
+    }
+
+
+def test_fixed_stride_never_changes():
+    scheduler = KeyframeScheduler(stride=5, adaptive=False)
+    assert scheduler.update(motion=10.0, lost_fraction=1.0) == 5
+    assert scheduler.update(motion=0.0, lost_fraction=0.0) == 5
+
+
+def test_adaptive_stride_halves_on_motion_and_lost_tracks():
+    scheduler = KeyframeScheduler(stride=8, min_stride=1, max_stride=16, max_shift=0.3, max_lost_fraction=0.1)
+    assert scheduler.update(motion=0.1, lost_fraction=0.0) == 4   # 0.1 * 8 > 0.3
+    assert scheduler.update(motion=0.0, lost_fraction=0.5) == 2   # Tracks perdidos
+    assert scheduler.update(motion=1.0, lost_fraction=0.0) == 1
+    assert scheduler.update(motion=1.0, lost_fraction=0.0) == 1   # Nunca por debajo de min_stride
+
+
+def test_adaptive_stride_grows_slowly_up_to_max():
+    scheduler = KeyframeScheduler(stride=4, max_stride=6)
+    strides = [scheduler.update(motion=0.0, lost_fraction=0.0) for _ in range(4)]
+    assert strides == [5, 6, 6, 6]
+    # Movimiento intermedio: ni crece ni se reduce
+    scheduler = KeyframeScheduler(stride=4, max_shift=0.3)
+    assert scheduler.update(motion=0.05, lost_fraction=0.0) == 4
+
+
+def test_reset_and_summary():
+    scheduler = KeyframeScheduler(stride=4)
+    assert scheduler.max_stride == 8
+    scheduler.update(motion=0.0, lost_fraction=0.0)
+    scheduler.keyframes = [0, 4, 9]
+    assert scheduler.summary().startswith("3/10 frames")
+    scheduler.reset()
+    assert scheduler.stride == 4 and scheduler.keyframes == []
+
+
+def test_track_motion():
+    prev = make_rows([1, 2], [[0, 0, 10, 20], [100, 0, 110, 20]])
+    rows = make_rows([1, 3], [[4, 3, 14, 23], [0, 0, 1, 1]])
+    motion, lost_fraction = track_motion(prev, rows, frame_gap=5)
+    assert lost_fraction == pytest.approx(0.5)   # El track 2 se ha perdido
+    assert motion == pytest.approx(5 / 20 / 5)  # Desplazamiento 5 px, altura 20, 5 frames
+
+
+def test_track_motion_ignores_ball_and_empty_frames():
+    ball = make_rows([1], [[0, 0, 2, 2]], object_type="ball")
+    moved_ball = make_rows([1], [[50, 50, 52, 52]], object_type="ball")
+    assert track_motion(ball, moved_ball, frame_gap=1) == (0.0, 0.0)
+    assert track_motion(make_rows([1], [[0, 0, 10, 10]]), make_rows([], []), frame_gap=1) == (0.0, 1.0)
+
+
+class MovingBoxBackend:
+    # Un jugador que avanza 2 px por frame; el número de frame va codificado en el píxel (0, 0)
+    names = {0: "ball", 1: "player"}
+
+    def __init__(self):
+        self.inferred = []
+
+    def predict(self, frames, conf):
+        import supervision as sv
+        detections = []
+        for frame in frames:
+            frame_num = int(frame[0, 0, 0])
+            self.inferred.append(frame_num)
+            detections.append(sv.Detections(xyxy=np.array([[2 * frame_num, 0, 2 * frame_num + 40, 80]], dtype=np.float32),
+                                            confidence=np.array([0.9], dtype=np.float32),
+                                            class_id=np.array([1])))
+        return detections
+
+
+def make_frames(num_frames):
+    frames = [np.zeros((120, 200, 3), dtype=np.uint8) for _ in range(num_frames)]
+    for frame_num, frame in enumerate(frames):
+        frame[0, 0] = frame_num
+        frame[40:60, frame_num:frame_num + 20] = 255  # Contenido distinto en cada frame
+    return frames
+
+
+def test_keyframe_track_store_interpolates_between_keyframes():
+    pytest.importorskip("supervision")
+    from trackers import Tracker
+    tracker = Tracker("best.pt", backend=MovingBoxBackend(), batch_size=2)
+    scheduler = KeyframeScheduler(stride=4, adaptive=False)
+    store = tracker.get_keyframe_track_store(iter(make_frames(11)), scheduler)
+
+    assert scheduler.keyframes == [0, 4, 8, 10]  # El último frame siempre es keyframe
+    assert tracker.backend.inferred == [0, 4, 8, 10]
+    assert store.num_frames == 11
+    (track_id,) = store.track_ids("players")
+    frames, bboxes = store.trajectory(track_id)
+    assert frames.tolist() == list(range(11))
+    np.testing.assert_allclose(bboxes[:, 0], 2 * np.arange(11), atol=1e-3)
+
+
+def test_keyframe_track_store_uses_duplicate_filter():
+    pytest.importorskip("supervision")
+    from trackers import Tracker, FrameDeduplicator
+    frames = make_frames(9)
+    frames[4] = frames[0].copy()  # El keyframe 4 repite el keyframe 0
+    tracker = Tracker("best.pt", backend=MovingBoxBackend(), batch_size=1, frame_filter=FrameDeduplicator())
+    store = tracker.get_keyframe_track_store(iter(frames), KeyframeScheduler(stride=4, adaptive=False))
+    assert tracker.backend.inferred == [0, 8]
+    assert tracker.frame_filter.skipped_frames == 1
+    assert store.num_frames == 9
+
+
+class LeavingPlayerBackend(MovingBoxBackend):
+    # El jugador sale del plano entre los frames 1 y 23 y vuelve en el mismo sitio
+    def predict(self, frames, conf):
+        import supervision as sv
+        detections = super().predict(frames, conf)
+        for i, frame in enumerate(frames):
+            if 0 < int(frame[0, 0, 0]) < 24:
+                detections[i] = sv.Detections.empty()
+            else:
+                detections[i].xyxy[:] = [10, 10, 50, 90]
+        return detections
+
+
+def test_keyframe_track_store_does_not_fill_long_absences():
+    pytest.importorskip("supervision")
+    from trackers import Tracker
+    tracker = Tracker("best.pt", backend=LeavingPlayerBackend(), batch_size=1)
+    scheduler = KeyframeScheduler(stride=4, adaptive=False)  # max_stride = 8 -> huecos de hasta 16 frames
+    store = tracker.get_keyframe_track_store(iter(make_frames(29)), scheduler)
+    (track_id,) = store.track_ids("players")
+    assert store.trajectory(track_id)[0].tolist() == [0] + list(range(24, 29))
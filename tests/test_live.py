@@ -0,0 +1,116 @@
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from utils import save_video
+from utils.live import LatencyBudget, LiveSource, VideoSink, format_live_report
+
+
+def test_unknown_policy_fails():
+    with pytest.raises(ValueError, match="desconocida"):
+        LatencyBudget(policy="wait")
+
+
+def test_frames_within_budget_are_processed():
+    budget = LatencyBudget(budget=0.2)
+    budget.record_processing(0.05)
+    assert budget.should_process(time.perf_counter())
+    assert budget.dropped == budget.skipped == 0
+
+
+@pytest.mark.parametrize("policy", LatencyBudget.POLICIES)
+def test_late_frames_follow_the_policy(policy):
+    budget = LatencyBudget(budget=0.2, policy=policy, max_consecutive=3)
+    budget.record_processing(0.05)
+    late = time.perf_counter() - 0.5  # Capturado hace 0.5 s: ya fuera de presupuesto
+    # Como mucho 'max_consecutive' frames seguidos sin procesar; luego se procesa uno
+    assert [budget.should_process(late) for _ in range(8)] == [False, False, False, True] * 2
+    assert (budget.dropped, budget.skipped) == ((6, 0) if policy == "drop" else (0, 6))
+
+
+def test_estimate_is_the_median_of_the_window():
+    budget = LatencyBudget(budget=0.2, window=3)
+    for seconds in [5.0, 0.01, 0.02]:  # Un primer frame lento aislado no cuenta
+        budget.record_processing(seconds)
+    assert budget.estimate == pytest.approx(0.02)
+    for seconds in [0.3, 0.3]:  # El proceso se vuelve más lento que el presupuesto
+        budget.record_processing(seconds)
+    assert budget.estimate == pytest.approx(0.3)
+    assert not budget.should_process(time.perf_counter())
+
+
+def test_report():
+    budget = LatencyBudget(budget=0.2)
+    assert budget.report()["emitted"] == 0
+    now = time.perf_counter()
+    for age in [0.01, 0.05, 0.5]:
+        budget.record_emitted(now - age)
+    report = budget.report(source_dropped=4)
+    assert report["emitted"] == 3
+    assert report["dropped_buffer"] == 4
+    assert report["over_budget"] == 1
+    assert 500 <= report["latency_max_ms"] < 1000
+    assert format_live_report(report, budget.budget).startswith("Frames emitidos: 3, descartados: 0")
+
+
+def test_video_sink_repeats_frames_for_gaps(tmp_path):
+    path = str(tmp_path / "live.mp4")
+    sink = VideoSink(path, fps=10)
+    for frame_num in [0, 3, 4, 9]:
+        assert sink.write(np.full((64, 64, 3), frame_num * 20, dtype=np.uint8), frame_num)
+    sink.close()
+    assert sink.repeated == 6
+
+    cap = cv2.VideoCapture(path)
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    assert num_frames == 10  # Misma duración que la captura
+
+
+class UnsizedCapture:
+    # VideoCapture de una tubería o un stream: no conoce el tamaño de los frames antes de leerlos
+    def __init__(self, cap):
+        self.cap = cap
+
+    def get(self, prop):
+        return 0.0 if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT) else self.cap.get(prop)
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / "source.mp4")
+    save_video([np.full((48, 80, 3), frame_num * 20, dtype=np.uint8) for frame_num in range(5)], path, fps=10)
+    return path
+
+
+def test_frame_shape_from_capture_size(video_path):
+    source = LiveSource(video_path, realtime=False)
+    assert source.get_frame_shape() == (48, 80, 3)
+    assert source.captured == 0  # Sin leer ningún frame
+    source.cap.release()
+
+
+def test_frame_shape_from_first_frame_when_size_is_unknown(video_path):
+    source = LiveSource(video_path, buffer_size=8, realtime=False)
+    source.cap = UnsizedCapture(source.cap)
+    assert source.get_frame_shape() == (48, 80, 3)
+    source.start()  # Ya arrancado: no se vuelve a arrancar el hilo
+    assert [frame_num for frame_num, _, _ in source] == list(range(5))
+    source.stop()
+
+
+def test_frame_shape_of_an_empty_source(video_path):
+    source = LiveSource(video_path, realtime=False)
+    source.cap = UnsizedCapture(source.cap)
+    while source.cap.read()[0]:  # Fuente ya agotada
+        pass
+    assert source.get_frame_shape() is None
+    source.stop()
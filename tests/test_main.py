@@ -0,0 +1,115 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+sv = pytest.importorskip("supervision")
+
+from main import create_detection_cache, get_drift_reference_store, save_tracks_stub, load_tracks_stub
+from trackers import Tracker, FrameDeduplicator
+
+
+class StillBackend:
+    # Backend mínimo: una caja por frame y registro de los frames inferidos
+    names = {0: "ball", 1: "player"}
+
+    def __init__(self):
+        self.inferred = []
+
+    def get_params(self):
+        return {"name": "still"}
+
+    def predict(self, frames, conf):
+        self.inferred += [int(frame[0, 0, 0]) for frame in frames]
+        return [sv.Detections(xyxy=np.array([[10, 10, 50, 90]], dtype=np.float32),
+                              confidence=np.array([0.9], dtype=np.float32), class_id=np.array([1]))
+                for _ in frames]
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    video_path = tmp_path / "video.mp4"
+    model_path = tmp_path / "best.pt"
+    video_path.write_bytes(b"video")
+    model_path.write_bytes(b"weights")
+    return str(video_path), str(model_path), str(tmp_path / "cache")
+
+
+def make_frames():
+    # Frames 0-4 idénticos (el prefiltro solo infiere el 0) y 5-9 distintos entre sí
+    frames = []
+    for frame_num in range(10):
+        frame = np.zeros((90, 160, 3), dtype=np.uint8)
+        if frame_num >= 5:
+            frame[:, 16 * frame_num - 80:16 * frame_num - 60] = 255
+        frame[0, 0] = frame_num
+        frames.append(frame)
+    return frames
+
+
+def test_drift_reference_does_not_poison_the_filtered_cache(inputs):
+    video_path, model_path, cache_dir = inputs
+    frames = make_frames()
+
+    def tracking_frames(start_frame=0):
+        return iter(frames[start_frame:])
+
+    # 1. --keyframe-stride ... --drift-report --skip-duplicates: la referencia infiere todos los frames
+    tracker = Tracker(model_path, backend=StillBackend(), frame_filter=FrameDeduplicator())
+    reference = get_drift_reference_store(tracker, video_path, tracking_frames, cache_dir=cache_dir)
+    assert reference.num_frames == 10
+    assert tracker.backend.inferred == list(range(10))
+    reference_cache = create_detection_cache(Tracker(model_path, backend=StillBackend()), video_path,
+                                             cache_dir=cache_dir)
+    assert reference_cache.is_complete
+
+    # 2. --skip-duplicates: su caché no es la de la referencia y el prefiltro se aplica
+    tracker = Tracker(model_path, backend=StillBackend(), frame_filter=FrameDeduplicator())
+    cache = create_detection_cache(tracker, video_path, cache_dir=cache_dir)
+    assert cache.key != reference_cache.key
+    assert cache.cached_frames == 0 and not cache.is_complete
+    tracker.get_track_store(tracking_frames(), cache=cache)
+    assert tracker.backend.inferred == [0] + list(range(5, 10))
+    assert tracker.frame_filter.summary().startswith("4/10")
+
+    # 3. Una segunda referencia reutiliza la suya sin inferir
+    tracker = Tracker(model_path, backend=StillBackend(), frame_filter=FrameDeduplicator())
+    get_drift_reference_store(tracker, video_path, tracking_frames, cache_dir=cache_dir)
+    assert tracker.backend.inferred == []
+
+
+def test_detection_cache_key_includes_the_frame_range(inputs):
+    video_path, model_path, cache_dir = inputs
+    tracker = Tracker(model_path, backend=StillBackend())
+    key = create_detection_cache(tracker, video_path, cache_dir=cache_dir).key
+    frame_range = {"start": 10, "end": None, "stride": 2}
+    assert create_detection_cache(tracker, video_path, frame_range, cache_dir=cache_dir).key != key
+
+
+STUB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stubs", "track_stubs_futbol.pkl")
+
+
+def test_tracks_stub_records_its_frame_range(tmp_path):
+    tracks = {"players": [{3: {"bbox": [0.0, 0.0, 10.0, 20.0]}}, {}], "ball": [{}, {}]}
+    frame_range = {"start": 30, "end": 90, "stride": 2}
+    path = str(tmp_path / "stubs" / "tracks.pkl")
+    save_tracks_stub(path, tracks, frame_range)
+    assert load_tracks_stub(path, frame_range) == tracks
+    with open(path, "rb") as f:
+        assert pickle.load(f) == tracks  # Un pickle.load sigue leyendo solo los tracks
+    for other in [None, {"start": 0, "end": 90, "stride": 2}, {"start": 30, "end": 90, "stride": 1}]:
+        with pytest.raises(ValueError, match="tracks.pkl"):
+            load_tracks_stub(path, other)
+
+    save_tracks_stub(path, tracks)
+    assert load_tracks_stub(path) == tracks
+    with pytest.raises(ValueError, match="el video entero"):
+        load_tracks_stub(path, frame_range)
+
+
+def test_stub_without_frame_range_is_the_whole_video():
+    tracks = load_tracks_stub(STUB_PATH)
+    assert len(tracks["players"]) == 750
+    with pytest.raises(ValueError):
+        load_tracks_stub(STUB_PATH, {"start": 0, "end": None, "stride": 2})
@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.metrics import LATENCY_BUCKETS, METRICS, Metrics
+
+
+def fill(metrics):
+    metrics.record_stage("detect", wall_time=0.3, cpu_time=0.25, items=4)   # 75 ms por frame
+    metrics.record_stage("detect", wall_time=0.004, cpu_time=0.004, items=2)  # 2 ms por frame
+    metrics.record_stage("encode", wall_time=0.01, cpu_time=0.01)
+    metrics.count("detections", 5, cls="player")
+    metrics.count("detections", 2, cls="player")
+    metrics.count("detections", 1, cls="ball")
+    metrics.count("frames_skipped", 3)
+    metrics.cache("detection_cache", hits=3, misses=1)
+    metrics.cache("stub", hits=1)
+    return metrics
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = fill(Metrics())
+    with metrics.stage("decode"):
+        pass
+    data = metrics.to_dict()
+    assert data["stages"] == {} and data["counters"] == [] and data["caches"] == {}
+
+
+def test_json_export(tmp_path):
+    metrics = fill(Metrics(enabled=True))
+    with metrics.stage("decode", items=2):
+        pass
+    metrics.export(json_path=str(tmp_path / "out" / "metrics.json"))
+    data = json.loads((tmp_path / "out" / "metrics.json").read_text())
+
+    detect = data["stages"]["detect"]
+    assert (detect["calls"], detect["items"]) == (2, 6)
+    assert detect["wall_time"] == pytest.approx(0.304) and detect["cpu_time"] == pytest.approx(0.254)
+    assert detect["items_per_second"] == pytest.approx(6 / 0.304, abs=0.01)
+    assert detect["latency_histogram"]["0.1"] == 4 and detect["latency_histogram"]["0.002"] == 2
+    assert sum(detect["latency_histogram"].values()) == 6
+    assert list(detect["latency_histogram"]) == [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+    assert data["stages"]["decode"]["items"] == 2
+
+    counters = {(counter["name"], tuple(counter["labels"].items())): counter["value"] for counter in data["counters"]}
+    assert counters == {("detections", (("cls", "player"),)): 7, ("detections", (("cls", "ball"),)): 1,
+                        ("frames_skipped", ()): 3}
+    assert data["caches"]["detection_cache"] == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+    assert data["caches"]["stub"]["hit_rate"] == 1.0
+    assert data["peak_rss_bytes"] > 0
+
+
+def test_prometheus_export(tmp_path):
+    metrics = fill(Metrics(enabled=True))
+    metrics.export(prometheus_path=str(tmp_path / "metrics.prom"))
+    lines = (tmp_path / "metrics.prom").read_text().splitlines()
+    samples = dict(line.rsplit(" ", 1) for line in lines if not line.startswith("#"))
+
+    assert float(samples['futbol_stage_wall_seconds_total{stage="detect"}']) == pytest.approx(0.304)
+    assert samples['futbol_stage_items_total{stage="detect"}'] == "6"
+    # Histograma acumulado: 2 frames <= 2 ms y los 6 <= 100 ms
+    assert samples['futbol_frame_latency_seconds_bucket{stage="detect",le="0.002"}'] == "2"
+    assert samples['futbol_frame_latency_seconds_bucket{stage="detect",le="0.05"}'] == "2"
+    assert samples['futbol_frame_latency_seconds_bucket{stage="detect",le="0.1"}'] == "6"
+    assert samples['futbol_frame_latency_seconds_bucket{stage="detect",le="+Inf"}'] == "6"
+    assert samples['futbol_frame_latency_seconds_count{stage="detect"}'] == "6"
+    assert samples['futbol_detections_total{cls="player"}'] == "7"
+    assert samples['futbol_detections_total{cls="ball"}'] == "1"
+    assert samples["futbol_frames_skipped_total"] == "3"
+    assert samples['futbol_cache_requests_total{cache="detection_cache",result="hit"}'] == "3"
+    assert samples['futbol_cache_requests_total{cache="detection_cache",result="miss"}'] == "1"
+    assert int(samples["futbol_peak_rss_bytes"]) > 0
+    # Una sola línea TYPE por métrica
+    types = [line for line in lines if line.startswith("# TYPE")]
+    assert len(types) == len(set(types))
+    assert "# TYPE futbol_detections_total counter" in types
+
+
+class ClassBackend:
+    # Dos jugadores y un balón por frame
+    names = {0: "ball", 1: "goalkeeper", 2: "player", 3: "referee"}
+
+    def predict(self, frames, conf):
+        import supervision as sv
+        xyxy = np.array([[10, 10, 40, 80], [60, 10, 90, 80], [50, 50, 56, 56]], dtype=np.float32)
+        return [sv.Detections(xyxy=xyxy, confidence=np.full(3, 0.9, dtype=np.float32), class_id=np.array([2, 2, 0]))
+                for _ in frames]
+
+
+@pytest.fixture
+def global_metrics():
+    METRICS.reset()
+    METRICS.enable()
+    yield METRICS
+    METRICS.disable()
+    METRICS.reset()
+
+
+def test_class_counts_include_frames_replayed_from_the_cache(tmp_path, global_metrics):
+    pytest.importorskip("supervision")
+    from trackers import Tracker
+    from trackers.detection_cache import DetectionCache
+    (tmp_path / "video.mp4").write_bytes(b"video")
+    (tmp_path / "best.pt").write_bytes(b"weights")
+    frames = [np.zeros((96, 128, 3), dtype=np.uint8)] * 5
+
+    def detections_per_class():
+        return {counter["labels"]["cls"]: counter["value"] for counter in global_metrics.to_dict()["counters"]
+                if counter["name"] == "detections"}
+
+    for run in ("inferred", "cached"):
+        global_metrics.reset()
+        cache = DetectionCache(str(tmp_path / "cache"), str(tmp_path / "video.mp4"), str(tmp_path / "best.pt"), {})
+        Tracker("best.pt", backend=ClassBackend(), batch_size=2).get_track_store(iter(frames), cache=cache)
+        assert detections_per_class() == {"player": 10, "ball": 5}, run
+    assert global_metrics.to_dict()["caches"]["detection_cache"] == {"hits": 5, "misses": 0, "hit_rate": 1.0}
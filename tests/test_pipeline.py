@@ -0,0 +1,61 @@
+import threading
+
+import pytest
+
+from utils.pipeline import Pipeline
+
+
+def test_stages_keep_frame_order():
+    pipeline = Pipeline(queue_size=2)
+    pipeline.add_source("decode", range(100))
+    pipeline.add_stage("double", lambda items: (item * 2 for item in items))
+    pipeline.add_stage("inc", lambda items: (item + 1 for item in items))
+    assert pipeline.run("collect", list) == [item * 2 + 1 for item in range(100)]
+
+    report = pipeline.report()
+    assert report["decode"]["items"] == 100
+    assert report["collect"]["items"] == 100
+
+
+def test_stage_error_is_raised_in_the_caller():
+    def fail_at_five(items):
+        for item in items:
+            if item == 5:
+                raise ValueError("boom")
+            yield item
+
+    pipeline = Pipeline(queue_size=2)
+    pipeline.add_source("decode", range(100))
+    pipeline.add_stage("detect", fail_at_five)
+    pipeline.add_stage("track", lambda items: (item for item in items))
+    with pytest.raises(RuntimeError, match="'detect'") as error:
+        pipeline.run("collect", list)
+    assert isinstance(error.value.__cause__, ValueError)
+
+
+def test_source_error_is_raised_in_the_caller():
+    def frames():
+        yield 0
+        raise IOError("lectura")
+
+    pipeline = Pipeline(queue_size=2)
+    pipeline.add_source("decode", frames())
+    pipeline.add_stage("detect", lambda items: (item for item in items))
+    with pytest.raises(RuntimeError, match="'decode'") as error:
+        pipeline.run("collect", list)
+    assert isinstance(error.value.__cause__, IOError)
+
+
+def test_early_sink_exit_stops_the_stages():
+    # El sumidero deja de leer tras 3 elementos: las etapas (con colas llenas) deben terminar
+    pipeline = Pipeline(queue_size=1)
+    pipeline.add_source("decode", iter(range(10 ** 6)))
+    pipeline.add_stage("detect", lambda items: (item for item in items))
+    threads_before = threading.active_count()
+    assert pipeline.run("collect", lambda items: [next(items) for _ in range(3)]) == [0, 1, 2]
+    assert threading.active_count() == threads_before
+
+
+def test_run_without_source_fails():
+    with pytest.raises(ValueError):
+        Pipeline().run("collect", list)
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from trackers import Tracker
+from trackers.renderer import AnnotationRenderer, render_video_parallel
+from utils import read_video, save_video
+
+HEIGHT, WIDTH = 120, 160
+TEAM_COLORS = [np.array([30.4, 30.1, 200.7]), np.array([220.2, 219.8, 221.3])]
+
+
+def reference_draw(frames, tracks):
+    # Funciones de dibujo originales de Tracker (no usan el modelo)
+    return Tracker.__new__(Tracker).draw_annotations(frames, tracks)
+
+
+def make_frames(num_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    return [np.clip(rng.normal((40, 140, 40), 20, (HEIGHT, WIDTH, 3)), 0, 255).astype(np.uint8)
+            for _ in range(num_frames)]
+
+
+def border_tracks():
+    # Cada frame tiene una fila de objetos que recorre el frame de arriba abajo, desde fuera de
+    # un borde hasta fuera del opuesto, de modo que elipses, etiquetas y triángulos tocan y
+    # cruzan los cuatro bordes y las esquinas (con sprites y con el dibujo directo de OpenCV).
+    # Los mismos IDs y colores aparecen dentro y en el borde para reutilizar los sprites.
+    tracks = {object_type: [] for object_type in ("players", "referees", "ball", "managers", "goalkeepers")}
+    for y in range(-30, HEIGHT + 30, 3):
+        players, referees, goalkeepers, managers = {}, {}, {}, {}
+        for i, x in enumerate(range(-45, WIDTH + 45, 17)):
+            w, h = 10 + (i * 7) % 35, 30 + (i * 11) % 40
+            bbox = [float(x) + 0.4, float(y) - 0.3, float(x + w) + 0.6, float(y + h) + 0.2]
+            track_id = [3, 7, 123, 45][i % 4]
+            if i % 5 == 3:
+                referees[i] = {"bbox": bbox}
+            elif i % 5 == 4:
+                goalkeepers[100 + i] = {"bbox": bbox}
+            else:
+                players[track_id + 1000 * (i // 4)] = {"bbox": bbox, "team_color": TEAM_COLORS[i % 2]}
+        managers[90] = {"bbox": [float(y), 50.0, float(y) + 0.5, 80.0]}  # Ancho casi nulo
+        tracks["players"].append(players)
+        tracks["referees"].append(referees)
+        tracks["goalkeepers"].append(goalkeepers)
+        tracks["managers"].append(managers)
+        tracks["ball"].append({1: {"bbox": [float(WIDTH - y), float(y), float(WIDTH - y) + 8, float(y) + 8]}})
+    return tracks
+
+
+def test_renderer_matches_opencv_at_the_borders():
+    tracks = border_tracks()
+    frames = make_frames(len(tracks["players"]))
+    reference = reference_draw(frames, tracks)
+    renderer = AnnotationRenderer()
+    rendered = list(renderer.iter_draw_annotations(frames, tracks))
+    for frame_num, (expected, frame) in enumerate(zip(reference, rendered)):
+        assert np.array_equal(expected, frame), f"Frame {frame_num} distinto"
+    # Se han usado los sprites (y no solo el dibujo directo de OpenCV)
+    assert renderer.label_sprites and renderer.ellipse_sprites and renderer.triangle_sprites
+
+
+def test_renderer_in_place_and_from_frame_offset():
+    tracks = border_tracks()
+    frames = make_frames(len(tracks["players"]), seed=1)
+    reference = reference_draw(frames, tracks)
+    copies = [frame.copy() for frame in frames[10:20]]
+    for _ in AnnotationRenderer().iter_draw_annotations(copies, tracks, copy=False, start_frame=10):
+        pass
+    assert all(np.array_equal(a, b) for a, b in zip(reference[10:20], copies))
+
+
+def test_render_video_parallel_matches_sequential(tmp_path):
+    tracks = border_tracks()
+    num_frames = 20
+    tracks = {object_type: frames[:num_frames] for object_type, frames in tracks.items()}
+    video_path = str(tmp_path / "input.mp4")
+    save_video(make_frames(num_frames), video_path)
+
+    sequential_path = str(tmp_path / "sequential.mp4")
+    save_video(AnnotationRenderer().iter_draw_annotations(read_video(video_path), tracks), sequential_path)
+    parallel_path = str(tmp_path / "parallel.mp4")
+    render_video_parallel(video_path, tracks, parallel_path, num_workers=2, range_size=6)
+
+    sequential, parallel = read_video(sequential_path), read_video(parallel_path)
+    assert len(parallel) == len(sequential) == num_frames
+    assert all(np.array_equal(a, b) for a, b in zip(sequential, parallel))
+    assert not list(tmp_path.glob("render_*"))  # Sin segmentos temporales olvidados
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+sv = pytest.importorskip("supervision")
+
+from trackers.sharding import plan_shards, match_track_ids, remap_rows, ShardStitcher
+from trackers.track_store import TrackStore, OBJECT_TYPE_CODES, BALL_TRACK_ID
+
+
+def make_rows(objects):
+    # objects: lista de (tipo, track_id, bbox)
+    return {
+        "object_type": np.array([OBJECT_TYPE_CODES[object_type] for object_type, _, _ in objects], dtype=np.int8),
+        "track_id": np.array([track_id for _, track_id, _ in objects], dtype=np.int32),
+        "bbox": np.array([bbox for _, _, bbox in objects], dtype=np.float32).reshape(-1, 4),
+        "conf": np.ones(len(objects), dtype=np.float32),
+    }
+
+
+def runner(frame_num):
+    # Jugador que avanza 5 px por frame
+    return [5 * frame_num, 0, 5 * frame_num + 40, 80]
+
+
+STANDING = [300, 100, 340, 180]
+BALL_BOX = [200, 200, 210, 210]
+
+
+def test_plan_shards():
+    assert plan_shards(100, 4, overlap=10) == [(0, 0, 25), (15, 25, 50), (40, 50, 75), (65, 75, 100)]
+    assert plan_shards(100, 1) == [(0, 0, 100)]
+    # Nunca más tramos que frames ni solapes antes del frame 0
+    assert plan_shards(3, 8, overlap=30) == [(0, 0, 1), (0, 1, 2), (0, 2, 3)]
+
+
+def test_match_track_ids_votes_and_threshold():
+    previous_rows = [make_rows([("players", 2, runner(f)), ("players", 3, STANDING)]) for f in range(4)]
+    rows = [make_rows([("players", 7, runner(f)), ("goalkeepers", 8, STANDING)]) for f in range(4)]
+    # La clase no cuenta (un jugador puede pasar a portero entre tramos)
+    assert match_track_ids(previous_rows, rows) == {7: 2, 8: 3}
+
+    # El ID 9 solo coincide con el 3 en uno de cuatro frames: no llega a 'min_votes'
+    rows = [make_rows([("players", 9, STANDING if f == 0 else [0, 300, 40, 380])]) for f in range(4)]
+    assert match_track_ids(previous_rows, rows) == {}
+    assert match_track_ids(previous_rows, rows, min_votes=0.25) == {9: 3}
+
+
+def test_match_track_ids_is_one_to_one():
+    previous_rows = [make_rows([("players", 2, STANDING)]) for _ in range(3)]
+    rows = [make_rows([("players", 7, STANDING)]), make_rows([("players", 8, STANDING)]),
+            make_rows([("players", 7, STANDING)])]
+    assert match_track_ids(previous_rows, rows, min_votes=0.1) == {7: 2}
+
+
+def test_remap_rows_keeps_ball_id():
+    rows = make_rows([("players", 7, STANDING), ("ball", BALL_TRACK_ID, BALL_BOX)])
+    remapped = remap_rows(rows, {7: 2})
+    assert remapped["track_id"].tolist() == [2, BALL_TRACK_ID]
+    assert rows["track_id"].tolist() == [7, BALL_TRACK_ID]  # Las filas originales no cambian
+
+
+def test_shard_stitcher_joins_ids():
+    shards = plan_shards(20, 2, overlap=4)  # [(0, 0, 10), (6, 10, 20)]
+    first = TrackStore().extend([make_rows([("players", 2, runner(f)), ("referees", 3, STANDING),
+                                            ("ball", BALL_TRACK_ID, BALL_BOX)]) for f in range(10)])
+    second = TrackStore()
+    for local_frame in range(14):
+        frame_num = 6 + local_frame
+        objects = [("players", 5, runner(frame_num)), ("referees", 6, STANDING), ("ball", BALL_TRACK_ID, BALL_BOX)]
+        if local_frame < 4:
+            objects.append(("players", 11, [0, 300, 40, 380]))  # Solo en el solape: se descarta
+        if local_frame >= 8:
+            objects.append(("players", 2, [500, 300, 540, 380]))  # Jugador nuevo con un ID local ya usado
+        second.append_frame(local_frame, make_rows(objects))
+
+    stitcher = ShardStitcher()
+    stitcher.add_shard(shards[0], first)
+    store = stitcher.add_shard(shards[1], second)
+
+    assert store.num_frames == 20
+    assert stitcher.matched_ids == 2 and stitcher.new_ids == 1
+    frames, bboxes = store.trajectory(2)
+    assert frames.tolist() == list(range(20))
+    np.testing.assert_allclose(bboxes[:, 0], 5 * np.arange(20))
+    assert store.trajectory(3, "referees")[0].tolist() == list(range(20))
+    assert store.trajectory(BALL_TRACK_ID, "ball")[0].tolist() == list(range(20))
+    # El jugador nuevo recibe un ID que no choca con los del primer tramo
+    (new_id,) = set(store.track_ids("players")) - {2}
+    assert new_id > 3
+    assert store.trajectory(new_id)[0].tolist() == list(range(14, 20))
+    assert stitcher.summary() == "2 IDs unidos entre tramos, 1 IDs nuevos"
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from team_assigner import TeamAssigner
+from team_assigner.team_assigner import COLOR_TOLERANCE, crop_top_half, two_means_colors
+
+GRASS = (40, 140, 40)
+TEAM_COLORS = [(30, 30, 200), (220, 220, 220)]
+
+
+def make_frame(rng, num_players=12, size=(360, 640)):
+    # Césped con ruido y jugadores con la camiseta de uno de dos equipos (con margen de césped)
+    frame = np.clip(rng.normal(GRASS, 6, size + (3,)), 0, 255).astype(np.uint8)
+    bboxes = []
+    for i in range(num_players):
+        w, h = int(rng.integers(25, 50)), int(rng.integers(60, 100))
+        x1, y1 = int(rng.integers(0, size[1] - w)), int(rng.integers(0, size[0] - h))
+        jersey = np.clip(rng.normal(TEAM_COLORS[i % 2], 6, (h // 2 - 8, w - 12, 3)), 0, 255)
+        frame[y1 + 6:y1 + h // 2 - 2, x1 + 6:x1 + w - 6] = jersey.astype(np.uint8)
+        frame[y1 + h // 2:y1 + h, x1 + 8:x1 + w - 8] = (20, 20, 20)
+        bboxes.append([float(x1), float(y1), float(x1 + w), float(y1 + h)])
+    return frame, bboxes
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def test_two_means_matches_per_crop_kmeans(rng):
+    team_assigner = TeamAssigner()
+    frame, bboxes = make_frame(rng)
+    # Jugadores sin solapes para que la referencia no sea ambigua
+    boxes = []
+    for bbox in bboxes:
+        if all(bbox[2] <= other[0] or other[2] <= bbox[0] or bbox[3] <= other[1] or other[3] <= bbox[1]
+               for other in boxes):
+            boxes.append(bbox)
+    reference = np.array([team_assigner.get_player_color_kmeans(frame, bbox) for bbox in boxes])
+    colors = team_assigner.get_player_colors(frame, boxes)
+    assert colors.shape == (len(boxes), 3)
+    assert np.abs(colors - reference).max() <= COLOR_TOLERANCE
+
+
+def test_two_means_finds_jersey_not_grass(rng):
+    frame, bboxes = make_frame(rng, num_players=2)
+    colors = two_means_colors([crop_top_half(frame, bbox) for bbox in bboxes])
+    for color, team_color in zip(colors, TEAM_COLORS):
+        assert np.abs(color - team_color).max() <= COLOR_TOLERANCE
+
+
+def test_two_means_batches_are_independent(rng):
+    frames_bboxes = [make_frame(rng) for _ in range(3)]
+    crops = [crop_top_half(frame, bbox) for frame, bboxes in frames_bboxes for bbox in bboxes]
+    together = two_means_colors(crops)
+    one_by_one = np.concatenate([two_means_colors([crop]) for crop in crops])
+    np.testing.assert_allclose(together, one_by_one, atol=1e-3)
+
+
+def test_two_means_empty_crops():
+    crops = [np.zeros((0, 5, 3), dtype=np.uint8), np.full((6, 4, 3), 50, dtype=np.uint8)]
+    colors = two_means_colors(crops)
+    assert colors[0].tolist() == [0, 0, 0]
+    np.testing.assert_allclose(colors[1], [50, 50, 50])
+    assert two_means_colors([]).shape == (0, 3)
+
+
+def test_assign_team_color_needs_n_clusters_players(rng):
+    frame, bboxes = make_frame(rng, num_players=4)
+    team_assigner = TeamAssigner(n_clusters=3)
+    assert not team_assigner.assign_team_color(frame, {i: {"bbox": bboxes[i]} for i in range(2)})
+    team_assigner = TeamAssigner()
+    assert team_assigner.assign_team_color(frame, {i: {"bbox": bbox} for i, bbox in enumerate(bboxes)})
+    centers = sorted(tuple(np.round(color)) for color in team_assigner.team_colors.values())
+    expected = sorted(TEAM_COLORS)
+    assert np.abs(np.array(centers) - np.array(expected)).max() <= COLOR_TOLERANCE
@@ -0,0 +1,118 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from trackers.track_store import TrackStore, OBJECT_TYPE_CODES, OBJECT_TYPES
+
+
+STUB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "stubs", "track_stubs_futbol.pkl")
+
+
+def make_rows(object_types, track_ids, bboxes):
+    return {
+        "object_type": np.array([OBJECT_TYPE_CODES[object_type] for object_type in object_types], dtype=np.int8),
+        "track_id": np.array(track_ids, dtype=np.int32),
+        "bbox": np.array(bboxes, dtype=np.float32).reshape(-1, 4),
+        "conf": np.ones(len(track_ids), dtype=np.float32),
+    }
+
+
+def make_tracks():
+    return {
+        "players": [{3: {"bbox": [0.0, 0.0, 10.0, 20.0]}, 7: {"bbox": [50.0, 50.0, 60.0, 80.0], "team": 2}},
+                    {}, {7: {"bbox": [52.0, 51.0, 62.0, 81.0], "team": 2}}],
+        "referees": [{}, {9: {"bbox": [1.0, 2.0, 3.0, 4.0]}}, {}],
+        "ball": [{1: {"bbox": [5.0, 5.0, 7.0, 7.0]}}, {}, {1: {"bbox": [9.0, 9.0, 11.0, 11.0]}}],
+        "managers": [{}, {}, {}],
+        "goalkeepers": [{}, {}, {4: {"bbox": [100.0, 100.0, 110.0, 130.0]}}],
+    }
+
+
+def test_dict_round_trip():
+    tracks = make_tracks()
+    assert TrackStore.from_dict(tracks).to_dict() == tracks
+
+
+def test_stub_round_trip():
+    with open(STUB_PATH, "rb") as f:
+        tracks = pickle.load(f)
+    result = TrackStore.from_dict(tracks).to_dict()
+    assert set(result) == set(OBJECT_TYPES)
+    for object_type in OBJECT_TYPES:
+        assert len(result[object_type]) == len(tracks["players"])
+        for frame, expected in zip(result[object_type], tracks[object_type]):
+            assert frame.keys() == expected.keys()
+            for track_id, track in expected.items():
+                np.testing.assert_allclose(frame[track_id]["bbox"], track["bbox"], rtol=1e-6)
+
+
+def test_trajectory_and_frame_rows():
+    store = TrackStore()
+    store.append_frame(0, make_rows(["players", "ball"], [3, 1], [[0, 0, 10, 10], [5, 5, 6, 6]]))
+    store.append_frame(1, make_rows(["players"], [3], [[1, 0, 11, 10]]))
+    store.append_frame(2, make_rows(["players", "players"], [4, 3], [[20, 20, 30, 30], [2, 0, 12, 10]]))
+
+    frames, bboxes = store.trajectory(3)
+    assert frames.tolist() == [0, 1, 2]
+    assert bboxes[:, 0].tolist() == [0, 1, 2]
+    assert sorted(store.track_ids("players")) == [3, 4]
+    # Dentro de un frame se conserva el orden de inserción
+    assert store.frame_rows(2)["track_id"].tolist() == [4, 3]
+    assert store.trajectory(99)[0].size == 0
+
+
+def test_empty_frames_count():
+    store = TrackStore()
+    store.append_frame(4, make_rows([], [], []))
+    assert store.num_frames == 5
+    assert len(store) == 0
+    assert store.to_dict()["players"] == [{}] * 5
+
+
+def test_set_team():
+    store = TrackStore.from_dict(make_tracks())
+    store.set_team(3, 1)
+    assert store.to_dict()["players"][0][3]["team"] == 1
+
+
+def test_interpolate_gaps():
+    store = TrackStore()
+    store.append_frame(0, make_rows(["players", "ball"], [3, 1], [[0, 0, 10, 10], [0, 0, 2, 2]]))
+    store.append_frame(4, make_rows(["players", "ball"], [3, 1], [[8, 4, 18, 14], [4, 4, 6, 6]]))
+
+    assert store.interpolate_gaps() == 6
+    frames, bboxes = store.trajectory(3)
+    assert frames.tolist() == [0, 1, 2, 3, 4]
+    np.testing.assert_allclose(bboxes[:, 0], [0, 2, 4, 6, 8])
+    np.testing.assert_allclose(bboxes[:, 1], [0, 1, 2, 3, 4])
+    # Las filas interpoladas no vienen del detector
+    assert store.frame_rows(2)["conf"].tolist() == [0.0, 0.0]
+    assert store.frame_rows(2)["track_id"].tolist() == [3, 1]
+
+
+def test_interpolate_gaps_respects_max_gap():
+    store = TrackStore()
+    store.append_frame(0, make_rows(["players", "players"], [3, 5], [[0, 0, 10, 10], [0, 0, 10, 10]]))
+    store.append_frame(3, make_rows(["players"], [3], [[3, 0, 13, 10]]))
+    store.append_frame(20, make_rows(["players"], [5], [[20, 0, 30, 10]]))
+
+    # Hueco de 2 frames (track 3) sí; hueco de 19 frames (track 5) no
+    assert store.interpolate_gaps(max_gap=4) == 2
+    assert store.trajectory(3)[0].tolist() == [0, 1, 2, 3]
+    assert store.trajectory(5)[0].tolist() == [0, 20]
+
+
+def test_interpolate_gaps_does_not_cross_tracks():
+    store = TrackStore()
+    store.append_frame(0, make_rows(["players"], [3], [[0, 0, 10, 10]]))
+    store.append_frame(5, make_rows(["players"], [4], [[50, 0, 60, 10]]))
+    assert store.interpolate_gaps() == 0
+    assert len(store) == 2
+
+
+@pytest.mark.parametrize("max_gap", [None, 1])
+def test_interpolate_gaps_without_gaps(max_gap):
+    store = TrackStore().extend([make_rows(["players"], [3], [[i, 0, i + 10, 10]]) for i in range(4)])
+    assert store.interpolate_gaps(max_gap) == 0
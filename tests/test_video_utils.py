@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from utils import get_frame_range, get_video_info, read_video, read_video_frames, resize_to_fit, save_video
+
+NUM_FRAMES, FPS = 40, 10
+HEIGHT, WIDTH = 96, 128
+
+
+BLOCK = 16  # Lado de cada bloque del código binario del número de frame
+
+
+def make_frame(frame_num):
+    # Número de frame en binario con bloques blancos/negros de 16 px (sobreviven a la compresión)
+    frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    for bit in range(6):
+        if frame_num >> bit & 1:
+            frame[:BLOCK, bit * BLOCK:(bit + 1) * BLOCK] = 255
+    return frame
+
+
+def frame_id(frame):
+    # Lee el número de frame a partir de los bloques, a cualquier escala del frame
+    block = frame.shape[1] * BLOCK // WIDTH
+    return sum(1 << bit for bit in range(6) if frame[:block, bit * block:(bit + 1) * block].mean() > 128)
+
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("video") / "frames.mp4")
+    save_video((make_frame(frame_num) for frame_num in range(NUM_FRAMES)), path, fps=FPS)
+    return path
+
+
+@pytest.fixture(scope="module")
+def all_frames(video_path):
+    frames = read_video(video_path)
+    assert [frame_id(frame) for frame in frames] == list(range(NUM_FRAMES))
+    return frames
+
+
+def test_video_info(video_path):
+    info = get_video_info(video_path)
+    assert info["num_frames"] == NUM_FRAMES and info["fps"] == FPS
+    assert (info["width"], info["height"]) == (WIDTH, HEIGHT)
+    assert info["duration"] == NUM_FRAMES / FPS
+
+
+@pytest.mark.parametrize("start, end, stride", [(0, None, 1), (7, None, 1), (7, 23, 1), (0, None, 3),
+                                                (5, 30, 4), (13, 14, 2), (38, None, 5), (35, 100, 2)])
+def test_seek_stride_and_end_match_slicing(video_path, all_frames, start, end, stride):
+    frames = list(read_video_frames(video_path, start_frame=start, end_frame=end, stride=stride))
+    expected = all_frames[start:end:stride]
+    assert [frame_id(frame) for frame in frames] == [frame_id(frame) for frame in expected]
+    for frame, expected_frame in zip(frames, expected):
+        np.testing.assert_array_equal(frame, expected_frame)
+    assert read_video(video_path, start_frame=start, end_frame=end, stride=stride)[0].shape == (HEIGHT, WIDTH, 3)
+
+
+def test_time_range_uses_fps(video_path, all_frames):
+    assert get_frame_range(video_path, start_time=1.0, end_time=2.5) == (10, 25)
+    assert get_frame_range(video_path) == (0, None)
+    frames = read_video(video_path, start_time=1.0, end_time=2.5, stride=2)
+    assert [frame_id(frame) for frame in frames] == list(range(10, 25, 2))
+
+
+def test_max_size_resizes_every_frame(video_path):
+    frames = read_video(video_path, end_frame=3, max_size=64)
+    assert [frame.shape for frame in frames] == [(48, 64, 3)] * 3
+    assert [frame_id(frame) for frame in frames] == [0, 1, 2]
+    frame, scale = resize_to_fit(np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8), 64)
+    assert frame.shape == (48, 64, 3) and scale == 2.0
+    assert resize_to_fit(frame, 200) == (frame, 1.0)
+
+
+def test_resumed_segment_reads_the_remaining_frames(video_path, all_frames):
+    # Al reanudar, main.py salta a start + resume * stride: el lector sigue el mismo tramo
+    start, end, stride, resume = 5, 33, 3, 4
+    segment = all_frames[start:end:stride]
+    resumed = list(read_video_frames(video_path, start_frame=start + resume * stride, end_frame=end, stride=stride))
+    assert [frame_id(frame) for frame in resumed] == [frame_id(frame) for frame in segment[resume:]]
+
+
+class FrameIdBackend:
+    # Un jugador por frame cuya caja empieza en x = número del frame de origen
+    names = {0: "ball", 1: "goalkeeper", 2: "player", 3: "referee"}
+
+    def predict(self, frames, conf):
+        import supervision as sv
+        return [sv.Detections(xyxy=np.array([[frame_id(frame), 20, frame_id(frame) + 40, 80]], dtype=np.float32),
+                              confidence=np.array([0.9], dtype=np.float32), class_id=np.array([2]))
+                for frame in frames]
+
+
+def test_segment_tracks_map_back_to_source_frames(video_path):
+    # Los tracks de un tramo se indexan desde 0: el frame i es el frame start + i * stride del video
+    pytest.importorskip("supervision")
+    from trackers import Tracker
+    start, end, stride = 6, 31, 4
+    tracker = Tracker("best.pt", backend=FrameIdBackend(), batch_size=4)
+    tracks = tracker.get_track_store(read_video_frames(video_path, start_frame=start, end_frame=end,
+                                                       stride=stride)).to_dict()
+    source_frames = list(range(start, end, stride))
+    assert len(tracks["players"]) == len(source_frames)
+    for i, source_frame in enumerate(source_frames):
+        ((bbox,),) = [[track["bbox"] for track in tracks["players"][i].values()]]
+        assert bbox[0] == pytest.approx(source_frame)
@@ -1 +1,9 @@
-from .tracker import Tracker
\ No newline at end of file
+from .tracker import Tracker
+from .track_store import TrackStore
+from .detection_cache import DetectionCache
+from .frame_filter import FrameDeduplicator
+from .ball_refiner import BallRefiner
+from .backends import create_backend, autotune_backend, check_backend_accuracy
+from .keyframes import KeyframeScheduler, drift_report, format_drift_report
+from .renderer import AnnotationRenderer, render_video_parallel
+from .sharding import ShardStitcher, track_video_sharded
\ No newline at end of file
@@ -0,0 +1,334 @@
+import json
+import os
+import platform
+import shutil
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append("/..")
+from utils import resize_to_fit
+from .detection_cache import file_digest
+
+
+class InferenceBackend:
+    # Interfaz común de los backends de inferencia: recibe una lista de frames BGR y
+    # devuelve una sv.Detections por frame, en coordenadas del frame original.
+    name = None
+
+    def __init__(self, model_path, num_threads=None, imgsz=640):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.imgsz = imgsz
+        self.names = {}
+        self.loaded = False
+
+    @property
+    def names(self):
+        self.load()
+        return self._names
+
+    @names.setter
+    def names(self, names):
+        self._names = names
+
+    def load(self):
+        # Carga perezosa: los pesos (y torch / ultralytics / onnxruntime / openvino) no se cargan
+        # al crear el backend sino en la primera inferencia (o al pedir 'names'), así que una
+        # ejecución que no infiere (todo en caché, tracks de un stub) nunca paga ese coste
+        if not self.loaded:
+            self._load()
+            self.loaded = True
+        return self
+
+    def _load(self):
+        pass
+
+    def predict(self, frames, conf, imgsz=None, classes=None):
+        raise NotImplementedError
+
+    def get_params(self):
+        # Parámetros que cambian las detecciones (para la clave de DetectionCache)
+        return {"backend": self.name, "imgsz": self.imgsz}
+
+
+class TorchBackend(InferenceBackend):
+    # PyTorch a través de ultralytics (el comportamiento original de Tracker)
+    name = "torch"
+
+    def _load(self):
+        from ultralytics import YOLO
+        import torch
+        if self.num_threads is not None:
+            torch.set_num_threads(self.num_threads)
+        self.model = YOLO(self.model_path)
+        self.names = self.model.names
+
+    def predict(self, frames, conf, imgsz=None, classes=None):
+        import supervision as sv
+        self.load()
+        results = self.model.predict(frames, conf=conf, imgsz=imgsz or self.imgsz, classes=classes, verbose=False)
+        return [sv.Detections.from_ultralytics(result) for result in results]
+
+
+def letterbox(frame, imgsz, color=(114, 114, 114)):
+    # Redimensiona manteniendo la proporción y rellena hasta imgsz x imgsz (igual que ultralytics)
+    h, w = frame.shape[:2]
+    gain = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * gain)), int(round(h * gain))
+    pad_w, pad_h = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return frame, gain, (left, top)
+
+
+class ExportedBackend(InferenceBackend):
+    # Base de los backends sobre un modelo exportado (ONNX / OpenVINO): el pre y
+    # postprocesado (letterbox, umbral de confianza, NMS por clase) se hace aquí.
+    iou = 0.7
+    max_det = 300
+
+    def __init__(self, model_path, num_threads=None, imgsz=640, export_dir="exports"):
+        super().__init__(model_path, num_threads, imgsz)
+        self.export_dir = export_dir
+
+    def _load(self):
+        self.export_path = export_model(self.model_path, self.export_format, self.export_dir, self.imgsz)
+        with open(os.path.join(os.path.dirname(self.export_path), "names.json"), "r") as f:
+            self.names = {int(cls_id): name for cls_id, name in json.load(f).items()}
+
+    def run(self, batch):
+        raise NotImplementedError
+
+    def predict(self, frames, conf, imgsz=None, classes=None):
+        self.load()
+        imgsz = imgsz or self.imgsz
+        letterboxed = [letterbox(frame, imgsz) for frame in frames]
+        batch = np.stack([image for image, _, _ in letterboxed])
+        batch = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0  # BGR -> RGB, NCHW
+        outputs = self.run(batch)  # (batch, 4 + num_clases, num_anclas)
+        detections = []
+        for output, (_, gain, (pad_x, pad_y)), frame in zip(outputs, letterboxed, frames):
+            detections.append(self.postprocess(output.T, gain, pad_x, pad_y, frame.shape, conf, classes))
+        return detections
+
+    def postprocess(self, predictions, gain, pad_x, pad_y, frame_shape, conf, classes):
+        import supervision as sv
+        scores = predictions[:, 4:]
+        class_id = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), class_id]
+        keep = confidence > conf
+        if classes is not None:
+            keep &= np.isin(class_id, classes)
+        boxes, confidence, class_id = predictions[keep, :4], confidence[keep], class_id[keep]
+        if len(boxes) == 0:
+            return sv.Detections.empty()
+
+        # NMS por clase (cx, cy, w, h -> x, y, w, h)
+        xywh = np.stack([boxes[:, 0] - boxes[:, 2] / 2, boxes[:, 1] - boxes[:, 3] / 2, boxes[:, 2], boxes[:, 3]], axis=1)
+        indices = np.array(cv2.dnn.NMSBoxesBatched(xywh.tolist(), confidence.tolist(), class_id.tolist(), conf, self.iou), dtype=int).reshape(-1)
+        indices = indices[np.argsort(-confidence[indices])][:self.max_det]
+
+        xyxy = np.concatenate([xywh[indices, :2], xywh[indices, :2] + xywh[indices, 2:]], axis=1)
+        xyxy = (xyxy - [pad_x, pad_y, pad_x, pad_y]) / gain  # Vuelta a coordenadas del frame original
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, frame_shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, frame_shape[0])
+        return sv.Detections(xyxy=xyxy.astype(np.float32),
+                             confidence=confidence[indices].astype(np.float32),
+                             class_id=class_id[indices].astype(int))
+
+
+class OnnxBackend(ExportedBackend):
+    name = "onnx"
+    export_format = "onnx"
+
+    def _load(self):
+        super()._load()
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if self.num_threads is not None:
+            options.intra_op_num_threads = self.num_threads
+        self.session = ort.InferenceSession(self.export_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OnnxInt8Backend(OnnxBackend):
+    # ONNX con pesos cuantizados a int8 (cuantización dinámica de onnxruntime)
+    name = "onnx-int8"
+    export_format = "onnx-int8"
+
+
+class OpenVinoBackend(ExportedBackend):
+    name = "openvino"
+    export_format = "openvino"
+
+    def _load(self):
+        super()._load()
+        import openvino as ov
+        config = {"INFERENCE_NUM_THREADS": self.num_threads} if self.num_threads is not None else {}
+        self.compiled_model = ov.Core().compile_model(self.export_path, "CPU", config)
+
+    def run(self, batch):
+        return self.compiled_model(batch)[0]
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, OnnxBackend, OnnxInt8Backend, OpenVinoBackend)}
+
+
+def create_backend(name, model_path, num_threads=None, imgsz=640, export_dir="exports"):
+    if name not in BACKENDS:
+        raise ValueError(f"Backend desconocido '{name}'. Disponibles: {', '.join(BACKENDS)}")
+    if name == TorchBackend.name:
+        return TorchBackend(model_path, num_threads, imgsz)
+    return BACKENDS[name](model_path, num_threads, imgsz, export_dir)
+
+
+def export_model(model_path, export_format, export_dir="exports", imgsz=640):
+    # Exporta 'best.pt' una sola vez por (pesos, formato, imgsz) y devuelve la ruta del
+    # modelo convertido. El resultado se guarda en export_dir/<hash de los pesos>/...
+    # junto con los nombres de clase, así que las siguientes ejecuciones no necesitan torch.
+    target_dir = os.path.join(export_dir, file_digest(model_path, export_dir)[:16], f"{export_format}_{imgsz}")
+    model_name = os.path.splitext(os.path.basename(model_path))[0]
+    target_path = os.path.join(target_dir, f"{model_name}.xml" if export_format == "openvino" else f"{model_name}.onnx")
+    if os.path.exists(target_path):
+        return target_path
+
+    if export_format == "onnx-int8":
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        fp32_path = export_model(model_path, "onnx", export_dir, imgsz)
+        os.makedirs(target_dir, exist_ok=True)
+        shutil.copy(os.path.join(os.path.dirname(fp32_path), "names.json"), target_dir)
+        quantize_dynamic(fp32_path, target_path, weight_type=QuantType.QUInt8)
+        return target_path
+
+    from ultralytics import YOLO
+    model = YOLO(model_path)
+    exported = model.export(format=export_format, imgsz=imgsz, dynamic=True)
+    if os.path.isdir(exported):
+        # OpenVINO exporta un directorio con el .xml y el .bin
+        shutil.copytree(exported, target_dir, dirs_exist_ok=True)
+        shutil.rmtree(exported)
+        target_path = os.path.join(target_dir, [f for f in os.listdir(target_dir) if f.endswith(".xml")][0])
+    else:
+        os.makedirs(target_dir, exist_ok=True)
+        shutil.move(exported, target_path)
+    with open(os.path.join(target_dir, "names.json"), "w") as f:
+        json.dump({str(cls_id): name for cls_id, name in model.names.items()}, f, indent=2)
+    return target_path
+
+
+def get_machine_id():
+    return f"{platform.node()}|{platform.machine()}|{platform.processor()}|{os.cpu_count()}"
+
+
+def autotune_backend(backend_name, model_path, frames, conf=0.1, batch_sizes=(1, 2, 4, 8, 16),
+                     thread_counts=None, imgsz=640, export_dir="exports", cache_path=None, inference_size=None):
+    # Busca el tamaño de lote y el número de hilos con más frames/s en esta máquina.
+    # 'frames' es una muestra de frames reales del video; con 'inference_size' se reducen igual
+    # que en Tracker.predict antes de medir, porque es el tamaño que recibirá el backend.
+    # El resultado se guarda en 'cache_path' (por backend, pesos, tamaño de entrada y máquina)
+    # para no repetir la búsqueda. Cada medida queda en result["measurements"].
+    cache_key = f"{backend_name}|{file_digest(model_path, export_dir)[:16]}|{imgsz}|{inference_size}|{get_machine_id()}"
+    results_cache = {}
+    if cache_path is not None and os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            results_cache = json.load(f)
+        if cache_key in results_cache:
+            return results_cache[cache_key]
+
+    if inference_size is not None:
+        frames = [resize_to_fit(frame, inference_size)[0] for frame in frames]
+    if thread_counts is None:
+        cpu_count = os.cpu_count() or 1
+        thread_counts = sorted({max(1, cpu_count // 4), max(1, cpu_count // 2), cpu_count})
+
+    measurements = []
+    for num_threads in thread_counts:
+        backend = create_backend(backend_name, model_path, num_threads, imgsz, export_dir)
+        for batch_size in batch_sizes:
+            if batch_size > len(frames):
+                continue
+            sample = frames[:max(batch_size, len(frames) // batch_size * batch_size)]
+            backend.predict(sample[:batch_size], conf)  # Calentamiento
+            start = time.perf_counter()
+            for i in range(0, len(sample), batch_size):
+                backend.predict(sample[i:i + batch_size], conf)
+            fps = len(sample) / (time.perf_counter() - start)
+            measurements.append({"num_threads": num_threads, "batch_size": batch_size, "fps": round(fps, 2)})
+
+    best = max(measurements, key=lambda measurement: measurement["fps"])
+    result = {"backend": backend_name, "num_threads": best["num_threads"], "batch_size": best["batch_size"],
+              "fps": best["fps"], "inference_size": inference_size, "measurements": measurements}
+    if cache_path is not None:
+        results_cache[cache_key] = result
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        with open(cache_path, "w") as f:
+            json.dump(results_cache, f, indent=2)
+    return result
+
+
+def box_iou(boxes_a, boxes_b):
+    # IoU entre dos conjuntos de cajas xyxy -> matriz (len(a), len(b))
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return intersection / np.maximum(area_a[:, None] + area_b[None, :] - intersection, 1e-9)
+
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    # Emparejamiento voraz (por IoU descendente) de cajas de la misma clase.
+    # Devuelve (índices de referencia, índices del candidato, IoUs) de las parejas.
+    if len(reference) == 0 or len(candidate) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+    iou = box_iou(reference.xyxy, candidate.xyxy)
+    iou[reference.class_id[:, None] != candidate.class_id[None, :]] = 0
+    pairs = np.argwhere(iou >= iou_threshold)
+    pairs = pairs[np.argsort(-iou[pairs[:, 0], pairs[:, 1]])]
+    used_reference, used_candidate, matches = set(), set(), []
+    for i, j in pairs.tolist():
+        if i not in used_reference and j not in used_candidate:
+            used_reference.add(i)
+            used_candidate.add(j)
+            matches.append((i, j))
+    matches = np.array(matches, dtype=int).reshape(-1, 2)
+    return matches[:, 0], matches[:, 1], iou[matches[:, 0], matches[:, 1]]
+
+
+def compare_detections(reference_detections, candidate_detections, iou_threshold=0.5):
+    # Recall, precisión e IoU medio de un conjunto de detecciones frente a otro de referencia
+    num_reference = num_candidate = num_matched = 0
+    ious = []
+    for reference, candidate in zip(reference_detections, candidate_detections):
+        _, _, matched_iou = match_detections(reference, candidate, iou_threshold)
+        num_reference += len(reference)
+        num_candidate += len(candidate)
+        num_matched += len(matched_iou)
+        ious.extend(matched_iou.tolist())
+    return {
+        "recall": num_matched / num_reference if num_reference else 1.0,
+        "precision": num_matched / num_candidate if num_candidate else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else 0.0,
+        "reference_detections": num_reference,
+        "candidate_detections": num_candidate,
+    }
+
+
+def check_backend_accuracy(backend, frames, conf=0.1, reference_backend=None, batch_size=8):
+    # Compara las detecciones de 'backend' con las de PyTorch (la referencia) sobre un clip
+    if reference_backend is None:
+        reference_backend = TorchBackend(backend.model_path, imgsz=backend.imgsz)
+    reference, candidate = [], []
+    for i in range(0, len(frames), batch_size):
+        reference += reference_backend.predict(frames[i:i + batch_size], conf)
+        candidate += backend.predict(frames[i:i + batch_size], conf)
+    return compare_detections(reference, candidate)
@@ -0,0 +1,117 @@
+import numpy as np
+import sys
+sys.path.append("/..")
+from utils import METRICS
+
+
+class BallRefiner:
+    # Segunda pasada de inferencia solo para el balón. En los frames donde la detección
+    # del frame completo no encuentra el balón, se recorta una ventana de 'window' x 'window'
+    # píxeles alrededor de la posición prevista (extrapolación lineal de las dos últimas
+    # posiciones conocidas) y se pasa al detector a resolución nativa (sin reducir la
+    # imagen), donde el balón ocupa muchos más píxeles de entrada que en el frame completo.
+    # Tras 'max_lost' frames seguidos sin balón la previsión ya no es fiable: se deja de
+    # recortar y el balón solo se busca en la detección del frame completo hasta recuperarlo.
+    def __init__(self, window=320, max_lost=15, conf=0.05, ball_class_name="ball"):
+        self.window = window
+        self.max_lost = max_lost
+        self.conf = conf
+        self.ball_class_name = ball_class_name
+        self.reset()
+        self.roi_frames = 0   # Frames en los que se ha ejecutado la pasada de la ventana
+        self.roi_hits = 0     # ... y en los que ha encontrado el balón
+
+    def get_params(self):
+        # Parámetros que cambian las detecciones (para la clave de DetectionCache)
+        return {"window": self.window, "max_lost": self.max_lost, "conf": self.conf}
+
+    def reset(self):
+        self.last_positions = []  # Últimas dos posiciones conocidas (frame, centro)
+        self.lost_frames = 0
+        self.frame_num = 0
+        self.last_refined = None  # Detección refinada del último frame no duplicado
+
+    def predict_center(self, frame_num):
+        # Extrapolación lineal (velocidad constante) desde las dos últimas posiciones
+        if len(self.last_positions) == 1:
+            return self.last_positions[0][1]
+        (f0, c0), (f1, c1) = self.last_positions
+        return c1 + (c1 - c0) * (frame_num - f1) / (f1 - f0)
+
+    def observe(self, frame_num, center):
+        self.last_positions = (self.last_positions + [(frame_num, np.asarray(center, dtype=np.float64))])[-2:]
+        self.lost_frames = 0
+
+    def get_window(self, frame_shape, center):
+        # Ventana de 'window' píxeles centrada en 'center' y desplazada para quedar dentro del frame
+        height, width = frame_shape[:2]
+        win_w, win_h = min(self.window, width), min(self.window, height)
+        x0 = int(np.clip(round(center[0] - win_w / 2), 0, width - win_w))
+        y0 = int(np.clip(round(center[1] - win_h / 2), 0, height - win_h))
+        return x0, y0, x0 + win_w, y0 + win_h
+
+    def refine(self, frames, detections, backend, duplicates=None, frame_nums=None):
+        # 'detections': sv.Detections de la detección del frame completo de cada frame del lote.
+        # Devuelve la lista con el balón añadido en los frames donde lo encuentra la ventana.
+        # 'duplicates' marca los frames que el prefiltro no ha inferido: en ellos no se busca el
+        # balón (sería repetir la inferencia que el prefiltro evita) y se reutiliza la detección
+        # refinada del último frame no duplicado.
+        # 'frame_nums' son los números de frame del lote si no siguen al lote anterior (keyframes).
+        ball_ids = [cls_id for cls_id, name in backend.names.items() if name == self.ball_class_name]
+        duplicates = duplicates or [False] * len(frames)
+        if frame_nums is None:
+            frame_nums = list(range(self.frame_num, self.frame_num + len(frames)))
+        crops, windows, targets = [], [], []
+        for i, (frame, detection) in enumerate(zip(frames, detections)):
+            if duplicates[i]:
+                continue
+            frame_num = frame_nums[i]
+            ball_mask = np.isin(detection.class_id, ball_ids)
+            if ball_mask.any():
+                xyxy = detection.xyxy[np.flatnonzero(ball_mask)[-1]]  # Igual que el tracker: la última
+                self.observe(frame_num, (xyxy[:2] + xyxy[2:]) / 2)
+                continue
+            # Frames transcurridos desde la última posición conocida (entre keyframes, más de uno)
+            self.lost_frames = frame_num - self.last_positions[-1][0] if self.last_positions else self.lost_frames + 1
+            if not self.last_positions or self.lost_frames > self.max_lost:
+                continue
+            x0, y0, x1, y1 = self.get_window(frame.shape, self.predict_center(frame_num))
+            crops.append(frame[y0:y1, x0:x1])
+            windows.append((x0, y0))
+            targets.append(i)
+
+        if crops:
+            import supervision as sv
+            # Todas las ventanas del lote en una sola llamada al detector, a su tamaño nativo
+            self.roi_frames += len(crops)
+            imgsz = int(np.ceil(max(max(crop.shape[:2]) for crop in crops) / 32) * 32)
+            with METRICS.stage("ball_roi", items=len(crops)):
+                roi_detections = backend.predict(crops, conf=self.conf, imgsz=imgsz, classes=ball_ids)
+            detections = list(detections)
+            found = []
+            for i, (x0, y0), roi_detection in zip(targets, windows, roi_detections):
+                roi_detection = roi_detection[np.isin(roi_detection.class_id, ball_ids)]
+                if len(roi_detection) == 0:
+                    continue
+                ball = roi_detection[[int(np.argmax(roi_detection.confidence))]]
+                ball.xyxy = ball.xyxy + np.array([x0, y0, x0, y0], dtype=ball.xyxy.dtype)
+                detections[i] = sv.Detections.merge([detections[i], ball])
+                found.append((frame_nums[i], (ball.xyxy[0, :2] + ball.xyxy[0, 2:]) / 2))
+                self.roi_hits += 1
+            if found:
+                # Las posiciones de las ventanas se incorporan en orden de frame
+                self.last_positions = sorted(self.last_positions + found, key=lambda position: position[0])[-2:]
+                self.lost_frames = frame_nums[-1] - self.last_positions[-1][0]
+
+        detections = list(detections)
+        for i, duplicate in enumerate(duplicates):
+            if not duplicate:
+                self.last_refined = detections[i]
+            elif self.last_refined is not None:
+                detections[i] = self.last_refined
+        self.frame_num = frame_nums[-1] + 1 if frame_nums else self.frame_num
+        return detections
+
+    def summary(self):
+        ratio = self.roi_hits / self.roi_frames if self.roi_frames else 0.0
+        return f"balón recuperado en {self.roi_hits}/{self.roi_frames} ventanas ({ratio * 100:.1f}%)"
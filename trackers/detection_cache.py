@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Formato de cada fila guardada en los chunks (.npy, cargables con mmap)
+DETECTION_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("x1", "<f4"), ("y1", "<f4"), ("x2", "<f4"), ("y2", "<f4"),
+    ("conf", "<f4"),
+    ("class_id", "<i2"),
+])
+
+
+def _write_atomic(path, write_fn):
+    # Escribe en un fichero temporal y lo renombra: un corte a mitad nunca deja un fichero a medias
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write_fn(f)
+    os.replace(tmp_path, path)
+
+
+def file_digest(path, cache_dir=None, block_size=4 * 1024 * 1024):
+    # SHA-256 del contenido del fichero. Si se da 'cache_dir', se memoriza por
+    # (ruta, tamaño, fecha de modificación) para no releer varios GB en cada ejecución.
+    stat = os.stat(path)
+    memo_key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    memo_path = os.path.join(cache_dir, "digests.json") if cache_dir is not None else None
+    memo = {}
+    if memo_path is not None and os.path.exists(memo_path):
+        with open(memo_path, "r") as f:
+            memo = json.load(f)
+        if memo_key in memo:
+            return memo[memo_key]
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    digest = sha.hexdigest()
+
+    if memo_path is not None:
+        memo[memo_key] = digest
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_atomic(memo_path, lambda f: f.write(json.dumps(memo, indent=2).encode("utf-8")))
+    return digest
+
+
+def get_cache_key(video_path, model_path, params, cache_dir=None):
+    # Clave de contenido: hash del video + hash de los pesos + parámetros de inferencia
+    sha = hashlib.sha256()
+    sha.update(file_digest(video_path, cache_dir).encode("ascii"))
+    sha.update(file_digest(model_path, cache_dir).encode("ascii"))
+    sha.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return sha.hexdigest()[:32]
+
+
+class DetectionCache:
+    # Caché de detecciones (antes de ByteTrack) direccionada por contenido.
+    # Se guarda en chunks de 'chunk_size' frames que se van escribiendo durante la
+    # inferencia: si la ejecución se corta, la siguiente reanuda desde el último
+    # chunk completo reproduciendo las detecciones guardadas en un ByteTrack nuevo,
+    # con lo que el estado del tracker es el mismo que sin interrupción.
+    def __init__(self, cache_dir, video_path, model_path, params, chunk_size=256):
+        self.cache_dir = cache_dir
+        self.key = get_cache_key(video_path, model_path, params, cache_dir)
+        self.path = os.path.join(cache_dir, self.key)
+        self.meta_path = os.path.join(self.path, "meta.json")
+        os.makedirs(self.path, exist_ok=True)
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {
+                "video": os.path.basename(video_path),
+                "model": os.path.basename(model_path),
+                "params": params,
+                "chunk_size": chunk_size,
+                "class_names": None,
+                "completed_chunks": 0,
+                "num_frames": None,  # Se conoce al terminar el video
+            }
+        self.chunk_size = self.meta["chunk_size"]
+        self._rows = []
+        self._buffered_frames = 0
+
+    @property
+    def class_names(self):
+        names = self.meta["class_names"]
+        return {int(cls_id): name for cls_id, name in names.items()} if names is not None else None
+
+    @property
+    def is_complete(self):
+        return self.meta["num_frames"] is not None
+
+    @property
+    def cached_frames(self):
+        # Frames disponibles en la caché (los chunks completos, o todo el video si terminó)
+        if self.is_complete:
+            return self.meta["num_frames"]
+        return self.meta["completed_chunks"] * self.chunk_size
+
+    def _chunk_path(self, chunk_idx):
+        return os.path.join(self.path, f"chunk_{chunk_idx:06d}.npy")
+
+    def _save_meta(self):
+        _write_atomic(self.meta_path, lambda f: f.write(json.dumps(self.meta, indent=2).encode("utf-8")))
+
+    def load_chunk(self, chunk_idx):
+        # Carga un chunk con mmap: solo se leen del disco las páginas que se usan
+        return np.load(self._chunk_path(chunk_idx), mmap_mode="r")
+
+    def _detections_from_rows(self, rows):
+        import supervision as sv
+        return sv.Detections(
+            xyxy=np.stack([rows["x1"], rows["y1"], rows["x2"], rows["y2"]], axis=1).astype(np.float32).reshape(-1, 4),
+            confidence=np.asarray(rows["conf"], dtype=np.float32),
+            class_id=np.asarray(rows["class_id"]).astype(int)
+        )
+
+    def read_range(self, start_frame, end_frame):
+        # Devuelve las detecciones (sv.Detections) de los frames [start_frame, end_frame),
+        # cargando únicamente los chunks que cubren ese rango
+        end_frame = min(end_frame, self.cached_frames)
+        detections = []
+        for chunk_idx in range(start_frame // self.chunk_size, (end_frame - 1) // self.chunk_size + 1 if end_frame > start_frame else 0):
+            chunk = self.load_chunk(chunk_idx)
+            chunk_start = chunk_idx * self.chunk_size
+            first = max(start_frame, chunk_start)
+            last = min(end_frame, chunk_start + self.chunk_size)
+            offsets = np.searchsorted(chunk["frame"], np.arange(first, last + 1))
+            for i in range(last - first):
+                detections.append(self._detections_from_rows(chunk[offsets[i]:offsets[i + 1]]))
+        return detections
+
+    def iter_cached(self):
+        # Recorre chunk a chunk todas las detecciones guardadas
+        for start_frame in range(0, self.cached_frames, self.chunk_size):
+            yield from self.read_range(start_frame, start_frame + self.chunk_size)
+
+    def append(self, frame_num, detection_supervision, class_names):
+        # Añade la detección de un frame; al completar un chunk se escribe en disco
+        if self.meta["class_names"] is None:
+            self.meta["class_names"] = {str(cls_id): name for cls_id, name in class_names.items()}
+        rows = np.empty(len(detection_supervision), dtype=DETECTION_DTYPE)
+        rows["frame"] = frame_num
+        if len(detection_supervision):
+            xyxy = detection_supervision.xyxy
+            rows["x1"], rows["y1"], rows["x2"], rows["y2"] = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+            rows["conf"] = detection_supervision.confidence
+            rows["class_id"] = detection_supervision.class_id
+        self._rows.append(rows)
+        self._buffered_frames += 1
+        if self._buffered_frames == self.chunk_size:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        chunk_idx = self.meta["completed_chunks"]
+        rows = np.concatenate(self._rows) if self._rows else np.empty(0, dtype=DETECTION_DTYPE)
+        _write_atomic(self._chunk_path(chunk_idx), lambda f: np.save(f, rows))
+        self.meta["completed_chunks"] = chunk_idx + 1
+        self._save_meta()
+        self._rows = []
+        self._buffered_frames = 0
+
+    def reset(self):
+        # Descarta los chunks guardados y deja la caché vacía (se vuelve a detectar desde el frame 0)
+        for chunk_idx in range(self.meta["completed_chunks"]):
+            if os.path.exists(self._chunk_path(chunk_idx)):
+                os.remove(self._chunk_path(chunk_idx))
+        self.meta.update(class_names=None, completed_chunks=0, num_frames=None)
+        self._save_meta()
+        self._rows = []
+        self._buffered_frames = 0
+
+    def finish(self, num_frames):
+        # Escribe el último chunk (incompleto) y marca el video como terminado
+        if self._buffered_frames:
+            self._flush_chunk()
+        self.meta["num_frames"] = num_frames
+        self._save_meta()
@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+
+class FrameDeduplicator:
+    # Prefiltro barato para no enviar al modelo frames repetidos o casi estáticos
+    # (juego parado, repeticiones emitidas dos veces, gráficos congelados).
+    # Cada frame se resume con un hash perceptual (dHash de 64 bits sobre una versión
+    # reducida en grises) y una puntuación de diferencia (fracción de píxeles de esa
+    # versión reducida que cambian más de 'pixel_threshold'; a diferencia de la media,
+    # no se diluye cuando solo se mueven jugadores pequeños). Si ambos quedan dentro de los umbrales
+    # respecto al último frame INFERIDO, se reutilizan sus detecciones. Comparar con el
+    # último frame inferido (y no con el anterior) evita que la deriva se acumule.
+    def __init__(self, hash_threshold=2, diff_threshold=0.001, pixel_threshold=10, size=(160, 90)):
+        self.hash_threshold = hash_threshold    # Bits distintos admitidos en el dHash
+        self.diff_threshold = diff_threshold    # Fracción de píxeles cambiados admitida
+        self.pixel_threshold = pixel_threshold  # Cambio (niveles de gris) que cuenta como píxel cambiado
+        self.size = size
+        self.reference_hash = None
+        self.reference_small = None
+        self.total_frames = 0
+        self.skipped_frames = 0
+
+    def get_params(self):
+        # Parámetros que cambian las detecciones (para la clave de DetectionCache)
+        return {"hash_threshold": self.hash_threshold, "diff_threshold": self.diff_threshold,
+                "pixel_threshold": self.pixel_threshold, "size": list(self.size)}
+
+    def fingerprint(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA)
+        tiny = cv2.resize(small, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = (tiny[:, 1:] > tiny[:, :-1]).flatten()  # dHash: gradiente horizontal
+        frame_hash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+        return frame_hash, small.astype(np.int16)
+
+    def is_duplicate(self, frame):
+        # True si el frame puede reutilizar las detecciones del último frame inferido.
+        # Si es False, el frame pasa a ser la nueva referencia (se va a inferir).
+        self.total_frames += 1
+        frame_hash, small = self.fingerprint(frame)
+        if self.reference_hash is not None:
+            hash_distance = bin(frame_hash ^ self.reference_hash).count("1")
+            diff_score = (np.abs(small - self.reference_small) > self.pixel_threshold).mean()
+            if hash_distance <= self.hash_threshold and diff_score <= self.diff_threshold:
+                self.skipped_frames += 1
+                return True
+        self.reference_hash = frame_hash
+        self.reference_small = small
+        return False
+
+    def reset(self):
+        self.reference_hash = None
+        self.reference_small = None
+
+    def summary(self):
+        ratio = self.skipped_frames / self.total_frames if self.total_frames else 0.0
+        return f"{self.skipped_frames}/{self.total_frames} frames sin inferencia ({ratio * 100:.1f}%)"
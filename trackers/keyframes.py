@@ -0,0 +1,115 @@
+import numpy as np
+
+from .track_store import OBJECT_TYPES, BALL
+from .backends import match_detections
+
+
+class KeyframeScheduler:
+    # Decide cada cuántos frames se ejecuta el detector (los "keyframes"). Los frames
+    # intermedios se rellenan después interpolando cada track entre dos keyframes.
+    # Con 'adaptive', el paso se reduce cuando los jugadores se mueven mucho entre
+    # keyframes o ByteTrack pierde tracks, y crece poco a poco cuando el juego está tranquilo.
+    def __init__(self, stride=5, min_stride=1, max_stride=None, adaptive=True,
+                 max_shift=0.3, max_lost_fraction=0.1):
+        self.initial_stride = stride
+        self.stride = stride
+        self.min_stride = min_stride
+        self.max_stride = max_stride if max_stride is not None else 2 * stride
+        self.adaptive = adaptive
+        self.max_shift = max_shift                  # Desplazamiento admitido entre keyframes (fracción de la altura de la caja)
+        self.max_lost_fraction = max_lost_fraction  # Fracción de tracks perdidos admitida entre keyframes
+        self.keyframes = []
+
+    def get_params(self):
+        # Parámetros que cambian los tracks resultantes
+        return {"stride": self.initial_stride, "min_stride": self.min_stride, "max_stride": self.max_stride,
+                "adaptive": self.adaptive, "max_shift": self.max_shift, "max_lost_fraction": self.max_lost_fraction}
+
+    def reset(self):
+        self.stride = self.initial_stride
+        self.keyframes = []
+
+    def update(self, motion, lost_fraction):
+        # 'motion': desplazamiento medio por frame de los tracks (relativo a la altura de la caja)
+        if not self.adaptive:
+            return self.stride
+        if motion * self.stride > self.max_shift or lost_fraction > self.max_lost_fraction:
+            self.stride = max(self.min_stride, self.stride // 2)
+        elif motion * (self.stride + 1) < self.max_shift / 2:
+            self.stride = min(self.max_stride, self.stride + 1)
+        return self.stride
+
+    def summary(self):
+        num_frames = self.keyframes[-1] + 1 if self.keyframes else 0
+        ratio = len(self.keyframes) / num_frames if num_frames else 0.0
+        return f"{len(self.keyframes)}/{num_frames} frames con detección ({ratio * 100:.1f}%), paso final {self.stride}"
+
+
+def track_motion(prev_rows, rows, frame_gap):
+    # Movimiento de los tracks (sin el balón) entre dos keyframes separados 'frame_gap' frames:
+    # (desplazamiento medio del centro por frame / altura de la caja, fracción de tracks perdidos)
+    prev_mask = prev_rows["object_type"] != BALL
+    mask = rows["object_type"] != BALL
+    prev_keys = prev_rows["object_type"][prev_mask].astype(np.int64) << 32 | prev_rows["track_id"][prev_mask]
+    keys = rows["object_type"][mask].astype(np.int64) << 32 | rows["track_id"][mask]
+    if len(prev_keys) == 0:
+        return 0.0, 0.0
+    _, prev_idx, idx = np.intersect1d(prev_keys, keys, return_indices=True)
+    lost_fraction = 1 - len(prev_idx) / len(prev_keys)
+    if len(prev_idx) == 0:
+        return 0.0, lost_fraction
+
+    prev_bbox = prev_rows["bbox"][prev_mask][prev_idx]
+    bbox = rows["bbox"][mask][idx]
+    shift = np.linalg.norm((bbox[:, :2] + bbox[:, 2:]) / 2 - (prev_bbox[:, :2] + prev_bbox[:, 2:]) / 2, axis=1)
+    height = np.maximum(bbox[:, 3] - bbox[:, 1], 1)
+    return float(np.mean(shift / height) / frame_gap), lost_fraction
+
+
+def drift_report(track_store, reference_store, keyframes=None, iou_threshold=0.5):
+    # Compara, frame a frame y por clase, los tracks obtenidos con keyframes frente a los de
+    # la detección en todos los frames. Las cajas se emparejan por IoU (los IDs de ambos
+    # tracks no tienen por qué coincidir). Con 'keyframes', solo se miden los frames interpolados.
+    import supervision as sv
+    skip = set(keyframes) if keyframes is not None else set()
+    totals = {object_type: {"reference": 0, "candidate": 0, "matched": 0, "iou_sum": 0.0, "center_error_sum": 0.0}
+              for object_type in OBJECT_TYPES}
+    for frame_num in range(min(track_store.num_frames, reference_store.num_frames)):
+        if frame_num in skip:
+            continue
+        rows = track_store.frame_rows(frame_num)
+        reference_rows = reference_store.frame_rows(frame_num)
+        reference = sv.Detections(xyxy=reference_rows["bbox"].reshape(-1, 4), class_id=reference_rows["object_type"].astype(int))
+        candidate = sv.Detections(xyxy=rows["bbox"].reshape(-1, 4), class_id=rows["object_type"].astype(int))
+        reference_idx, candidate_idx, ious = match_detections(reference, candidate, iou_threshold)
+        center_errors = np.linalg.norm(
+            (reference.xyxy[reference_idx, :2] + reference.xyxy[reference_idx, 2:]) / 2
+            - (candidate.xyxy[candidate_idx, :2] + candidate.xyxy[candidate_idx, 2:]) / 2, axis=1)
+        matched_types = reference.class_id[reference_idx]
+        for code, object_type in enumerate(OBJECT_TYPES):
+            total = totals[object_type]
+            matched = matched_types == code
+            total["reference"] += int((reference.class_id == code).sum())
+            total["candidate"] += int((candidate.class_id == code).sum())
+            total["matched"] += int(matched.sum())
+            total["iou_sum"] += float(ious[matched].sum())
+            total["center_error_sum"] += float(center_errors[matched].sum())
+
+    report = {}
+    for object_type, total in totals.items():
+        report[object_type] = {
+            "recall": total["matched"] / total["reference"] if total["reference"] else 1.0,
+            "precision": total["matched"] / total["candidate"] if total["candidate"] else 1.0,
+            "mean_iou": total["iou_sum"] / total["matched"] if total["matched"] else 0.0,
+            "mean_center_error_px": total["center_error_sum"] / total["matched"] if total["matched"] else 0.0,
+            "reference_boxes": total["reference"],
+        }
+    return report
+
+
+def format_drift_report(report):
+    lines = [f"{'clase':<12} {'recall':>7} {'precisión':>9} {'IoU medio':>9} {'error centro(px)':>16} {'cajas ref.':>10}"]
+    for object_type, stats in report.items():
+        lines.append(f"{object_type:<12} {stats['recall']:>7.3f} {stats['precision']:>9.3f} {stats['mean_iou']:>9.3f} "
+                     f"{stats['mean_center_error_px']:>16.2f} {stats['reference_boxes']:>10}")
+    return "\n".join(lines)
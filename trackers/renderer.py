@@ -0,0 +1,274 @@
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+from collections import deque
+
+import cv2
+import numpy as np
+
+sys.path.append("/..")
+from utils import get_center_of_bbox, get_bbox_width, read_video_frames, save_video, METRICS
+
+LABEL_WIDTH = 40   # Tamaño del rectángulo de la etiqueta con el ID (igual que Tracker.draw_ellipse)
+LABEL_HEIGHT = 20
+
+
+def color_key(color):
+    # Los colores de equipo son arrays de NumPy (no hashables): clave como tupla de floats
+    return tuple(float(c) for c in np.asarray(color, dtype=np.float64).reshape(-1))
+
+
+def render_sprite(draw_fn, width, height):
+    # Rasteriza 'draw_fn' sobre dos lienzos (fondo 0 y fondo 255): los píxeles que coinciden
+    # en ambos son los que ha pintado OpenCV. Los que difieren sin ser fondo en alguno de los
+    # dos son píxeles mezclados con el fondo: el texto de putText tiene antialiasing y, con
+    # IDs de 4 cifras, se sale del rectángulo de la etiqueta. Devuelve (dy, dx, valores,
+    # máscara, mezcla) recortados al área pintada, con (dy, dx) relativo al origen del lienzo;
+    # 'mezcla' es None o (filas, columnas, valor con fondo 0, valor con fondo 255).
+    canvases = []
+    for background in (0, 255):
+        canvas = np.full((height, width, 3), background, dtype=np.uint8)
+        draw_fn(canvas)
+        canvases.append(canvas)
+    mask = np.all(canvases[0] == canvases[1], axis=2).astype(np.uint8)
+    blended = ~mask.astype(bool) & (np.any(canvases[0] != 0, axis=2) | np.any(canvases[1] != 255, axis=2))
+    ys, xs = np.nonzero(mask | blended)
+    if len(ys) == 0:
+        return 0, 0, np.zeros((0, 0, 3), dtype=np.uint8), np.zeros((0, 0), dtype=np.uint8), None
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    blend = None
+    if blended.any():
+        rows, cols = np.nonzero(blended)
+        blend = (rows - y0, cols - x0, canvases[0][rows, cols].astype(np.int32), canvases[1][rows, cols].astype(np.int32))
+    return int(y0), int(x0), canvases[0][y0:y1, x0:x1].copy(), mask[y0:y1, x0:x1].copy(), blend
+
+
+def paste_sprite(frame, values, mask, x, y, blend=None):
+    # Copia los píxeles pintados del sprite en el frame (en el sitio, cv2.copyTo con máscara
+    # escribe sobre la vista de la región). Devuelve False si el sprite no cabe entero: en el
+    # borde OpenCV recorta las líneas y hay que dibujar directamente.
+    # Los píxeles de 'blend' se mezclan con el fondo del frame como lo hace OpenCV:
+    # round(fondo * (v255 - v0) / 255) + v0, exacto para el texto negro de las etiquetas.
+    h, w = mask.shape
+    if h == 0 or x < 0 or y < 0 or x + w > frame.shape[1] or y + h > frame.shape[0]:
+        return False
+    region = frame[y:y + h, x:x + w]
+    cv2.copyTo(values, mask, region)
+    if blend is not None:
+        rows, cols, low, high = blend
+        background = region[rows, cols].astype(np.int32)
+        region[rows, cols] = low + (background * (high - low) * 2 + 255) // 510
+    return True
+
+
+class AnnotationRenderer:
+    # Dibuja las mismas anotaciones que Tracker.draw_frame_annotations, con salida idéntica
+    # píxel a píxel, pero sin rasterizar cada vez las mismas formas:
+    # - la elipse de cada ancho de bbox se rasteriza una vez como máscara y se rellena con cada color,
+    # - la etiqueta (rectángulo + ID) se guarda como sprite por (track_id, color),
+    # - el triángulo del balón se guarda como sprite por color.
+    # Las formas se rasterizan en un lienzo con margen y se pegan en la posición de cada objeto;
+    # si una forma se saldría del frame se dibuja con OpenCV como en el código original.
+    ellipse_pad = 4   # Margen del lienzo para el grosor de la línea
+    label_pad = 32    # Margen para el texto, que puede salirse del rectángulo
+    triangle_pad = 4
+
+    def __init__(self):
+        self.ellipse_masks = {}   # ancho -> (dy, dx, máscara) relativo al centro de la elipse
+        self.ellipse_sprites = {}  # (ancho, color) -> (dy, dx, valores, máscara)
+        self.label_sprites = {}   # (track_id, color) -> (dy, dx, valores, máscara, mezcla) relativo a la esquina del rectángulo
+        self.triangle_sprites = {}  # color -> (dy, dx, valores, máscara, mezcla) relativo al vértice inferior
+        self.color_pixels = {}    # color -> píxel uint8 que pinta OpenCV con ese color
+
+    def get_color_pixel(self, color):
+        key = color_key(color)
+        if key not in self.color_pixels:
+            pixel = np.zeros((1, 1, 3), dtype=np.uint8)
+            cv2.rectangle(pixel, (0, 0), (0, 0), color, cv2.FILLED)  # Misma conversión de color que OpenCV
+            self.color_pixels[key] = pixel[0, 0].copy()
+        return self.color_pixels[key]
+
+    def get_ellipse_mask(self, width):
+        if width not in self.ellipse_masks:
+            axes = (int(width), int(0.35 * width))
+            pad = self.ellipse_pad
+            center = (axes[0] + pad, axes[1] + pad)
+            dy, dx, _, mask, _ = render_sprite(
+                lambda canvas: cv2.ellipse(canvas, center=center, axes=axes, angle=0.0, startAngle=-45,
+                                           endAngle=235, color=(255, 255, 255), thickness=2, lineType=cv2.LINE_4),
+                2 * center[0] + 1, 2 * center[1] + 1)
+            self.ellipse_masks[width] = (dy - center[1], dx - center[0], mask)
+        return self.ellipse_masks[width]
+
+    def get_ellipse_sprite(self, width, color):
+        key = (width, color_key(color))
+        if key not in self.ellipse_sprites:
+            dy, dx, mask = self.get_ellipse_mask(width)
+            values = np.empty(mask.shape + (3,), dtype=np.uint8)
+            values[:] = self.get_color_pixel(color)
+            self.ellipse_sprites[key] = (dy, dx, values, mask)
+        return self.ellipse_sprites[key]
+
+    def get_label_sprite(self, track_id, color):
+        key = (int(track_id), color_key(color))
+        if key not in self.label_sprites:
+            pad = self.label_pad
+            x_text = pad + (2 if track_id > 99 else 12)
+
+            def draw_label(canvas):
+                cv2.rectangle(canvas, (pad, pad), (pad + LABEL_WIDTH, pad + LABEL_HEIGHT), color, cv2.FILLED)
+                cv2.putText(canvas, f"{int(track_id)}", (x_text, pad + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+
+            dy, dx, values, mask, blend = render_sprite(draw_label, LABEL_WIDTH + 2 * pad + 1, LABEL_HEIGHT + 2 * pad + 1)
+            self.label_sprites[key] = (dy - pad, dx - pad, values, mask, blend)
+        return self.label_sprites[key]
+
+    def get_triangle_sprite(self, color):
+        key = color_key(color)
+        if key not in self.triangle_sprites:
+            pad = self.triangle_pad
+            x, y = 10 + pad, 20 + pad
+            points = np.array([[x, y], [x - 10, y - 20], [x + 10, y - 20]])
+
+            def draw_triangle(canvas):
+                cv2.drawContours(canvas, [points], 0, color, cv2.FILLED)
+                cv2.drawContours(canvas, [points], 0, (0, 0, 0), 2)
+
+            dy, dx, values, mask, blend = render_sprite(draw_triangle, 2 * x + 1, y + pad + 1)
+            self.triangle_sprites[key] = (dy - y, dx - x, values, mask, blend)
+        return self.triangle_sprites[key]
+
+    def draw_ellipse(self, frame, bbox, color, track_id=None):
+        y2 = int(bbox[3])
+        x_center, _ = get_center_of_bbox(bbox)
+        width = get_bbox_width(bbox)
+
+        dy, dx, values, mask = self.get_ellipse_sprite(width, color) if width > 0 else (0, 0, None, None)
+        if mask is None or not paste_sprite(frame, values, mask, x_center + dx, y2 + dy):
+            cv2.ellipse(frame, center=(x_center, y2), axes=(int(width), int(0.35 * width)), angle=0.0,
+                        startAngle=-45, endAngle=235, color=color, thickness=2, lineType=cv2.LINE_4)
+
+        if track_id is not None:
+            x1_rectangle = x_center - LABEL_WIDTH // 2
+            y1_rectangle = y2 - LABEL_HEIGHT // 2
+            dy, dx, values, mask, blend = self.get_label_sprite(track_id, color)
+            if not paste_sprite(frame, values, mask, x1_rectangle + dx, y1_rectangle + dy, blend):
+                cv2.rectangle(frame, (x1_rectangle, y1_rectangle),
+                              (x1_rectangle + LABEL_WIDTH, y1_rectangle + LABEL_HEIGHT), color, cv2.FILLED)
+                x1_text = x1_rectangle + (2 if track_id > 99 else 12)
+                cv2.putText(frame, f"{int(track_id)}", (x1_text, y1_rectangle + 15),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+        return frame
+
+    def draw_triangle(self, frame, bbox, color):
+        y = int(bbox[1])
+        x, _ = get_center_of_bbox(bbox)
+        dy, dx, values, mask, blend = self.get_triangle_sprite(color)
+        if not paste_sprite(frame, values, mask, x + dx, y + dy, blend):
+            triangle_points = np.array([[x, y], [x - 10, y - 20], [x + 10, y - 20]])
+            cv2.drawContours(frame, [triangle_points], 0, color, cv2.FILLED)
+            cv2.drawContours(frame, [triangle_points], 0, (0, 0, 0), 2)
+        return frame
+
+    def draw_frame_annotations(self, frame, tracks, frame_num):
+        with METRICS.stage("draw"):
+            return self._draw_frame_annotations(frame, tracks, frame_num)
+
+    def _draw_frame_annotations(self, frame, tracks, frame_num):
+        # Mismo orden de dibujo que Tracker.draw_frame_annotations (modifica 'frame' en el sitio)
+        for track_id, player in tracks["players"][frame_num].items():
+            self.draw_ellipse(frame, player["bbox"], player.get("team_color", (0, 0, 255)), track_id)
+        for referee in tracks["referees"][frame_num].values():
+            self.draw_ellipse(frame, referee["bbox"], (0, 255, 255))
+        for ball in tracks["ball"][frame_num].values():
+            self.draw_triangle(frame, ball["bbox"], (0, 255, 0))
+        for manager in tracks["managers"][frame_num].values():
+            self.draw_ellipse(frame, manager["bbox"], (0, 0, 0))
+        for goalkeeper in tracks["goalkeepers"][frame_num].values():
+            self.draw_ellipse(frame, goalkeeper["bbox"], (255, 0, 255))
+        return frame
+
+    def iter_draw_annotations(self, video_frames, tracks, copy=True, start_frame=0):
+        # Con copy=False se dibuja directamente sobre el frame recibido (sin copia)
+        for frame_num, frame in enumerate(video_frames, start=start_frame):
+            if copy:
+                frame = frame.copy()
+            yield self.draw_frame_annotations(frame, tracks, frame_num)
+
+
+# Estado de cada proceso de render_video_parallel (se inicializa una vez por proceso)
+_worker_state = {}
+
+
+def _init_render_worker(video_path, tracks, segment_dir):
+    _worker_state["video_path"] = video_path
+    _worker_state["tracks"] = tracks
+    _worker_state["segment_dir"] = segment_dir
+    _worker_state["renderer"] = AnnotationRenderer()
+
+
+def _render_range(frame_range):
+    # Dibuja un rango y lo escribe en un segmento .npy del directorio temporal: al proceso
+    # principal solo vuelve la ruta, no los frames (que ocuparían cientos de MB por rango)
+    start_frame, end_frame = frame_range
+    frames = read_video_frames(_worker_state["video_path"], start_frame=start_frame, end_frame=end_frame)
+    segment_path = os.path.join(_worker_state["segment_dir"], f"range_{start_frame:08d}.npy")
+    segment, num_frames = None, 0
+    for frame in _worker_state["renderer"].iter_draw_annotations(frames, _worker_state["tracks"], copy=False,
+                                                                 start_frame=start_frame):
+        if segment is None:
+            segment = np.lib.format.open_memmap(segment_path, mode="w+", dtype=frame.dtype,
+                                                shape=(end_frame - start_frame,) + frame.shape)
+        segment[num_frames] = frame
+        num_frames += 1
+    if segment is None:
+        return None, 0
+    segment.flush()
+    del segment
+    return segment_path, num_frames
+
+
+def _iter_segment(segment_path, num_frames):
+    # Frames de un segmento leídos con mmap (sin copiarlos); el fichero se borra al terminar
+    if segment_path is None:
+        return
+    segment = np.load(segment_path, mmap_mode="r")
+    yield from segment[:num_frames]
+    del segment
+    try:
+        os.remove(segment_path)
+    except OSError:
+        pass  # En Windows el último frame puede seguir mapeado: se borra con el directorio
+
+
+def render_video_parallel(video_path, tracks, output_video_path, num_workers=None, range_size=32, fps=30):
+    # Dibuja el video por rangos de 'range_size' frames en 'num_workers' procesos: cada uno
+    # salta a su rango en el video, lo anota y lo escribe en un segmento temporal sin
+    # comprimir; el proceso principal codifica los segmentos en orden y los borra.
+    # Como mucho hay num_workers + 1 rangos en vuelo, así que el pico en disco temporal es
+    # (num_workers + 1) * range_size * alto * ancho * 3 bytes (unos 1,8 GB con 8 procesos y
+    # 1080p) y la memoria residual de cada proceso es de un solo frame: los segmentos se
+    # escriben y leen con mmap y sus páginas las gestiona la caché del sistema operativo.
+    # 'tracks' debe tener ya los equipos asignados (team_color).
+    num_workers = num_workers or mp.cpu_count()
+    num_frames = len(tracks["players"])
+    frame_ranges = [(start, min(start + range_size, num_frames)) for start in range(0, num_frames, range_size)]
+
+    segment_dir = tempfile.mkdtemp(prefix="render_")
+    try:
+        with mp.Pool(num_workers, initializer=_init_render_worker,
+                     initargs=(video_path, tracks, segment_dir)) as pool:
+            def iter_rendered_frames():
+                pending = deque()
+                for frame_range in frame_ranges:
+                    pending.append(pool.apply_async(_render_range, (frame_range,)))
+                    if len(pending) > num_workers:
+                        yield from _iter_segment(*pending.popleft().get())
+                while pending:
+                    yield from _iter_segment(*pending.popleft().get())
+
+            save_video(iter_rendered_frames(), output_video_path, fps=fps)
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
@@ -0,0 +1,161 @@
+import multiprocessing as mp
+import os
+import sys
+from collections import Counter
+
+import cv2
+import numpy as np
+
+sys.path.append("/..")
+from utils import read_video_frames
+from .track_store import TrackStore, OBJECT_TYPES, BALL, BALL_TRACK_ID
+from .backends import match_detections
+
+
+def get_num_frames(video_path):
+    cap = cv2.VideoCapture(video_path)
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return num_frames
+
+
+def plan_shards(num_frames, num_shards, overlap=30):
+    # Divide [0, num_frames) en 'num_shards' tramos consecutivos. Cada tramo (salvo el primero)
+    # empieza 'overlap' frames antes: en esos frames su ByteTrack se calienta y sus cajas se
+    # emparejan con las del tramo anterior para unir los IDs.
+    # Devuelve (inicio con solape, inicio propio, fin) de cada tramo.
+    num_shards = max(1, min(num_shards, num_frames))
+    bounds = np.linspace(0, num_frames, num_shards + 1).round().astype(int).tolist()
+    return [(max(0, start - overlap) if i else 0, start, end)
+            for i, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))]
+
+
+# Estado de cada proceso de track_video_sharded (modelo y tracker propios por proceso)
+_worker_state = {}
+
+
+def _init_shard_worker(video_path, model_path, tracker_kwargs):
+    from .tracker import Tracker
+    _worker_state["video_path"] = video_path
+    _worker_state["tracker"] = Tracker(model_path, **tracker_kwargs)
+    cap = cv2.VideoCapture(video_path)
+    frame_shape = (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    cap.release()
+    _worker_state["tracker"].warmup(frame_shape)  # Carga del modelo fuera del primer tramo
+
+
+def _track_shard(shard):
+    # Tracks de un tramo con un ByteTrack nuevo (frames locales: 0 = inicio con solape)
+    read_start, _, end = shard
+    tracker = _worker_state["tracker"]
+    tracker.tracker = None  # ByteTrack nuevo (se crea en la primera actualización)
+    frames = read_video_frames(_worker_state["video_path"], start_frame=read_start, end_frame=end)
+    return tracker.get_track_store(frames)
+
+
+def _person_detections(rows):
+    # Cajas de personas de un frame (el balón tiene siempre el ID fijo y no se une)
+    import supervision as sv
+    persons = rows["object_type"] != BALL
+    return sv.Detections(xyxy=rows["bbox"][persons].reshape(-1, 4),
+                         class_id=np.zeros(int(persons.sum()), dtype=int)), rows["track_id"][persons]
+
+
+def match_track_ids(previous_rows, rows, iou_threshold=0.5, min_votes=0.5):
+    # Emparejamiento de IDs entre dos tramos en los frames del solape. 'previous_rows' y
+    # 'rows' son las filas de cada frame del solape en el tramo anterior (IDs globales) y en
+    # el nuevo (IDs locales). En cada frame las cajas se emparejan por IoU (sin tener en
+    # cuenta la clase, igual que ByteTrack); cada par suma un voto y un ID local se asigna al
+    # ID global con más votos si los tiene en al menos 'min_votes' de sus frames del solape.
+    votes, appearances = Counter(), Counter()
+    for prev, new in zip(previous_rows, rows):
+        prev_detections, prev_ids = _person_detections(prev)
+        detections, ids = _person_detections(new)
+        appearances.update(ids.tolist())
+        prev_idx, idx, _ = match_detections(prev_detections, detections, iou_threshold)
+        votes.update(zip(ids[idx].tolist(), prev_ids[prev_idx].tolist()))
+
+    id_map, used = {}, set()
+    for (local_id, global_id), count in votes.most_common():
+        if local_id in id_map or global_id in used or count < min_votes * appearances[local_id]:
+            continue
+        id_map[local_id] = global_id
+        used.add(global_id)
+    return id_map
+
+
+def remap_rows(rows, id_map):
+    # Copia de las filas de un frame con los IDs de personas traducidos (el balón conserva el suyo)
+    rows = dict(rows)
+    rows["track_id"] = np.array([track_id if object_type == BALL else id_map[track_id]
+                                 for object_type, track_id in zip(rows["object_type"].tolist(),
+                                                                  rows["track_id"].tolist())],
+                                dtype=np.int32)
+    return rows
+
+
+class ShardStitcher:
+    # Une los TrackStore de tramos consecutivos en uno solo con IDs globales. El primer tramo
+    # conserva sus IDs; en cada tramo siguiente los IDs locales se emparejan con los del tramo
+    # anterior en el solape (match_track_ids) y los que no tienen pareja reciben IDs nuevos.
+    # En los frames del solape se conservan las filas del tramo anterior, cuyo tracker ya
+    # estaba caliente; las del tramo nuevo solo sirven para emparejar.
+    def __init__(self, iou_threshold=0.5, min_votes=0.5):
+        self.iou_threshold = iou_threshold
+        self.min_votes = min_votes
+        self.store = TrackStore()
+        self.next_id = BALL_TRACK_ID + 1
+        self.matched_ids = 0
+        self.new_ids = 0
+
+    def add_shard(self, shard, shard_store):
+        read_start, start, _ = shard
+        overlap = start - read_start
+        # IDs de personas con filas fuera del solape (los que solo aparecen en el solape se descartan)
+        local_ids = {track_id for object_type in OBJECT_TYPES if object_type != "ball"
+                     for track_id in shard_store.track_ids(object_type)
+                     if shard_store.trajectory(track_id, object_type)[0][-1] >= overlap}
+
+        if self.store.num_frames == 0 and overlap == 0:
+            id_map = {track_id: track_id for track_id in local_ids}
+        else:
+            previous_rows = [self.store.frame_rows(frame_num) for frame_num in range(read_start, start)]
+            rows = [shard_store.frame_rows(frame_num) for frame_num in range(overlap)]
+            id_map = match_track_ids(previous_rows, rows, self.iou_threshold, self.min_votes)
+            self.matched_ids += len(local_ids & id_map.keys())
+            for track_id in sorted(local_ids - id_map.keys()):
+                id_map[track_id] = self.next_id
+                self.next_id += 1
+                self.new_ids += 1
+        self.next_id = max([self.next_id] + [global_id + 1 for global_id in id_map.values()])
+
+        for frame_num in range(overlap, shard_store.num_frames):
+            self.store.append_frame(read_start + frame_num, remap_rows(shard_store.frame_rows(frame_num), id_map))
+        return self.store
+
+    def summary(self):
+        return f"{self.matched_ids} IDs unidos entre tramos, {self.new_ids} IDs nuevos"
+
+
+def track_video_sharded(video_path, model_path, num_workers=None, overlap=30, num_shards=None,
+                        stitcher=None, **tracker_kwargs):
+    # Tracking de un video largo en 'num_workers' procesos: el video se divide en tramos
+    # temporales que se solapan 'overlap' frames (plan_shards) y cada proceso los detecta y
+    # trackea con su propio modelo y su propio ByteTrack. Los tramos se unen en orden en el
+    # proceso principal a medida que terminan (ShardStitcher) y se devuelve un TrackStore.
+    # 'tracker_kwargs' se pasan a Tracker en cada proceso (backend, batch_size, frame_filter...);
+    # por defecto cada proceso usa cpu_count / num_workers hilos de inferencia.
+    num_workers = num_workers or mp.cpu_count()
+    num_shards = num_shards or num_workers
+    if tracker_kwargs.get("num_threads") is None:
+        tracker_kwargs["num_threads"] = max(1, (os.cpu_count() or 1) // num_workers)
+    shards = plan_shards(get_num_frames(video_path), num_shards, overlap)
+    # El último tramo se lee hasta el final (el número de frames de la cabecera puede no ser exacto)
+    shards[-1] = shards[-1][:2] + (None,)
+    stitcher = stitcher or ShardStitcher()
+    with mp.Pool(min(num_workers, len(shards)), initializer=_init_shard_worker,
+                 initargs=(video_path, model_path, tracker_kwargs)) as pool:
+        for shard, shard_store in zip(shards, pool.imap(_track_shard, shards)):
+            stitcher.add_shard(shard, shard_store)
+    return stitcher.store
+
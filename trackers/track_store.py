@@ -0,0 +1,250 @@
+import numpy as np
+
+# Tipos de objeto en el mismo orden que el diccionario de tracks clásico
+OBJECT_TYPES = ("players", "referees", "ball", "managers", "goalkeepers")
+OBJECT_TYPE_CODES = {object_type: code for code, object_type in enumerate(OBJECT_TYPES)}
+# Nombre de clase del modelo -> tipo de objeto
+CLASS_TO_OBJECT_TYPE = {
+    "player": "players",
+    "referee": "referees",
+    "ball": "ball",
+    "manager": "managers",
+    "goalkeeper": "goalkeepers"
+}
+BALL = OBJECT_TYPE_CODES["ball"]
+BALL_TRACK_ID = 1  # El balón no se trackea: siempre usa el ID fijo 1
+NO_TEAM = 0
+
+
+def get_object_type_lut(cls_names):
+    # Tabla class_id del modelo -> código de tipo de objeto (-1 si la clase no se usa)
+    lut = np.full(max(cls_names) + 1, -1, dtype=np.int8)
+    for cls_id, cls_name in cls_names.items():
+        if cls_name in CLASS_TO_OBJECT_TYPE:
+            lut[cls_id] = OBJECT_TYPE_CODES[CLASS_TO_OBJECT_TYPE[cls_name]]
+    return lut
+
+
+def empty_frame_rows():
+    return {
+        "object_type": np.empty(0, dtype=np.int8),
+        "track_id": np.empty(0, dtype=np.int32),
+        "bbox": np.empty((0, 4), dtype=np.float32),
+        "conf": np.empty(0, dtype=np.float32),
+    }
+
+
+def rows_from_detections(detection_supervision, detection_with_tracks, object_type_lut):
+    # Filas de un frame a partir de las detecciones, con máscaras vectorizadas por clase.
+    # Las personas salen de las detecciones con track; el balón, de las detecciones sin
+    # track (si hay varias se queda la última, igual que el diccionario clásico).
+    tracked_types = object_type_lut[detection_with_tracks.class_id]
+    tracked_mask = (tracked_types >= 0) & (tracked_types != BALL)
+
+    ball_idx = np.flatnonzero(object_type_lut[detection_supervision.class_id] == BALL)[-1:]
+    ball_conf = detection_supervision.confidence
+    ball_conf = ball_conf[ball_idx] if ball_conf is not None else np.ones(len(ball_idx))
+    tracked_conf = detection_with_tracks.confidence
+    tracked_conf = tracked_conf[tracked_mask] if tracked_conf is not None else np.ones(tracked_mask.sum())
+
+    return {
+        "object_type": np.concatenate([tracked_types[tracked_mask],
+                                       np.full(len(ball_idx), BALL)]).astype(np.int8),
+        "track_id": np.concatenate([detection_with_tracks.tracker_id[tracked_mask],
+                                    np.full(len(ball_idx), BALL_TRACK_ID)]).astype(np.int32),
+        "bbox": np.concatenate([detection_with_tracks.xyxy[tracked_mask],
+                                detection_supervision.xyxy[ball_idx]]).astype(np.float32),
+        "conf": np.concatenate([tracked_conf, ball_conf]).astype(np.float32),
+    }
+
+
+def frame_rows_to_dict(frame_rows):
+    # Vista clásica de un frame: {tipo: {track_id: {"bbox": [...]}}}
+    frame_tracks = {object_type: {} for object_type in OBJECT_TYPES}
+    bboxes = frame_rows["bbox"].tolist()
+    for object_type, track_id, bbox in zip(frame_rows["object_type"].tolist(),
+                                           frame_rows["track_id"].tolist(), bboxes):
+        frame_tracks[OBJECT_TYPES[object_type]][track_id] = {"bbox": bbox}
+    return frame_tracks
+
+
+class TrackStore:
+    # Tabla columnar de tracks respaldada por arrays NumPy:
+    # frame, object_type, track_id, x1, y1, x2, y2, conf, team.
+    # Las filas se guardan ordenadas por (object_type, track_id, frame), de modo que la
+    # trayectoria de un track es un rango contiguo que se localiza en O(1) con 'index'.
+    def __init__(self):
+        self.num_frames = 0
+        self.frame = np.empty(0, dtype=np.int32)
+        self.object_type = np.empty(0, dtype=np.int8)
+        self.track_id = np.empty(0, dtype=np.int32)
+        self.bbox = np.empty((0, 4), dtype=np.float32)  # Columnas x1, y1, x2, y2
+        self.conf = np.empty(0, dtype=np.float32)
+        self.team = np.empty(0, dtype=np.int8)
+        self.seq = np.empty(0, dtype=np.int64)  # Orden de inserción (orden de las claves por frame)
+        self.index = {}           # (object_type, track_id) -> (inicio, fin)
+        self.frame_order = None   # Permutación de filas ordenadas por frame
+        self.frame_offsets = None
+        self._pending = []
+        self._next_seq = 0
+
+    def __len__(self):
+        self._consolidate()
+        return len(self.frame)
+
+    def append_frame(self, frame_num, frame_rows):
+        # Añade las filas de un frame (se consolidan de forma perezosa)
+        n = len(frame_rows["track_id"])
+        self.num_frames = max(self.num_frames, frame_num + 1)
+        self.frame_order = None  # Invalida el índice por frame
+        if n == 0:
+            return
+        frame_rows = dict(frame_rows)
+        frame_rows["frame"] = np.full(n, frame_num, dtype=np.int32)
+        frame_rows["seq"] = np.arange(self._next_seq, self._next_seq + n, dtype=np.int64)
+        frame_rows.setdefault("team", np.full(n, NO_TEAM, dtype=np.int8))
+        self._next_seq += n
+        self._pending.append(frame_rows)
+
+    def extend(self, frame_rows_iter, start_frame=0):
+        for frame_num, frame_rows in enumerate(frame_rows_iter, start=start_frame):
+            self.append_frame(frame_num, frame_rows)
+        return self
+
+    def _consolidate(self):
+        if not self._pending and self.frame_order is not None:
+            return
+        if self._pending:
+            pending = self._pending
+            self._pending = []
+            self.frame = np.concatenate([self.frame] + [rows["frame"] for rows in pending])
+            self.object_type = np.concatenate([self.object_type] + [rows["object_type"] for rows in pending]).astype(np.int8)
+            self.track_id = np.concatenate([self.track_id] + [rows["track_id"] for rows in pending]).astype(np.int32)
+            self.bbox = np.concatenate([self.bbox] + [rows["bbox"] for rows in pending]).astype(np.float32)
+            self.conf = np.concatenate([self.conf] + [rows["conf"] for rows in pending]).astype(np.float32)
+            self.team = np.concatenate([self.team] + [rows["team"] for rows in pending]).astype(np.int8)
+            self.seq = np.concatenate([self.seq] + [rows["seq"] for rows in pending])
+
+        # Orden físico por (object_type, track_id, frame)
+        order = np.lexsort((self.frame, self.track_id, self.object_type))
+        for name in ("frame", "object_type", "track_id", "bbox", "conf", "team", "seq"):
+            setattr(self, name, getattr(self, name)[order])
+
+        # Índice track -> rango de filas
+        self.index = {}
+        if len(self.frame):
+            keys = np.stack([self.object_type.astype(np.int64), self.track_id.astype(np.int64)], axis=1)
+            starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+            starts = np.concatenate([[0], starts])
+            ends = np.concatenate([starts[1:], [len(self.frame)]])
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                self.index[(int(self.object_type[start]), int(self.track_id[start]))] = (start, end)
+
+        # Acceso por frame: permutación ordenada por (frame, orden de inserción)
+        self.frame_order = np.lexsort((self.seq, self.frame))
+        self.frame_offsets = np.searchsorted(self.frame[self.frame_order], np.arange(self.num_frames + 1))
+
+    def interpolate_gaps(self, max_gap=None):
+        # Rellena los frames que faltan dentro de cada track interpolando linealmente la
+        # caja entre las dos filas que rodean el hueco (p. ej. entre keyframes). Las filas
+        # nuevas llevan conf=0 (no vienen del detector) y el equipo de la fila inicial.
+        # Con 'max_gap' solo se rellenan huecos de como mucho ese número de frames.
+        self._consolidate()
+        if len(self.frame) < 2:
+            return 0
+        steps = np.diff(self.frame)
+        same_track = (self.object_type[1:] == self.object_type[:-1]) & (self.track_id[1:] == self.track_id[:-1])
+        gaps = same_track & (steps > 1)
+        if max_gap is not None:
+            gaps &= steps <= max_gap + 1
+        gap_idx = np.flatnonzero(gaps)
+        counts = steps[gap_idx] - 1
+        if len(gap_idx) == 0:
+            return 0
+
+        # Para cada fila nueva: fila de inicio del hueco y fracción recorrida (t en (0, 1))
+        start_rows = np.repeat(gap_idx, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        t = (offsets / np.repeat(steps[gap_idx], counts)).astype(np.float32)[:, None]
+        bbox = self.bbox[start_rows] + (self.bbox[start_rows + 1] - self.bbox[start_rows]) * t
+        self._pending.append({
+            "frame": self.frame[start_rows] + offsets.astype(np.int32),
+            "object_type": self.object_type[start_rows],
+            "track_id": self.track_id[start_rows],
+            "bbox": bbox,
+            "conf": np.zeros(len(start_rows), dtype=np.float32),
+            "team": self.team[start_rows],
+            "seq": self.seq[start_rows],  # Mismo orden de claves que en el frame de inicio
+        })
+        self.frame_order = None
+        return len(start_rows)
+
+    def track_ids(self, object_type="players"):
+        self._consolidate()
+        code = OBJECT_TYPE_CODES[object_type]
+        return [track_id for (type_code, track_id) in self.index if type_code == code]
+
+    def trajectory(self, track_id, object_type="players"):
+        # Devuelve (frames, bboxes) de un track como vistas sobre las columnas
+        self._consolidate()
+        start, end = self.index.get((OBJECT_TYPE_CODES[object_type], int(track_id)), (0, 0))
+        return self.frame[start:end], self.bbox[start:end]
+
+    def frame_rows(self, frame_num):
+        self._consolidate()
+        rows = self.frame_order[self.frame_offsets[frame_num]:self.frame_offsets[frame_num + 1]]
+        return {
+            "object_type": self.object_type[rows],
+            "track_id": self.track_id[rows],
+            "bbox": self.bbox[rows],
+            "conf": self.conf[rows],
+            "team": self.team[rows],
+        }
+
+    def set_team(self, track_id, team, object_type="players"):
+        self._consolidate()
+        start, end = self.index.get((OBJECT_TYPE_CODES[object_type], int(track_id)), (0, 0))
+        self.team[start:end] = team
+
+    def to_dict(self):
+        # Adaptador a la estructura clásica {"players": [{track_id: {"bbox": [...]}}, ...], ...}
+        # que usan draw_annotations, interpolate_ball_positions y la asignación de equipos
+        self._consolidate()
+        tracks = {object_type: [{} for _ in range(self.num_frames)] for object_type in OBJECT_TYPES}
+        order = self.frame_order
+        for frame_num, object_type, track_id, bbox, team in zip(self.frame[order].tolist(),
+                                                                self.object_type[order].tolist(),
+                                                                self.track_id[order].tolist(),
+                                                                self.bbox[order].tolist(),
+                                                                self.team[order].tolist()):
+            track = {"bbox": bbox}
+            if team != NO_TEAM:
+                track["team"] = team
+            tracks[OBJECT_TYPES[object_type]][frame_num][track_id] = track
+        return tracks
+
+    @classmethod
+    def from_dict(cls, tracks):
+        # Construye la tabla a partir de la estructura clásica (p. ej. un stub .pkl)
+        store = cls()
+        num_frames = max((len(frames) for frames in tracks.values()), default=0)
+        for frame_num in range(num_frames):
+            object_types, track_ids, bboxes, teams = [], [], [], []
+            for object_type in OBJECT_TYPES:
+                frames = tracks.get(object_type, [])
+                if frame_num >= len(frames):
+                    continue
+                for track_id, track in frames[frame_num].items():
+                    object_types.append(OBJECT_TYPE_CODES[object_type])
+                    track_ids.append(int(track_id))
+                    bboxes.append(track["bbox"])
+                    teams.append(int(track.get("team", NO_TEAM)))
+            store.append_frame(frame_num, {
+                "object_type": np.array(object_types, dtype=np.int8),
+                "track_id": np.array(track_ids, dtype=np.int32),
+                "bbox": np.array(bboxes, dtype=np.float32).reshape(-1, 4),
+                "conf": np.ones(len(track_ids), dtype=np.float32),
+                "team": np.array(teams, dtype=np.int8),
+            })
+        store.num_frames = num_frames
+        return store
@@ -1,20 +1,67 @@
-from ultralytics import YOLO
-import supervision as sv
 import pickle
 import os
+import time
 import cv2
 import numpy as np
-import pandas as pd
 import sys
+from itertools import islice
 sys.path.append("/..")
-from utils import get_center_of_bbox, get_bbox_width
+from utils import get_center_of_bbox, get_bbox_width, resize_to_fit, METRICS
+from .track_store import TrackStore, get_object_type_lut, rows_from_detections, frame_rows_to_dict
+from .backends import create_backend
+from .keyframes import track_motion
 
 class Tracker:
-    def __init__(self, model_path):
-        self.model = YOLO(model_path)
-        self.tracker = sv.ByteTrack()
+    def __init__(self, model_path, frame_filter=None, backend="torch", batch_size=8, num_threads=None, export_dir="exports",
+                 ball_refiner=None, inference_size=None):
+        self.model_path = model_path
+        # Backend de inferencia ("torch", "onnx", "onnx-int8", "openvino" o una instancia de
+        # InferenceBackend). Los modelos exportados se guardan en 'export_dir' (ver backends.py)
+        if isinstance(backend, str):
+            backend = create_backend(backend, model_path, num_threads, export_dir=export_dir)
+        self.backend = backend
+        self.batch_size = batch_size
+        self._tracker = None
+        self.conf = 0.1
+        # Prefiltro opcional (p. ej. FrameDeduplicator) para reutilizar las detecciones
+        # del último frame inferido en frames repetidos o casi estáticos
+        self.frame_filter = frame_filter
+        # Segunda pasada opcional (BallRefiner) que busca el balón en una ventana a resolución
+        # nativa alrededor de su posición prevista cuando la detección del frame no lo encuentra
+        self.ball_refiner = ball_refiner
+        # Doble resolución: con 'inference_size' cada frame se reduce una sola vez (lado mayor
+        # = inference_size) antes de pasar al modelo y las cajas se devuelven a coordenadas de
+        # la resolución completa, que es la que usan los equipos y el dibujo. Si los frames ya
+        # llegan reducidos (read_video_frames(max_size=...)), 'source_size' = (ancho, alto)
+        # del video original indica a qué resolución devolver las cajas.
+        self.inference_size = inference_size
+        self.source_size = None
+        self._last_detection = None  # Detección del último frame inferido (para los duplicados)
+
+    @property
+    def tracker(self):
+        # ByteTrack se crea (e importa supervision) al actualizarse por primera vez: una
+        # ejecución que solo anota tracks ya guardados no lo necesita
+        if self._tracker is None:
+            import supervision as sv
+            self._tracker = sv.ByteTrack()
+        return self._tracker
+
+    @tracker.setter
+    def tracker(self, tracker):
+        self._tracker = tracker
+
+    def warmup(self, frame_shape=(720, 1280, 3)):
+        # Carga el modelo y pasa un lote de 'batch_size' frames negros del tamaño del video (con la
+        # misma reducción de 'inference_size' que los reales): la inicialización única del runtime
+        # (reserva de memoria, selección de kernels) no cae en la latencia del primer lote real
+        start = time.perf_counter()
+        self.backend.load()
+        self.predict([np.zeros(frame_shape, dtype=np.uint8)] * self.batch_size)
+        return time.perf_counter() - start
 
     def interpolate_ball_positions(self, ball_positions):
+        import pandas as pd
         # Interpolación de posiciones del balón
         ball_positions = [x.get(1,{}).get("bbox",[]) for x in ball_positions]
         df_ball_positions = pd.DataFrame(ball_positions, columns=["x1", "y1", "x2", "y2"])
@@ -23,66 +70,250 @@ class Tracker:
         ball_positions = [{1: {"bbox":x}} for x in df_ball_positions.to_numpy().tolist()]
         return ball_positions
 
-    def detect_frames(self, frames):
-        batch_size = 8
-        detections = []
-        for i in range(0, len(frames), batch_size):
-            batch = frames[i:i + batch_size]
-            detections_batch = self.model.predict(frames[i:i + batch_size], conf=0.1)
-            detections += detections_batch
+    def predict(self, frames):
+        # Inferencia de un lote de frames (con la reducción de 'inference_size' si está activa)
+        if self.inference_size is None and self.source_size is None:
+            return self.backend.predict(frames, conf=self.conf)
+        inputs, scales = [], []
+        for frame in frames:
+            if self.inference_size is not None:
+                frame, scale = resize_to_fit(frame, self.inference_size)
+            inputs.append(frame)
+            if self.source_size is not None:
+                scales.append((self.source_size[0] / frame.shape[1], self.source_size[1] / frame.shape[0]))
+            else:
+                scales.append((scale, scale))
+        detections = self.backend.predict(inputs, conf=self.conf)
+        for detection, (scale_x, scale_y) in zip(detections, scales):
+            if (scale_x, scale_y) != (1.0, 1.0):
+                detection.xyxy = detection.xyxy * np.array([scale_x, scale_y, scale_x, scale_y], dtype=detection.xyxy.dtype)
         return detections
 
-    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None):
+    def iter_detections(self, frames):
+        # Ejecuta el backend por lotes de 'batch_size' sobre cualquier iterable de frames
+        # (lista o generador) y genera una sv.Detections por frame.
+        # Solo se mantiene en memoria un lote de frames a la vez.
+        # Con 'frame_filter', los frames que el filtro marca como duplicados no se envían
+        # al modelo y reciben la detección del último frame inferido.
+        frames = iter(frames)
+        self.reset_detection()
+        while True:
+            batch = list(islice(frames, self.batch_size))
+            if not batch:
+                break
+            yield from self.detect_batch(batch)
 
-        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
-            # Cargar los tracks desde el stub
-            with open(stub_path, 'rb') as f:
-                tracks = pickle.load(f)
-            return tracks
+    def reset_detection(self):
+        # Reinicia el estado entre frames del prefiltro y de la ventana del balón
+        self._last_detection = None
+        if self.frame_filter is not None:
+            self.frame_filter.reset()  # El primer frame siempre se infiere
+        if self.ball_refiner is not None:
+            self.ball_refiner.reset()
 
-        detections = self.detect_frames(frames)
+    def detect_batch(self, batch, frame_nums=None):
+        # Detección de un lote con el prefiltro de duplicados y la ventana del balón si están
+        # activos. 'frame_nums' son los números de frame del lote cuando no son consecutivos
+        # (keyframes); la ventana del balón los usa para prever su posición.
+        duplicates = None
+        if self.frame_filter is None:
+            with METRICS.stage("detect", items=len(batch)):
+                detections_batch = self.predict(batch)
+        else:
+            duplicates = [self.frame_filter.is_duplicate(frame) for frame in batch]
+            to_infer = [frame for frame, duplicate in zip(batch, duplicates) if not duplicate]
+            METRICS.count("frames_skipped", len(batch) - len(to_infer))
+            with METRICS.stage("detect", items=len(batch)):
+                inferred = iter(self.predict(to_infer) if to_infer else [])
+            detections_batch = []
+            for duplicate in duplicates:
+                if not duplicate:
+                    self._last_detection = next(inferred)
+                detections_batch.append(self._last_detection)
 
-        tracks = {
-            "players": [],
-            "referees": [],
-            "ball": [],
-            "managers": [],
-            "goalkeepers": []
-        }
+        if self.ball_refiner is not None:
+            detections_batch = self.ball_refiner.refine(batch, detections_batch, self.backend, duplicates, frame_nums)
+        return detections_batch
 
-        for frame_num, detection in enumerate(detections):
-            cls_names = detection.names
-            cls_names_inv = {v: k for k, v in cls_names.items()}
+    def detect_frames(self, frames):
+        return list(self.iter_detections(frames))
+
+    def detect_frame(self, frame):
+        # Detección de un solo frame (modo en vivo): a diferencia de iter_detections no
+        # reinicia la ventana del balón entre llamadas, que sigue su posición de frame a frame
+        with METRICS.stage("detect"):
+            detections = self.predict([frame])
+        if self.ball_refiner is not None:
+            detections = self.ball_refiner.refine([frame], detections, self.backend)
+        return detections[0]
+
+    def get_inference_params(self):
+        # Parámetros que cambian las detecciones (forman parte de la clave de DetectionCache)
+        params = {"conf": self.conf, "backend": self.backend.get_params()}
+        if self.inference_size is not None:
+            params["inference_size"] = self.inference_size
+        if self.frame_filter is not None:
+            params["frame_filter"] = self.frame_filter.get_params()
+        if self.ball_refiner is not None:
+            params["ball_refiner"] = self.ball_refiner.get_params()
+        return params
+
+    def get_resume_frame(self, cache):
+        # Primer frame que falta en la caché, desde el que se reanuda la detección.
+        # El prefiltro de duplicados y la ventana del balón guardan estado entre frames (el
+        # último frame inferido, las últimas posiciones del balón) que no está en la caché y
+        # que, al detectar por lotes, ya va por delante del último chunk escrito: reanudar con
+        # ese estado vacío daría detecciones distintas a las de una ejecución sin cortes.
+        # Con cualquiera de los dos activo una caché a medias se descarta y se detecta desde
+        # el principio; una caché completa se reutiliza igual, porque ya no se detecta nada.
+        if cache is None:
+            return 0
+        if not cache.is_complete and (self.frame_filter is not None or self.ball_refiner is not None):
+            if cache.cached_frames:
+                print(f"Caché a medias descartada ({cache.cached_frames} frames): con el prefiltro de "
+                      f"duplicados o la ventana del balón no se puede reanudar")
+                cache.reset()
+            return 0
+        return cache.cached_frames
+
+    def iter_supervision_detections(self, frames, cache=None, first_frame=0):
+        # Detecciones de cada frame como pares (sv.Detections, nombres de clase).
+        # Con 'cache' (DetectionCache) se reutilizan los frames ya guardados y solo se
+        # ejecuta el modelo sobre el resto, que se va añadiendo a la caché por chunks.
+        # 'first_frame' es el número del primer frame de 'frames': si el lector ya empieza en
+        # get_resume_frame(cache) (read_video_frames(start_frame=...)), al reanudar no se
+        # decodifica ningún frame que ya esté en la caché.
+        frames = iter(frames)
+        frame_num = 0
+        resume_frame = self.get_resume_frame(cache)
+        if first_frame > resume_frame:
+            raise ValueError(f"Los frames empiezan en el {first_frame} pero la caché solo llega al "
+                             f"{resume_frame}: usa get_resume_frame(cache) para situar el lector")
+        if cache is not None:
+            class_names = cache.class_names
+            for detection_supervision in cache.iter_cached():
+                frame_num += 1
+                METRICS.cache("detection_cache", hits=1)
+                yield detection_supervision, class_names
+            if cache.is_complete:
+                return
+            # Descarta los frames ya cubiertos por la caché que el lector no se haya saltado
+            if frame_num > first_frame:
+                next(islice(frames, frame_num - first_frame, frame_num - first_frame), None)
 
-            detection_supervision = sv.Detections.from_ultralytics(detection)
+        class_names = self.backend.names
+        for detection_supervision in self.iter_detections(frames):
+            if cache is not None:
+                cache.append(frame_num, detection_supervision, class_names)
+                METRICS.cache("detection_cache", misses=1)
+            frame_num += 1
+            yield detection_supervision, class_names
 
-            # Tracking
+        if cache is not None:
+            cache.finish(frame_num)
+
+    def update_tracks(self, detection_supervision, class_names):
+        # Actualiza ByteTrack con la detección de un frame y devuelve sus filas
+        # (object_type, track_id, bbox, conf) usando máscaras de clase vectorizadas
+        object_type_lut = get_object_type_lut(class_names)
+        if METRICS.enabled:
+            # Detecciones por clase de cada frame trackeado, inferido o leído de la caché
+            # (solo se cuentan con las métricas activadas)
+            cls_ids, counts = np.unique(detection_supervision.class_id, return_counts=True)
+            for cls_id, count in zip(cls_ids.tolist(), counts.tolist()):
+                METRICS.count("detections", count, cls=class_names.get(cls_id, str(cls_id)))
+
+        # Tracking
+        with METRICS.stage("track"):
             detection_with_tracks = self.tracker.update_with_detections(detection_supervision)
+            return rows_from_detections(detection_supervision, detection_with_tracks, object_type_lut)
+
+    def get_frame_rows(self, detection_supervision):
+        return self.update_tracks(detection_supervision, self.backend.names)
+
+    def get_frame_tracks(self, detection_supervision):
+        # Convierte la detección de un frame en sus tracks {clase: {track_id: {"bbox": [...]}}}
+        return frame_rows_to_dict(self.get_frame_rows(detection_supervision))
 
-            tracks["players"].append({})
-            tracks["referees"].append({})
-            tracks["ball"].append({})
-            tracks["managers"].append({})
-            tracks["goalkeepers"].append({})
-
-            for frame_detection in detection_with_tracks:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-                track_id = frame_detection[4]
-                if cls_id == cls_names_inv['player']:
-                    tracks["players"][frame_num][track_id] = {"bbox":bbox}
-                if cls_id == cls_names_inv['referee']:
-                    tracks["referees"][frame_num][track_id] = {"bbox":bbox}
-                if cls_id == cls_names_inv['manager']:
-                    tracks["managers"][frame_num][track_id] = {"bbox":bbox}
-                if cls_id == cls_names_inv['goalkeeper']:
-                    tracks["goalkeepers"][frame_num][track_id] = {"bbox":bbox}
-
-            for frame_detection in detection_supervision:
-                bbox = frame_detection[0].tolist()
-                cls_id = frame_detection[3]
-                if cls_id == cls_names_inv['ball']:
-                    tracks["ball"][frame_num][1] = {"bbox":bbox}
+    def iter_frame_rows(self, frames, cache=None, first_frame=0):
+        # Genera las filas de tracks frame a frame a medida que llegan los frames
+        for detection_supervision, class_names in self.iter_supervision_detections(frames, cache, first_frame):
+            yield self.update_tracks(detection_supervision, class_names)
+
+    def get_track_store(self, frames, cache=None, first_frame=0):
+        # Tracks en formato columnar (TrackStore) en lugar del diccionario de listas
+        return TrackStore().extend(self.iter_frame_rows(frames, cache, first_frame))
+
+    def _track_keyframes(self, keyframes, store, scheduler, previous):
+        # Detecta un lote de keyframes (con el prefiltro y la ventana del balón, como en
+        # iter_detections), actualiza ByteTrack solo con ellos y ajusta el paso
+        detections = self.detect_batch([frame for _, frame in keyframes], [frame_num for frame_num, _ in keyframes])
+        for (frame_num, _), detection_supervision in zip(keyframes, detections):
+            rows = self.update_tracks(detection_supervision, self.backend.names)
+            store.append_frame(frame_num, rows)
+            scheduler.keyframes.append(frame_num)
+            if previous is not None:
+                motion, lost_fraction = track_motion(previous[1], rows, frame_num - previous[0])
+                scheduler.update(motion, lost_fraction)
+            previous = (frame_num, rows)
+        return previous
+
+    def get_keyframe_track_store(self, frames, scheduler, max_missed_keyframes=1):
+        # Modo keyframes: el detector solo se ejecuta cada 'scheduler.stride' frames y ByteTrack
+        # solo se actualiza con esos frames. El último frame siempre es keyframe, así que cada
+        # frame intermedio queda entre dos keyframes y sus cajas (de todas las clases) se
+        # interpolan por track en el TrackStore.
+        # Con paso adaptativo la posición del siguiente keyframe depende de la detección del
+        # actual, así que cada keyframe se detecta en cuanto llega y el nuevo paso se aplica ya
+        # al siguiente; con paso fijo los keyframes se detectan en lotes de 'batch_size'.
+        # Solo se interpolan los huecos de un track en los que falta como mucho en
+        # 'max_missed_keyframes' keyframes seguidos: un jugador que sale del plano varios
+        # segundos no recibe cajas inventadas cruzando el campo.
+        scheduler.reset()
+        self.reset_detection()
+        store = TrackStore()
+        keyframe_batch = 1 if scheduler.adaptive else self.batch_size
+        batch, previous, last, last_keyframe = [], None, None, None
+        next_keyframe = 0
+        for frame_num, frame in enumerate(frames):
+            last = (frame_num, frame)
+            if frame_num < next_keyframe:
+                continue
+            batch.append(last)
+            last_keyframe = frame_num
+            next_keyframe = frame_num + scheduler.stride
+            if len(batch) == keyframe_batch:
+                previous = self._track_keyframes(batch, store, scheduler, previous)
+                batch = []
+                next_keyframe = frame_num + scheduler.stride
+        if last is not None and last[0] != last_keyframe:
+            batch.append(last)
+        if batch:
+            previous = self._track_keyframes(batch, store, scheduler, previous)
+        if last is not None:
+            store.num_frames = last[0] + 1
+        store.interpolate_gaps(max_gap=(max_missed_keyframes + 1) * scheduler.max_stride)
+        return store
+
+    def get_object_tracks(self, frames, read_from_stub=False, stub_path=None, cache=None, first_frame=0):
+
+        if read_from_stub and stub_path is not None and os.path.exists(stub_path):
+            # Cargar los tracks desde el stub
+            METRICS.cache("stub", hits=1)
+            with open(stub_path, 'rb') as f:
+                tracks = pickle.load(f)
+            return tracks
+        if read_from_stub:
+            METRICS.cache("stub", misses=1)
+
+        # 'frames' puede ser un generador: los frames se descartan tras la detección
+        # y solo se acumulan los tracks, que ocupan muy poco
+        return self.collect_tracks(self.iter_frame_rows(frames, cache, first_frame), stub_path)
+
+    def collect_tracks(self, frame_rows, stub_path=None):
+        # Agrupa las filas de cada frame (en orden) en un TrackStore y devuelve
+        # la vista clásica de diccionario de listas por clase
+        tracks = TrackStore().extend(frame_rows).to_dict()
 
         if stub_path is not None:
             # Save the tracks to a stub file
@@ -149,38 +380,47 @@ class Tracker:
         cv2.drawContours(frame, [triangle_points], 0, (0,0,0), 2) # Dibujo el contorno del triángulo
         return frame
 
-    def draw_annotations(self, video_frames, tracks):
-        output_video_frames = []
-        for frame_num, frame in enumerate(video_frames):
-            frame = frame.copy()
+    def draw_frame_annotations(self, frame, tracks, frame_num):
+        # Dibuja las anotaciones de un único frame (modifica 'frame' en el sitio)
+        with METRICS.stage("draw"):
+            return self._draw_frame_annotations(frame, tracks, frame_num)
 
-            player_dict = tracks["players"][frame_num]
-            referee_dict = tracks["referees"][frame_num]
-            ball_dict = tracks["ball"][frame_num]
-            manager_dict = tracks["managers"][frame_num]
+    def _draw_frame_annotations(self, frame, tracks, frame_num):
+        player_dict = tracks["players"][frame_num]
+        referee_dict = tracks["referees"][frame_num]
+        ball_dict = tracks["ball"][frame_num]
+        manager_dict = tracks["managers"][frame_num]
 
-            # Dibuja los jugadores
-            for track_id, player in player_dict.items():
-                color = player.get("team_color", (0, 0, 255))  # Rojo por defecto
-                frame = self.draw_ellipse(frame, player["bbox"], color, track_id)
+        # Dibuja los jugadores
+        for track_id, player in player_dict.items():
+            color = player.get("team_color", (0, 0, 255))  # Rojo por defecto
+            frame = self.draw_ellipse(frame, player["bbox"], color, track_id)
 
-            # Dibuja los árbitros
-            for _, referee in referee_dict.items():
-                frame = self.draw_ellipse(frame, referee["bbox"], (0, 255, 255)) # Amarillo
+        # Dibuja los árbitros
+        for _, referee in referee_dict.items():
+            frame = self.draw_ellipse(frame, referee["bbox"], (0, 255, 255)) # Amarillo
 
-            # Dibuja el tgriangulo que identifica el balón
-            for track_id, ball in ball_dict.items():
-                frame = self.draw_triangle(frame, ball["bbox"], (0, 255, 0)) # Verde
+        # Dibuja el tgriangulo que identifica el balón
+        for track_id, ball in ball_dict.items():
+            frame = self.draw_triangle(frame, ball["bbox"], (0, 255, 0)) # Verde
 
-            # Dibuja los managers
-            for _, manager in manager_dict.items():
-                frame = self.draw_ellipse(frame, manager["bbox"], (0, 0, 0)) # Negro
+        # Dibuja los managers
+        for _, manager in manager_dict.items():
+            frame = self.draw_ellipse(frame, manager["bbox"], (0, 0, 0)) # Negro
 
-            # Dibuja los porteros
-            for _, goalkeeper in tracks["goalkeepers"][frame_num].items():
-                frame = self.draw_ellipse(frame, goalkeeper["bbox"], (255, 0, 255)) # Azul
+        # Dibuja los porteros
+        for _, goalkeeper in tracks["goalkeepers"][frame_num].items():
+            frame = self.draw_ellipse(frame, goalkeeper["bbox"], (255, 0, 255)) # Azul
 
-            output_video_frames.append(frame)
+        return frame
 
-        return output_video_frames
+    def iter_draw_annotations(self, video_frames, tracks, copy=True):
+        # Versión en streaming de draw_annotations: anota cada frame en cuanto llega.
+        # Con copy=False se dibuja directamente sobre el frame recibido (sin copia).
+        for frame_num, frame in enumerate(video_frames):
+            if copy:
+                frame = frame.copy()
+            yield self.draw_frame_annotations(frame, tracks, frame_num)
 
+    def draw_annotations(self, video_frames, tracks):
+        return list(self.iter_draw_annotations(video_frames, tracks))
@@ -1,2 +1,4 @@
-from .video_utils import read_video, save_video
-from .bbox_utils import get_center_of_bbox, get_bbox_width
\ No newline at end of file
+from .video_utils import read_video, read_video_frames, save_video, get_video_info, get_frame_range, resize_to_fit
+from .bbox_utils import get_center_of_bbox, get_bbox_width
+from .metrics import Metrics, METRICS
+from .live import LiveSource, LatencyBudget, create_sink, format_live_report
\ No newline at end of file
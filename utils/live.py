@@ -0,0 +1,231 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def parse_source(source):
+    # "0", "1"... -> índice de cámara; cualquier otra cosa (archivo, tubería, URL rtsp/http) se abre tal cual
+    return int(source) if isinstance(source, str) and source.isdigit() else source
+
+
+class LiveSource:
+    # Fuente en vivo (cámara, stream, tubería o un archivo reproducido a ritmo de reloj).
+    # Un hilo lee los frames en cuanto llegan y los deja en un búfer de 'buffer_size' frames:
+    # si el consumidor va por detrás, el frame más antiguo del búfer se descarta (la fuente
+    # nunca se bloquea y lo que se procesa es siempre lo más reciente).
+    # Cada frame lleva la marca de tiempo de su captura para medir la latencia de extremo a extremo.
+    # Los archivos normales se entregan a su fps (como una cámara) salvo con realtime=False.
+    def __init__(self, source, buffer_size=1, realtime=True):
+        self.source = parse_source(source)
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            raise IOError(f"No se puede abrir la fuente '{source}'")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.realtime = realtime and isinstance(self.source, str) and os.path.isfile(self.source)
+        self.buffer = deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.captured = 0
+        self.dropped = 0  # Frames descartados del búfer sin llegar a procesarse
+        self.finished = False
+        self.first_shape = None  # Forma del primer frame capturado
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read, daemon=True)
+
+    def start(self):
+        if self._thread.ident is None:  # Ya arrancado por get_frame_shape
+            self._thread.start()
+        return self
+
+    def get_frame_shape(self):
+        # Forma (alto, ancho, 3) de los frames de la fuente. Tuberías y streams suelen dar
+        # 0 x 0 en CAP_PROP_FRAME_WIDTH / HEIGHT: entonces se arranca la lectura y se espera
+        # al primer frame capturado. None si la fuente termina sin entregar ningún frame.
+        width, height = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if width > 0 and height > 0:
+            return height, width, 3
+        self.start()
+        with self.condition:
+            while self.first_shape is None and not self.finished:
+                self.condition.wait()
+            return self.first_shape
+
+    def _read(self):
+        start = time.perf_counter()
+        frame_num = 0
+        while not self._stop.is_set():
+            if self.realtime:
+                # Ritmo de reloj: el frame N no está disponible antes de start + N / fps
+                delay = start + frame_num / self.fps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            with self.condition:
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped += 1
+                self.buffer.append((frame_num, time.perf_counter(), frame))
+                self.captured += 1
+                if self.first_shape is None:
+                    self.first_shape = frame.shape
+                self.condition.notify()
+            frame_num += 1
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def read(self):
+        # Espera al siguiente frame del búfer: (número de frame, instante de captura, frame),
+        # o None cuando la fuente se ha terminado
+        with self.condition:
+            while not self.buffer and not self.finished:
+                self.condition.wait()
+            return self.buffer.popleft() if self.buffer else None
+
+    def __iter__(self):
+        while True:
+            item = self.read()
+            if item is None:
+                return
+            yield item
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.cap.release()
+
+
+class LatencyBudget:
+    # Política de descarte del modo en vivo. Antes de procesar un frame se estima su latencia
+    # final: lo que ya ha esperado + la mediana de los últimos 'window' tiempos de proceso
+    # (la mediana no se deja arrastrar por un frame lento aislado, como el primero).
+    # Si supera 'budget' segundos:
+    #   - "drop": el frame no se procesa ni se emite (se pasa al siguiente, más reciente);
+    #   - "skip": el frame se emite, pero sin detección ni tracking (con los tracks del último
+    #     frame procesado), que es la parte más cara.
+    # Nunca se aplica la política a más de 'max_consecutive' frames seguidos: así la salida no
+    # se queda sin frames (o sin detecciones) cuando el proceso en sí es más lento que el
+    # presupuesto, y la estimación se actualiza si el proceso vuelve a ser rápido.
+    POLICIES = ("drop", "skip")
+
+    def __init__(self, budget=0.2, policy="drop", max_consecutive=5, window=15):
+        if policy not in self.POLICIES:
+            raise ValueError(f"Política '{policy}' desconocida (opciones: {', '.join(self.POLICIES)})")
+        self.budget = budget
+        self.policy = policy
+        self.max_consecutive = max_consecutive
+        self.processing_times = deque(maxlen=window)
+        self.estimate = 0.0
+        self.consecutive = 0
+        self.latencies = []
+        self.dropped = 0
+        self.skipped = 0
+
+    def should_process(self, captured_at):
+        # True si el frame se procesa entero; False si se aplica la política
+        if time.perf_counter() - captured_at + self.estimate <= self.budget or \
+                self.consecutive >= self.max_consecutive:
+            self.consecutive = 0
+            return True
+        self.consecutive += 1
+        if self.policy == "drop":
+            self.dropped += 1
+        else:
+            self.skipped += 1
+        return False
+
+    def record_processing(self, seconds):
+        self.processing_times.append(seconds)
+        self.estimate = float(np.median(self.processing_times))
+
+    def record_emitted(self, captured_at):
+        self.latencies.append(time.perf_counter() - captured_at)
+
+    def report(self, source_dropped=0):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            "emitted": len(self.latencies),
+            "dropped_late": self.dropped,        # Descartados por la política "drop"
+            "dropped_buffer": source_dropped,    # Sobrescritos en el búfer de la fuente
+            "skipped_detection": self.skipped,   # Emitidos sin detección (política "skip")
+            "over_budget": int((latencies > self.budget).sum()) if self.latencies else 0,
+            "latency_p50_ms": round(p50 * 1000, 1),
+            "latency_p95_ms": round(p95 * 1000, 1),
+            "latency_p99_ms": round(p99 * 1000, 1),
+            "latency_max_ms": round(latencies.max() * 1000, 1),
+        }
+
+
+def format_live_report(report, budget):
+    return (f"Frames emitidos: {report['emitted']}, descartados: {report['dropped_late']} por la política "
+            f"+ {report['dropped_buffer']} en el búfer de la fuente, sin detección: {report['skipped_detection']}\n"
+            f"Latencia: p50={report['latency_p50_ms']} ms, p95={report['latency_p95_ms']} ms, "
+            f"p99={report['latency_p99_ms']} ms, máx={report['latency_max_ms']} ms "
+            f"({report['over_budget']} frames por encima del presupuesto de {budget * 1000:.0f} ms)")
+
+
+class VideoSink:
+    # Graba los frames emitidos a 'fps' (el de la fuente). Con 'frame_num' (número del frame en
+    # la fuente), los huecos de los frames descartados se rellenan repitiendo el último frame
+    # emitido: el video dura lo mismo que la captura y se ve a velocidad real.
+    def __init__(self, path, fps=30):
+        self.path = path
+        self.fps = fps
+        self.out = None
+        self.last_frame = None
+        self.next_frame_num = 0
+        self.repeated = 0  # Frames repetidos en lugar de los descartados
+
+    def write(self, frame, frame_num=None):
+        if self.out is None:
+            self.out = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps,
+                                       (frame.shape[1], frame.shape[0]))
+        if frame_num is not None:
+            if self.last_frame is not None:
+                for _ in range(frame_num - self.next_frame_num):
+                    self.out.write(self.last_frame)
+                    self.repeated += 1
+            self.next_frame_num = frame_num + 1
+        self.out.write(frame)
+        self.last_frame = frame
+        return True
+
+    def close(self):
+        if self.out is not None:
+            self.out.release()
+
+
+class WindowSink:
+    # Muestra los frames en una ventana; write devuelve False al pulsar 'q'
+    def __init__(self, name="futbol"):
+        self.name = name
+
+    def write(self, frame, frame_num=None):
+        cv2.imshow(self.name, frame)
+        return cv2.waitKey(1) & 0xFF != ord('q')
+
+    def close(self):
+        cv2.destroyWindow(self.name)
+
+
+class NullSink:
+    # Descarta los frames (para medir latencias sin coste de salida)
+    def write(self, frame, frame_num=None):
+        return True
+
+    def close(self):
+        pass
+
+
+def create_sink(sink, fps=30):
+    # "window" -> ventana, "null" -> sin salida, cualquier otra cosa -> ruta de un archivo de video
+    if sink == "window":
+        return WindowSink()
+    if sink == "null":
+        return NullSink()
+    return VideoSink(sink, fps)
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+
+import psutil
+
+# Límites (segundos) de los histogramas de latencia por frame
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0)
+
+
+class _NullStage:
+    # Contexto vacío que se devuelve con las métricas desactivadas (sin coste de medición)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, metrics, name, items):
+        self.metrics = metrics
+        self.name = name
+        self.items = items
+
+    def __enter__(self):
+        self.wall_start = time.perf_counter()
+        self.cpu_start = time.thread_time()  # CPU del hilo actual (válido dentro del Pipeline)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record_stage(self.name, time.perf_counter() - self.wall_start,
+                                  time.thread_time() - self.cpu_start, self.items)
+        return False
+
+
+class Metrics:
+    # Instrumentación de las etapas del pipeline (decodificación, detección, tracking,
+    # equipos, dibujo, codificación): tiempo de pared y de CPU por etapa, histograma de
+    # latencia por frame, contadores (p. ej. detecciones por clase), aciertos de cachés y
+    # pico de memoria. Desactivada (por defecto) cada llamada solo comprueba 'enabled'.
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._exporter = None
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def disable(self):
+        self.enabled = False
+        return self
+
+    def reset(self):
+        self.start_time = time.time()
+        self.stages = {}    # etapa -> {"calls", "items", "wall_time", "cpu_time", "buckets", "latency_sum"}
+        self.counters = {}  # (nombre, etiquetas) -> valor
+        self.caches = {}    # caché -> {"hits", "misses"}
+        self.peak_rss = 0
+        self._last_memory_sample = 0.0
+
+    def stage(self, name, items=1):
+        # with METRICS.stage("detect", items=len(batch)): ...
+        # La latencia por frame es la duración del bloque repartida entre sus 'items' frames
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, items)
+
+    def record_stage(self, name, wall_time, cpu_time, items=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {"calls": 0, "items": 0, "wall_time": 0.0, "cpu_time": 0.0,
+                                             "buckets": [0] * (len(LATENCY_BUCKETS) + 1), "latency_sum": 0.0}
+            stage["calls"] += 1
+            stage["items"] += items
+            stage["wall_time"] += wall_time
+            stage["cpu_time"] += cpu_time
+            if items > 0:
+                latency = wall_time / items
+                bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+                stage["buckets"][bucket] += items
+                stage["latency_sum"] += wall_time
+        self.sample_memory()
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def cache(self, name, hits=0, misses=0):
+        if not self.enabled:
+            return
+        with self._lock:
+            cache = self.caches.setdefault(name, {"hits": 0, "misses": 0})
+            cache["hits"] += hits
+            cache["misses"] += misses
+
+    def sample_memory(self, min_interval=0.1):
+        # Pico de memoria (RSS) muestreado como mucho cada 'min_interval' segundos
+        now = time.perf_counter()
+        if not self.enabled or now - self._last_memory_sample < min_interval:
+            return
+        self._last_memory_sample = now
+        self.peak_rss = max(self.peak_rss, psutil.Process().memory_info().rss)
+
+    def to_dict(self):
+        self.sample_memory(min_interval=0)
+        with self._lock:
+            stages = {}
+            for name, stage in self.stages.items():
+                stages[name] = {
+                    "calls": stage["calls"],
+                    "items": stage["items"],
+                    "wall_time": round(stage["wall_time"], 6),
+                    "cpu_time": round(stage["cpu_time"], 6),
+                    "items_per_second": round(stage["items"] / stage["wall_time"], 2) if stage["wall_time"] > 0 else None,
+                    "latency_histogram": {**{str(bound): count for bound, count in zip(LATENCY_BUCKETS, stage["buckets"])},
+                                          "+Inf": stage["buckets"][-1]},
+                }
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in self.counters.items()]
+            caches = {name: {**cache, "hit_rate": round(cache["hits"] / (cache["hits"] + cache["misses"]), 4)
+                             if cache["hits"] + cache["misses"] else None}
+                      for name, cache in self.caches.items()}
+        return {"elapsed": round(time.time() - self.start_time, 3), "stages": stages, "counters": counters,
+                "caches": caches, "peak_rss_bytes": self.peak_rss}
+
+    def to_prometheus(self, prefix="futbol"):
+        # Formato de texto de Prometheus (exposition format)
+        data = self.to_dict()
+        lines = [f"# TYPE {prefix}_stage_wall_seconds_total counter",
+                 *[f'{prefix}_stage_wall_seconds_total{{stage="{name}"}} {stage["wall_time"]}' for name, stage in data["stages"].items()],
+                 f"# TYPE {prefix}_stage_cpu_seconds_total counter",
+                 *[f'{prefix}_stage_cpu_seconds_total{{stage="{name}"}} {stage["cpu_time"]}' for name, stage in data["stages"].items()],
+                 f"# TYPE {prefix}_stage_items_total counter",
+                 *[f'{prefix}_stage_items_total{{stage="{name}"}} {stage["items"]}' for name, stage in data["stages"].items()],
+                 f"# TYPE {prefix}_frame_latency_seconds histogram"]
+        with self._lock:
+            for name, stage in self.stages.items():
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), stage["buckets"]):
+                    cumulative += count
+                    lines.append(f'{prefix}_frame_latency_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_frame_latency_seconds_sum{{stage="{name}"}} {stage["latency_sum"]}')
+                lines.append(f'{prefix}_frame_latency_seconds_count{{stage="{name}"}} {cumulative}')
+        for name in dict.fromkeys(counter["name"] for counter in data["counters"]):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for counter in data["counters"]:
+                if counter["name"] != name:
+                    continue
+                labels = ",".join(f'{key}="{value}"' for key, value in counter["labels"].items())
+                lines.append(f'{prefix}_{name}_total{"{" + labels + "}" if labels else ""} {counter["value"]}')
+        lines.append(f"# TYPE {prefix}_cache_requests_total counter")
+        for name, cache in data["caches"].items():
+            lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="hit"}} {cache["hits"]}')
+            lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="miss"}} {cache["misses"]}')
+        lines.append(f"# TYPE {prefix}_peak_rss_bytes gauge")
+        lines.append(f"{prefix}_peak_rss_bytes {data['peak_rss_bytes']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path=None, prometheus_path=None):
+        # Escribe las métricas (renombrando un temporal, para que un lector nunca vea un fichero a medias)
+        for path, content in ((json_path, lambda: json.dumps(self.to_dict(), indent=2)),
+                              (prometheus_path, self.to_prometheus)):
+            if path is None:
+                continue
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path + ".tmp", "w") as f:
+                f.write(content())
+            os.replace(path + ".tmp", path)
+
+    def start_periodic_export(self, interval, json_path=None, prometheus_path=None):
+        # Exporta cada 'interval' segundos en un hilo (p. ej. para un textfile collector de Prometheus)
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.export(json_path, prometheus_path)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        self._exporter = (stop, thread)
+
+    def stop_periodic_export(self):
+        if self._exporter is not None:
+            stop, thread = self._exporter
+            stop.set()
+            thread.join()
+            self._exporter = None
+
+    def format_report(self):
+        data = self.to_dict()
+        lines = [f"{'etapa':<14} {'items':>7} {'pared(s)':>9} {'CPU(s)':>8} {'items/s':>9}"]
+        for name, stage in data["stages"].items():
+            lines.append(f"{name:<14} {stage['items']:>7} {stage['wall_time']:>9.3f} {stage['cpu_time']:>8.3f} "
+                         f"{stage['items_per_second'] or 0:>9.1f}")
+        for name, cache in data["caches"].items():
+            rate = f"{cache['hit_rate'] * 100:.1f}%" if cache["hit_rate"] is not None else "-"
+            lines.append(f"caché {name}: {cache['hits']} aciertos, {cache['misses']} fallos ({rate})")
+        for counter in data["counters"]:
+            labels = ", ".join(f"{key}={value}" for key, value in counter["labels"].items())
+            lines.append(f"{counter['name']}{f' [{labels}]' if labels else ''}: {counter['value']}")
+        lines.append(f"pico de memoria (RSS): {data['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+        return "\n".join(lines)
+
+
+# Instancia global que usan Tracker, TeamAssigner y las utilidades de video
+METRICS = Metrics()
@@ -0,0 +1,164 @@
+import queue
+import threading
+import time
+
+_END = object()  # Marca de fin de flujo entre etapas
+
+
+class _StageError:
+    # Envuelve una excepción producida en una etapa para relanzarla en el hilo principal
+    def __init__(self, stage_name, exception):
+        self.stage_name = stage_name
+        self.exception = exception
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0              # Elementos producidos por la etapa
+        self.wall_time = 0.0        # Tiempo total de la etapa (segundos)
+        self.input_stall = 0.0      # Tiempo esperando elementos de la etapa anterior
+        self.output_stall = 0.0     # Tiempo bloqueado porque la cola de salida estaba llena
+        self.queue_depth_sum = 0    # Suma de profundidades de la cola de entrada (para la media)
+        self.queue_depth_max = 0
+        self.queue_samples = 0
+
+    def as_dict(self):
+        busy = max(0.0, self.wall_time - self.input_stall - self.output_stall)
+        return {
+            "items": self.items,
+            "wall_time": round(self.wall_time, 4),
+            "busy_time": round(busy, 4),
+            "input_stall": round(self.input_stall, 4),
+            "output_stall": round(self.output_stall, 4),
+            "queue_depth_mean": round(self.queue_depth_sum / self.queue_samples, 2) if self.queue_samples else 0.0,
+            "queue_depth_max": self.queue_depth_max,
+        }
+
+
+class Pipeline:
+    # Ejecuta etapas concurrentes (una por hilo) conectadas por colas acotadas.
+    # Cada etapa es una función que recibe un iterador de elementos y devuelve otro
+    # iterador (puede agrupar en lotes, p. ej. la detección). Al haber un solo hilo
+    # por etapa y colas FIFO, el orden de los frames y el estado de los objetos con
+    # estado (como ByteTrack) son idénticos a la ejecución secuencial.
+    def __init__(self, queue_size=8):
+        self.queue_size = queue_size
+        self.source = None
+        self.stages = []
+        self.stats = {}
+        self._stop = threading.Event()
+
+    def add_source(self, name, iterable):
+        self.source = (name, iterable)
+        return self
+
+    def add_stage(self, name, fn):
+        self.stages.append((name, fn))
+        return self
+
+    def _put(self, out_queue, item, stats):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        stats.output_stall += time.perf_counter() - start
+
+    def _get(self, in_queue, stats):
+        start = time.perf_counter()
+        item = _END
+        while not self._stop.is_set():
+            try:
+                item = in_queue.get(timeout=0.1)
+                break
+            except queue.Empty:
+                continue
+        stats.input_stall += time.perf_counter() - start
+        return item
+
+    def _iter_queue(self, in_queue, stats, count_items=False):
+        # Iterador sobre la cola de entrada que mide la espera y la profundidad de la cola
+        while True:
+            depth = in_queue.qsize()
+            stats.queue_depth_sum += depth
+            stats.queue_depth_max = max(stats.queue_depth_max, depth)
+            stats.queue_samples += 1
+            item = self._get(in_queue, stats)
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                raise _PropagatedError(item)
+            if count_items:
+                stats.items += 1
+            yield item
+
+    def _run_stage(self, name, fn, in_queue, out_queue):
+        stats = self.stats[name]
+        start = time.perf_counter()
+        try:
+            items = fn(self._iter_queue(in_queue, stats)) if in_queue is not None else iter(fn)
+            for item in items:
+                if self._stop.is_set():
+                    break
+                stats.items += 1
+                self._put(out_queue, item, stats)
+            self._put(out_queue, _END, stats)
+        except _PropagatedError as error:
+            self._put(out_queue, error.stage_error, stats)
+        except BaseException as exception:
+            self._put(out_queue, _StageError(name, exception), stats)
+        finally:
+            stats.wall_time = time.perf_counter() - start
+
+    def run(self, sink_name, sink_fn):
+        # Lanza la fuente y las etapas en hilos y ejecuta el sumidero en el hilo actual.
+        # Devuelve lo que devuelva 'sink_fn' (que recibe el iterador de la última etapa).
+        if self.source is None:
+            raise ValueError("El pipeline necesita una fuente (add_source)")
+        self._stop.clear()
+        names = [self.source[0]] + [name for name, _ in self.stages] + [sink_name]
+        self.stats = {name: StageStats(name) for name in names}
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._run_stage,
+                                    args=(self.source[0], self.source[1], None, queues[0]),
+                                    daemon=True)]
+        for i, (name, fn) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._run_stage,
+                                            args=(name, fn, queues[i], queues[i + 1]),
+                                            daemon=True))
+        for thread in threads:
+            thread.start()
+
+        stats = self.stats[sink_name]
+        start = time.perf_counter()
+        try:
+            return sink_fn(self._iter_queue(queues[-1], stats, count_items=True))
+        except _PropagatedError as error:
+            raise RuntimeError(f"Error en la etapa '{error.stage_error.stage_name}' del pipeline") from error.stage_error.exception
+        finally:
+            stats.wall_time = time.perf_counter() - start
+            self._stop.set()  # Desbloquea las etapas si el sumidero terminó antes de tiempo
+            for thread in threads:
+                thread.join()
+
+    def report(self):
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+    def format_report(self):
+        lines = [f"{'etapa':<10} {'items':>7} {'total(s)':>9} {'ocupada(s)':>10} {'espera ent.(s)':>14} {'espera sal.(s)':>14} {'cola media':>10} {'cola max':>8}"]
+        for name, stats in self.report().items():
+            lines.append(f"{name:<10} {stats['items']:>7} {stats['wall_time']:>9.2f} {stats['busy_time']:>10.2f} "
+                         f"{stats['input_stall']:>14.2f} {stats['output_stall']:>14.2f} "
+                         f"{stats['queue_depth_mean']:>10.2f} {stats['queue_depth_max']:>8}")
+        return "\n".join(lines)
+
+
+class _PropagatedError(Exception):
+    # Error recibido de una etapa anterior: se reenvía tal cual hacia el sumidero
+    def __init__(self, stage_error):
+        super().__init__(stage_error.stage_name)
+        self.stage_error = stage_error
@@ -1,22 +1,86 @@
 import cv2
+from .metrics import METRICS
 
-def read_video(video_path):
-    # Crea un objeto VideoCapture para leer el video
+def get_video_info(video_path):
+    # Metadatos del video sin decodificar ningún frame
     cap = cv2.VideoCapture(video_path)
-    frames = []
-    while True:
-        # Lee un frame del video
-        ret, frame = cap.read()
-        # Si no se pudo leer el frame, sale del bucle
-        if not ret:
-            break
-        frames.append(frame)
-    return frames
-    
-def save_video(output_video_frames, output_video_path):
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec para el video
-    out = cv2.VideoWriter(output_video_path, fourcc, 30, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
-    for frame in output_video_frames:
-        out.write(frame)  # Escribe el frame en el archivo de salida
-    out.release()  # Libera el objeto VideoWriter
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0  # Algunos contenedores no guardan el fps
+    num_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    info = {
+        "fps": fps,
+        "num_frames": num_frames,
+        "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        "duration": num_frames / fps,
+    }
+    cap.release()
+    return info
+
+def get_frame_range(video_path, start_time=None, end_time=None, start_frame=0, end_frame=None):
+    # Convierte un rango en segundos en un rango de frames [start_frame, end_frame) según el fps del video
+    if start_time is not None or end_time is not None:
+        fps = get_video_info(video_path)["fps"]
+        if start_time is not None:
+            start_frame = int(round(start_time * fps))
+        if end_time is not None:
+            end_frame = int(round(end_time * fps))
+    return start_frame, end_frame
+
+def resize_to_fit(frame, max_size):
+    # Reduce el frame (manteniendo la proporción) para que su lado mayor sea 'max_size'.
+    # Devuelve el frame y el factor para volver a las coordenadas originales (1.0 si no se reduce)
+    height, width = frame.shape[:2]
+    scale = max(height, width) / max_size
+    if scale <= 1:
+        return frame, 1.0
+    new_size = (max(1, round(width / scale)), max(1, round(height / scale)))
+    return cv2.resize(frame, new_size, interpolation=cv2.INTER_AREA), scale
+
+def read_video(video_path, **kwargs):
+    # Lee el video completo en una lista (acepta los mismos rangos y opciones que read_video_frames)
+    return list(read_video_frames(video_path, **kwargs))
 
+def read_video_frames(video_path, start_frame=0, end_frame=None, stride=1, start_time=None, end_time=None,
+                      max_size=None):
+    # Lector perezoso: devuelve los frames uno a uno sin guardarlos en memoria.
+    # Con 'start_frame' / 'end_frame' (o 'start_time' / 'end_time' en segundos) solo se leen
+    # los frames [start_frame, end_frame); con 'stride' solo uno de cada 'stride' frames.
+    # Con 'max_size' los frames se reducen al decodificarlos (ver resize_to_fit).
+    start_frame, end_frame = get_frame_range(video_path, start_time, end_time, start_frame, end_frame)
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)  # Salta al frame sin decodificar los anteriores
+        frame_num = start_frame
+        while end_frame is None or frame_num < end_frame:
+            with METRICS.stage("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+            if max_size is not None:
+                frame, _ = resize_to_fit(frame, max_size)
+            yield frame
+            # Los frames intermedios del 'stride' solo se avanzan con grab(): se decodifican
+            # (el códec lo necesita) pero no se convierten a BGR ni se copian
+            next_frame = frame_num + stride
+            frame_num += 1
+            while frame_num < next_frame and (end_frame is None or frame_num < end_frame):
+                if not cap.grab():
+                    return
+                frame_num += 1
+    finally:
+        cap.release()  # Libera el VideoCapture aunque no se consuma todo el generador
+
+def save_video(output_video_frames, output_video_path, fps=30):
+    # Acepta una lista o cualquier iterador de frames: cada frame se codifica
+    # en cuanto llega, sin esperar a tener el video completo en memoria.
+    # 'fps' debería ser el del video de origen (get_video_info), dividido por el 'stride' si se usó
+    out = None
+    for frame in output_video_frames:
+        if out is None:
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Codec para el video
+            out = cv2.VideoWriter(output_video_path, fourcc, fps, (frame.shape[1], frame.shape[0]))
+        with METRICS.stage("encode"):
+            out.write(frame)  # Escribe el frame en el archivo de salida
+    if out is not None:
+        out.release()  # Libera el objeto VideoWriter